@@ -0,0 +1,174 @@
+# alpha_vantage.py
+import http_client
+
+from cache import TTLCache
+from config import Config
+from scheduler import TokenBucketScheduler
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+# NEWS_SENTIMENT returns at most this many articles when no limit is passed
+SENTIMENT_FEED_LIMIT = 50
+
+# Parsed responses keyed by (function, params), with TTLs that follow how
+# often each function's data actually changes.
+av_cache = TTLCache(ttls=Config.ALPHAVANTAGE_CACHE_TTLS, max_entries=Config.ALPHAVANTAGE_CACHE_MAX_ENTRIES)
+
+# Every upstream call waits for a token, so we queue under load instead of
+# blowing through the key's per-minute quota.
+av_scheduler = TokenBucketScheduler(
+    rate=Config.ALPHAVANTAGE_REQUESTS_PER_MINUTE,
+    burst=Config.ALPHAVANTAGE_BURST
+)
+
+
+class AlphaVantageError(Exception):
+    """Alpha Vantage answered, but with an error or throttling payload."""
+
+
+def query(function, params, parse=None, priority=None):
+    """
+    Call an Alpha Vantage function, serving repeat calls from the response cache.
+
+    Cache misses wait their turn on the shared rate scheduler. Error and
+    rate-limit payloads are raised as AlphaVantageError and never cached.
+
+    Args:
+        function (str): The Alpha Vantage function name (e.g. "INCOME_STATEMENT")
+        params (dict): Query parameters other than function and apikey
+        parse (callable, optional): Turns the raw JSON into the form that is
+                                    cached and returned. Must be the same for
+                                    every call with a given function.
+        priority (int, optional): Scheduler priority for a cache miss (INTERACTIVE or
+                                  BACKGROUND). Defaults to the thread's priority.
+
+    Returns:
+        The parsed response (or the raw JSON dict if no parser is given)
+    """
+    key = tuple(sorted(params.items()))
+    return av_cache.get_or_load(function, key, lambda: _fetch(function, params, parse, priority))
+
+
+def _fetch(function, params, parse, priority):
+    av_scheduler.acquire(priority)
+    response = http_client.get(
+        ALPHA_VANTAGE_URL,
+        params={"function": function, **params, "apikey": Config.ALPHAVANTAGE_API_KEY}
+    )
+    response.raise_for_status()
+    data = response.json()
+    if "Error Message" in data:
+        raise AlphaVantageError(data["Error Message"])
+    if "Note" in data or "Information" in data:
+        # Alpha Vantage reports rate limiting with a 200 and a Note/Information message
+        raise AlphaVantageError(data.get("Note") or data.get("Information"))
+    return parse(data) if parse else data
+
+
+def listing_status_csv():
+    """
+    Download the LISTING_STATUS export of active US listings.
+
+    Returns:
+        str: CSV text with symbol, name, exchange, assetType, ipoDate,
+             delistingDate and status columns
+    """
+    av_scheduler.acquire()
+    response = http_client.get(
+        ALPHA_VANTAGE_URL,
+        params={"function": "LISTING_STATUS", "apikey": Config.ALPHAVANTAGE_API_KEY}
+    )
+    response.raise_for_status()
+    # Errors and rate limiting come back as JSON instead of CSV
+    if not response.text.lstrip().lower().startswith("symbol,"):
+        raise AlphaVantageError(response.text[:200])
+    return response.text
+
+
+def canonical_sentiment_params(tickers, topics=None):
+    """Normalize comma-separated tickers and topics into sorted, de-duplicated lists."""
+    ticker_list = sorted({ticker.strip().upper() for ticker in tickers.split(",") if ticker.strip()})
+    topic_list = sorted({topic.strip().lower() for topic in (topics or "").split(",") if topic.strip()})
+    return ticker_list, topic_list
+
+
+def _sentiment_key(ticker_list, topic_list):
+    params = {"tickers": ",".join(ticker_list)}
+    if topic_list:
+        params["topics"] = ",".join(topic_list)
+    return params, tuple(sorted(params.items()))
+
+
+def _compose_sentiment(ticker_list, topic_list):
+    """
+    Build a multi-ticker NEWS_SENTIMENT response from cached single-ticker ones.
+
+    Alpha Vantage returns articles that mention every requested ticker, so the
+    answer is the union of the single-ticker feeds filtered to articles tagged
+    with all of them. That only holds when each single-ticker feed is
+    complete: a feed that hit SENTIMENT_FEED_LIMIT is just the most recent
+    page, and older articles tagged with every ticker would be missing.
+    Returns None unless every single-ticker result is cached and complete.
+    """
+    single_results = []
+    for ticker in ticker_list:
+        _, key = _sentiment_key([ticker], topic_list)
+        cached = av_cache.peek("NEWS_SENTIMENT", key)
+        if cached is None or len(cached.get("feed", [])) >= SENTIMENT_FEED_LIMIT:
+            return None
+        single_results.append(cached)
+
+    wanted = set(ticker_list)
+    feed = {}
+    for result in single_results:
+        for article in result.get("feed", []):
+            tagged = {entry.get("ticker", "").upper() for entry in article.get("ticker_sentiment", [])}
+            if wanted <= tagged:
+                feed.setdefault(article.get("url"), article)
+    articles = sorted(feed.values(), key=lambda article: article.get("time_published", ""), reverse=True)
+
+    composed = {key: value for key, value in single_results[0].items() if key != "feed"}
+    composed["items"] = str(len(articles))
+    composed["feed"] = articles
+    return composed
+
+
+def news_sentiment(tickers, topics=None, priority=None):
+    """
+    Fetch NEWS_SENTIMENT for a set of tickers, cached under a canonical key.
+
+    "AAPL,MSFT" and "msft, aapl" share one cache entry. A multi-ticker request
+    is assembled from cached single-ticker results when they are all present
+    and none was truncated at the feed limit; otherwise it goes upstream.
+
+    Args:
+        tickers (str): Comma-separated tickers
+        topics (str, optional): Comma-separated topics
+        priority (int, optional): Scheduler priority for a cache miss
+
+    Returns:
+        dict: The Alpha Vantage response
+    """
+    ticker_list, topic_list = canonical_sentiment_params(tickers, topics)
+    params, key = _sentiment_key(ticker_list, topic_list)
+
+    def load():
+        if len(ticker_list) > 1:
+            composed = _compose_sentiment(ticker_list, topic_list)
+            if composed is not None:
+                return composed
+        return _fetch("NEWS_SENTIMENT", params, None, priority)
+
+    return av_cache.get_or_load("NEWS_SENTIMENT", key, load)
+
+
+def time_series_parser(series_key, price_key):
+    """Build a parser that turns a time series payload into {"dates", "prices"} for graphing."""
+    def parse(data):
+        if series_key not in data:
+            raise AlphaVantageError("Invalid response from Alpha Vantage")
+        time_series = data[series_key]
+        dates = sorted(time_series.keys())
+        prices = [time_series[date][price_key] for date in dates]
+        return {"dates": dates, "prices": prices}
+    return parse
@@ -7,7 +7,9 @@ from models import db
 import firebase_admin
 from firebase_admin import credentials, initialize_app
 from routes import register_routes
-from sqlalchemy import inspect
+from commands import register_commands
+from query_stats import install_query_counter
+from migrations import upgrade
 
 
 def create_app():
@@ -31,6 +33,7 @@ def create_app():
 
     # Initialize the database
     db.init_app(app)
+    install_query_counter(app)
 
     # Initialize Firebase using credentials from the environment variable.
     # It first attempts to parse the value as JSON.
@@ -47,20 +50,16 @@ def create_app():
 
     # Register routes
     register_routes(app)
+    register_commands(app)
     return app
 
 
 # Create the app at the module level so that gunicorn can find it
 app = create_app()
 
+# Create missing tables and apply pending schema migrations
 with app.app_context():
-    inspector = inspect(db.engine)
-    existing_tables = inspector.get_table_names()
-    for table in db.metadata.tables.values():
-        if table.name not in existing_tables:
-            table.create(db.engine, checkfirst=True)
-        else:
-            print(f"Table {table.name} already exists")
+    upgrade()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
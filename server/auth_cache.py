@@ -0,0 +1,69 @@
+# auth_cache.py
+import hashlib
+import time
+from collections import namedtuple
+
+from firebase_admin import auth
+from config import Config
+from cache import TTLCache
+from models import db, User, Portfolio
+
+# What the before_request hook stores in g.user and g.portfolio; routes
+# only need the ids
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "firebase_uid", "portfolio_id", "claims"])
+PortfolioRef = namedtuple("PortfolioRef", ["id", "user_id"])
+
+# Verified tokens, keyed by a SHA-256 of the raw token so tokens themselves
+# are never held in memory. Entries expire with the token (or sooner, at
+# AUTH_TOKEN_CACHE_MAX_TTL). Google's signing certificates are already cached
+# in-process by firebase_admin, which honours their Cache-Control max-age.
+token_cache = TTLCache(
+    ttls={"token": Config.AUTH_TOKEN_CACHE_MAX_TTL},
+    max_entries=Config.AUTH_TOKEN_CACHE_MAX_ENTRIES
+)
+
+
+def _token_key(id_token):
+    return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+
+def _load_account(firebase_uid):
+    """Return (user_id, portfolio_id) for a Firebase uid in one joined query, or None."""
+    return db.session.query(User.id, Portfolio.id) \
+        .outerjoin(Portfolio, Portfolio.user_id == User.id) \
+        .filter(User.firebase_uid == firebase_uid).first()
+
+
+def authenticate_token(id_token, verify=auth.verify_id_token, load_account=_load_account):
+    """
+    Resolve a Firebase ID token to the signed-in user and their portfolio,
+    verifying it and querying the database at most once per token.
+
+    Args:
+        id_token (str): The bearer token
+        verify (callable): Verifies a token and returns its claims
+        load_account (callable): Maps a Firebase uid to (user_id, portfolio_id), or None
+
+    Returns:
+        AuthenticatedUser: The user, or None if no account matches the token
+
+    Raises:
+        Exception: Whatever verify raises for an invalid or expired token
+    """
+    key = _token_key(id_token)
+    cached = token_cache.get("token", key)
+    if cached is not None:
+        return cached
+
+    claims = verify(id_token)
+    account = load_account(claims["uid"])
+    if account is None:
+        # Not cached: the account may be created right after sign-up
+        return None
+    user_id, portfolio_id = account
+    user = AuthenticatedUser(id=user_id, firebase_uid=claims["uid"], portfolio_id=portfolio_id, claims=claims)
+    ttl = min(claims.get("exp", 0) - time.time(), Config.AUTH_TOKEN_CACHE_MAX_TTL)
+    # A user without a portfolio yet is looked up again on the next request
+    if ttl > 0 and portfolio_id is not None:
+        token_cache.set("token", key, user, ttl=ttl)
+    return user
@@ -0,0 +1,107 @@
+"""
+Measure per-request auth overhead with and without the verified-token cache.
+
+Firebase ID tokens are RS256 JWTs, so the signature check is simulated with a
+locally generated key and google.auth.jwt.decode (what firebase_admin uses
+underneath, minus the certificate download, which it caches anyway). The
+user and portfolio lookups run against an in-memory SQLite database:
+
+    cd server && python benchmarks/auth_benchmark.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Config requires an Alpha Vantage key at import time; auth never uses it
+os.environ.setdefault("STOCKR_ALPHA_ID", "")
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import rsa  # noqa: E402
+from flask import Flask  # noqa: E402
+from google.auth import crypt, jwt  # noqa: E402
+
+from auth_cache import authenticate_token, token_cache, _load_account  # noqa: E402
+from models import db, User, Portfolio  # noqa: E402
+
+PROJECT_ID = "stockr-benchmark"
+KEY_ID = "benchmark-key"
+
+
+def make_signer():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    public_pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return crypt.RSASigner.from_string(private_pem, key_id=KEY_ID), {KEY_ID: public_pem}
+
+
+def make_token(signer, uid):
+    now = int(time.time())
+    return jwt.encode(signer, {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "sub": uid,
+        "uid": uid,
+        "iat": now,
+        "exp": now + 3600
+    }).decode()
+
+
+def timed(label, func, tokens):
+    started = time.perf_counter()
+    for token in tokens:
+        func(token)
+    per_request = (time.perf_counter() - started) / len(tokens)
+    print(f"  {label:<28} {per_request * 1e6:10.1f} us/request")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    signer, certs = make_signer()
+
+    def verify(token):
+        return jwt.decode(token, certs=certs, audience=PROJECT_ID)
+
+    with app.app_context():
+        db.create_all()
+        uids = [f"firebase-uid-{i}" for i in range(args.users)]
+        users = [User(firebase_uid=uid) for uid in uids]
+        db.session.add_all(users)
+        db.session.commit()
+        db.session.add_all([Portfolio(user_id=user.id) for user in users])
+        db.session.commit()
+
+        # A dashboard load: every user sends the same token many times
+        user_tokens = [make_token(signer, uid) for uid in uids]
+        tokens = [user_tokens[i % len(user_tokens)] for i in range(args.requests)]
+
+        def uncached(token):
+            claims = verify(token)
+            user = User.query.filter_by(firebase_uid=claims["uid"]).first()
+            return user, Portfolio.query.filter_by(user_id=user.id).first()
+
+        def cached(token):
+            return authenticate_token(token, verify=verify, load_account=_load_account)
+
+        print(f"{args.requests} requests from {args.users} users:")
+        before = timed("verify + user + portfolio", uncached, tokens)
+        token_cache.clear()
+        after = timed("token cache", cached, tokens)
+        print(f"  speedup                      {before / after:10.1f}x")
+        print(f"  cache {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
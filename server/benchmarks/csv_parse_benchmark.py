@@ -0,0 +1,135 @@
+"""
+Compare the two-phase CSV parser with the previous row-by-row parser.
+
+Generates a synthetic broker export and times both parsers on it:
+
+    cd server && python benchmarks/csv_parse_benchmark.py --rows 100000
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Config requires an Alpha Vantage key at import time; the parser never uses it
+os.environ.setdefault("STOCKR_ALPHA_ID", "")
+
+from csv_import import iter_csv_transactions  # noqa: E402
+
+TICKERS = ["AAPL", "MSFT", "GOOG", "AMZN", "NVDA", "META", "TSLA", "BRK", "JPM", "V"]
+
+
+def legacy_parse(stream):
+    """The row-by-row parser this benchmark measures against."""
+    header_mapping = {
+        "ticker": ["ticker", "symbol", "security", "stock"],
+        "shares": ["shares", "quantity", "units", "amount"],
+        "price": ["price", "cost", "unit price", "price per share"],
+        "transaction_type": ["transaction type", "type", "action", "activity"],
+        "date": ["date", "trade date", "transaction date"]
+    }
+    stream.seek(0)
+    csv_reader = csv.DictReader(stream)
+    field_map = {}
+    for target_field, possible_names in header_mapping.items():
+        for header in csv_reader.fieldnames:
+            if any(possible_name.lower() == header.lower() for possible_name in possible_names):
+                field_map[header] = target_field
+                break
+
+    transactions = []
+    for row in csv_reader:
+        transaction_data = {}
+        for csv_field, target_field in field_map.items():
+            if csv_field in row:
+                transaction_data[target_field] = row[csv_field]
+        if "ticker" not in transaction_data:
+            for field in row.keys():
+                if any(keyword in field.lower() for keyword in ["symbol", "description", "security"]):
+                    ticker_match = re.search(r'\b[A-Z]{1,5}\b', row[field])
+                    if ticker_match:
+                        transaction_data["ticker"] = ticker_match.group(0)
+                        break
+        if "transaction_type" in transaction_data:
+            tx_type = transaction_data["transaction_type"].lower()
+            transaction_data["transaction_type"] = "buy" if any(
+                word in tx_type for word in ["buy", "purchase"]) else "sell"
+        else:
+            transaction_data["transaction_type"] = "buy"
+        if "date" in transaction_data:
+            for fmt in ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d-%m-%y"]:
+                try:
+                    transaction_data["date"] = datetime.strptime(transaction_data["date"], fmt).date()
+                    break
+                except ValueError:
+                    continue
+        for field in ("shares", "price"):
+            if field in transaction_data:
+                try:
+                    transaction_data[field] = abs(float(transaction_data[field]))
+                except (ValueError, TypeError):
+                    transaction_data[field] = 0
+        if (transaction_data.get("ticker") and
+                transaction_data.get("shares", 0) > 0 and
+                transaction_data.get("price", 0) > 0):
+            transactions.append(transaction_data)
+    return transactions
+
+
+def make_export(rows, date_format, seed=0):
+    """A Symbol / Description style export: the ticker has to be extracted from text."""
+    rng = random.Random(seed)
+    out = StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["Trade Date", "Symbol / Description", "Action", "Quantity", "Price", "Commission"])
+    start = date(2015, 1, 2)
+    for i in range(rows):
+        ticker = rng.choice(TICKERS)
+        writer.writerow([
+            (start + timedelta(days=i % 3000)).strftime(date_format),
+            f"{ticker} - {ticker.title()} Inc common shares",
+            rng.choice(["Buy", "Sell", "Purchase"]),
+            rng.randint(1, 500),
+            f"{rng.uniform(5, 900):.2f}",
+            "9.99"
+        ])
+    return out.getvalue()
+
+
+def timed(parse, text, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        stream = StringIO(text, newline=None)
+        started = time.perf_counter()
+        result = list(parse(stream))
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # ISO dates match the first format the legacy parser tries; day-first
+    # dates make it fail four formats per row before one fits
+    for date_format in ("%Y-%m-%d", "%d-%m-%y"):
+        text = make_export(args.rows, date_format)
+        legacy_seconds, legacy_rows = timed(legacy_parse, text, args.repeat)
+        new_seconds, new_rows = timed(iter_csv_transactions, text, args.repeat)
+        assert len(legacy_rows) == len(new_rows), (len(legacy_rows), len(new_rows))
+        assert legacy_rows[0] == new_rows[0], (legacy_rows[0], new_rows[0])
+        print(f"{args.rows} rows, dates as {date_format}:")
+        print(f"  row-by-row  {legacy_seconds:8.3f}s  {args.rows / legacy_seconds:12,.0f} rows/s")
+        print(f"  two-phase   {new_seconds:8.3f}s  {args.rows / new_seconds:12,.0f} rows/s")
+        print(f"  speedup     {legacy_seconds / new_seconds:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+    """An in-progress upstream load that concurrent callers can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a TTL per data kind and single-flight loading.
+
+    Entries are keyed by (kind, key). Each kind has its own TTL in seconds; a
+    kind with a TTL of 0 (or no TTL configured) is never cached. When several
+    threads miss on the same key at once, only the first one calls the loader
+    and the others wait for its result.
+
+    Args:
+        ttls (dict): Map of kind -> TTL in seconds
+        max_entries (int): Maximum number of entries before LRU eviction
+        clock (callable, optional): Returns the current time in seconds
+    """
+
+    def __init__(self, ttls, max_entries=1024, clock=time.monotonic):
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # (kind, key) -> (value, stored_at, expires_at)
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, cache_key, max_age=None):
+        """Return (found, value) for a live entry. Caller must hold the lock."""
+        entry = self._entries.get(cache_key)
+        if entry is None:
+            return False, None
+        value, stored_at, expires_at = entry
+        now = self.clock()
+        if now >= expires_at or (max_age is not None and now - stored_at > max_age):
+            return False, None
+        self._entries.move_to_end(cache_key)
+        return True, value
+
+    def _store(self, cache_key, value, ttl):
+        """Insert an entry and evict the least recently used ones. Caller must hold the lock."""
+        now = self.clock()
+        self._entries[cache_key] = (value, now, now + ttl)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, kind, key, max_age=None):
+        """Return the cached value or None, counting a hit or a miss."""
+        with self._lock:
+            found, value = self._lookup((kind, key), max_age)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def get_many(self, kind, keys, max_age=None):
+        """
+        Return {key: value} for every key with a live entry, counting hits.
+
+        Misses are not counted, since callers load them through get_or_load,
+        which counts them.
+        """
+        found_values = {}
+        with self._lock:
+            for key in keys:
+                found, value = self._lookup((kind, key), max_age)
+                if found:
+                    self.hits += 1
+                    found_values[key] = value
+        return found_values
+
+    def peek(self, kind, key):
+        """Return the cached value or None without touching the counters or LRU order."""
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or self.clock() >= entry[2]:
+                return None
+            return entry[0]
+
+    def set(self, kind, key, value, ttl=None):
+        """Store a value, using the kind's TTL unless an explicit one is given."""
+        ttl = self.ttls.get(kind, 0) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._store((kind, key), value, ttl)
+
+    def get_or_load(self, kind, key, loader, max_age=None):
+        """
+        Return the cached value for (kind, key), calling loader() on a miss.
+
+        Only one loader runs per key at a time; concurrent misses wait for it
+        and share its result (or its exception). Exceptions are not cached.
+
+        Args:
+            kind (str): The data kind, which selects the TTL
+            key: Hashable key within the kind (e.g. a ticker)
+            loader (callable): Fetches the value from upstream
+            max_age (float, optional): Reject entries older than this many seconds
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        cache_key = (kind, key)
+        with self._lock:
+            found, value = self._lookup(cache_key, max_age)
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[cache_key] = flight
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    ttl = self.ttls.get(kind, 0)
+                    if ttl > 0:
+                        self._store(cache_key, flight.value, ttl)
+                del self._flights[cache_key]
+            flight.event.set()
+        return flight.value
+
+    def invalidate(self, kind, key):
+        """Drop a single entry if present."""
+        with self._lock:
+            self._entries.pop((kind, key), None)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries
+            }
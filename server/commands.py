@@ -0,0 +1,72 @@
+# commands.py
+import click
+import os
+import sys
+
+import alpha_vantage
+from models import db, PortfolioDailyValue
+from symbol_index import SymbolIndex
+from snapshots import refresh_all_daily_values, refresh_daily_values
+from migrations import upgrade, check_query_plans
+
+
+def register_commands(app):
+    """Register the maintenance commands run with `flask <command>`."""
+
+    @app.cli.command("refresh-daily-values")
+    @click.option("--portfolio", "portfolio_id", default=None, help="Only refresh this portfolio.")
+    @click.option("--rebuild", is_flag=True, help="Drop the stored values and recompute them from scratch.")
+    def refresh_daily_values_command(portfolio_id, rebuild):
+        """Store end-of-day portfolio values up to yesterday (run nightly)."""
+        if rebuild:
+            rows = PortfolioDailyValue.query
+            if portfolio_id:
+                rows = rows.filter_by(portfolio_id=portfolio_id)
+            rows.delete(synchronize_session=False)
+            db.session.commit()
+        if portfolio_id:
+            days = refresh_daily_values(portfolio_id)
+            click.echo(f"Stored {days} daily values for portfolio {portfolio_id}")
+        else:
+            summary = refresh_all_daily_values()
+            click.echo(
+                f"Stored {summary['days']} daily values for {summary['portfolios']} portfolios "
+                f"({summary['failures']} failed)"
+            )
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade_command():
+        """Create missing tables and apply pending schema migrations."""
+        applied = upgrade()
+        click.echo(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command():
+        """EXPLAIN the hot queries and exit non-zero if any uses a sequential scan."""
+        failures = 0
+        for name, seq_scans in check_query_plans().items():
+            if seq_scans:
+                failures += 1
+                click.echo(f"FAIL  {name}: seq scan on {', '.join(seq_scans)}")
+            else:
+                click.echo(f"ok    {name}")
+        if failures:
+            sys.exit(1)
+
+    @app.cli.command("download-symbol-listing")
+    @click.option("--path", default=None, help="Where to write the listing (defaults to SYMBOL_LISTING_PATH).")
+    @click.option("--if-missing", is_flag=True, help="Do nothing if the listing file already exists.")
+    def download_symbol_listing_command(path, if_missing):
+        """Fetch the active US listings that back local symbol search."""
+        path = path or app.config['SYMBOL_LISTING_PATH']
+        if if_missing and os.path.exists(path):
+            click.echo(f"{path} already exists")
+            return
+        text = alpha_vantage.listing_status_csv()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write then rename, so a running server's hot reload never reads half a file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        click.echo(f"Wrote {SymbolIndex(path).load()} active symbols to {path}")
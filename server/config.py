@@ -6,3 +6,95 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     FIREBASE_CREDENTIALS = os.getenv('FIREBASE_CREDENTIALS', 'path/to/default.json')
     ALPHAVANTAGE_API_KEY = os.environ['STOCKR_ALPHA_ID']
+
+    # Quote cache (seconds per data kind)
+    QUOTE_CACHE_TTL_PRICE = int(os.getenv('QUOTE_CACHE_TTL_PRICE', 60))
+    QUOTE_CACHE_TTL_FUNDAMENTALS = int(os.getenv('QUOTE_CACHE_TTL_FUNDAMENTALS', 900))
+    QUOTE_CACHE_TTL_SECTOR = int(os.getenv('QUOTE_CACHE_TTL_SECTOR', 86400))
+    QUOTE_CACHE_MAX_ENTRIES = int(os.getenv('QUOTE_CACHE_MAX_ENTRIES', 2048))
+
+    # Refresh window for rows in the ticker_fundamentals table
+    TICKER_FUNDAMENTALS_MAX_AGE = int(os.getenv('TICKER_FUNDAMENTALS_MAX_AGE', 900))
+
+    # Shared worker pool for concurrent upstream lookups
+    FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', 8))
+    WATCHLIST_FETCH_DEADLINE = float(os.getenv('WATCHLIST_FETCH_DEADLINE', 10))
+
+    # Max symbols per multi-ticker yf.download call
+    HISTORY_DOWNLOAD_CHUNK_SIZE = int(os.getenv('HISTORY_DOWNLOAD_CHUNK_SIZE', 50))
+
+    # Alpha Vantage response cache TTLs (seconds per API function)
+    ALPHAVANTAGE_CACHE_TTLS = {
+        'TIME_SERIES_WEEKLY_ADJUSTED': int(os.getenv('ALPHAVANTAGE_TTL_WEEKLY_SERIES', 6 * 3600)),
+        'DIGITAL_CURRENCY_DAILY': int(os.getenv('ALPHAVANTAGE_TTL_DAILY_SERIES', 3600)),
+        'INCOME_STATEMENT': int(os.getenv('ALPHAVANTAGE_TTL_STATEMENTS', 24 * 3600)),
+        'BALANCE_SHEET': int(os.getenv('ALPHAVANTAGE_TTL_STATEMENTS', 24 * 3600)),
+        'CASH_FLOW': int(os.getenv('ALPHAVANTAGE_TTL_STATEMENTS', 24 * 3600)),
+        'SYMBOL_SEARCH': int(os.getenv('ALPHAVANTAGE_TTL_SYMBOL_SEARCH', 24 * 3600)),
+        'NEWS_SENTIMENT': int(os.getenv('ALPHAVANTAGE_TTL_NEWS_SENTIMENT', 300)),
+    }
+    ALPHAVANTAGE_CACHE_MAX_ENTRIES = int(os.getenv('ALPHAVANTAGE_CACHE_MAX_ENTRIES', 1024))
+
+    # Alpha Vantage key quota shared by every request in a worker process
+    ALPHAVANTAGE_REQUESTS_PER_MINUTE = float(os.getenv('ALPHAVANTAGE_REQUESTS_PER_MINUTE', 5))
+    ALPHAVANTAGE_BURST = int(os.getenv('ALPHAVANTAGE_BURST', 5))
+
+    # Outbound HTTP client defaults
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 10))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 2))
+    HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', 0.25))
+    HTTP_MAX_PER_HOST = int(os.getenv('HTTP_MAX_PER_HOST', 10))
+
+    # Local symbol search listing (CSV with symbol,name[,exchange,assetType,status])
+    SYMBOL_LISTING_PATH = os.getenv('SYMBOL_LISTING_PATH', os.path.join(os.path.dirname(__file__), 'data', 'listing_status.csv'))
+    SYMBOL_INDEX_RELOAD_INTERVAL = float(os.getenv('SYMBOL_INDEX_RELOAD_INTERVAL', 30))
+
+    # Background refresh interval for the shared market news snapshot
+    MARKET_NEWS_REFRESH_SECONDS = float(os.getenv('MARKET_NEWS_REFRESH_SECONDS', 300))
+
+    # Market benchmarks shown to the assistant, as "NAME=SYMBOL" pairs
+    BENCHMARK_INDICES = dict(
+        pair.split('=', 1) for pair in
+        os.getenv('BENCHMARK_INDICES', 'S&P500=^GSPC,NASDAQ=^IXIC,DOW=^DJI').split(',') if '=' in pair
+    )
+    BENCHMARK_REFRESH_SECONDS = float(os.getenv('BENCHMARK_REFRESH_SECONDS', 900))
+
+    # Rows per executemany batch when bulk-inserting uploaded transactions
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 1000))
+
+    # Background CSV ingest jobs
+    INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 2000))
+    INGEST_MAX_WORKERS = int(os.getenv('INGEST_MAX_WORKERS', 2))
+    INGEST_MAX_ERRORS = int(os.getenv('INGEST_MAX_ERRORS', 100))
+    INGEST_SPOOL_DIR = os.getenv('INGEST_SPOOL_DIR')  # Defaults to the system temp dir
+
+    # CSV upload parsing: rows sampled to infer column formats, rows per vectorized chunk
+    CSV_INFER_SAMPLE_ROWS = int(os.getenv('CSV_INFER_SAMPLE_ROWS', 200))
+    CSV_PARSE_CHUNK_SIZE = int(os.getenv('CSV_PARSE_CHUNK_SIZE', 5000))
+
+    # Live valuation in get_portfolio: oldest cached quote accepted (seconds,
+    # overridable per request with ?max_age=) and how long to wait for scrapes
+    PORTFOLIO_QUOTE_MAX_AGE = float(os.getenv('PORTFOLIO_QUOTE_MAX_AGE', 60))
+    PORTFOLIO_QUOTE_DEADLINE = float(os.getenv('PORTFOLIO_QUOTE_DEADLINE', 5))
+
+    # Transaction list paging and export
+    TRANSACTIONS_PAGE_SIZE = int(os.getenv('TRANSACTIONS_PAGE_SIZE', 15))
+    TRANSACTIONS_MAX_PAGE_SIZE = int(os.getenv('TRANSACTIONS_MAX_PAGE_SIZE', 200))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+    # Verified Firebase ID tokens kept per worker (entries also expire with the token)
+    AUTH_TOKEN_CACHE_MAX_TTL = int(os.getenv('AUTH_TOKEN_CACHE_MAX_TTL', 3600))
+    AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', 10000))
+
+    # Per-request SQL statement counting (X-Query-Count header and a warning log)
+    QUERY_COUNT_ENABLED = os.getenv('QUERY_COUNT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    QUERY_COUNT_WARN_THRESHOLD = int(os.getenv('QUERY_COUNT_WARN_THRESHOLD', 10))
+
+    # Cached return and risk results (keys include a transactions fingerprint)
+    PERFORMANCE_CACHE_TTL = int(os.getenv('PERFORMANCE_CACHE_TTL', 3600))
+    PERFORMANCE_CACHE_MAX_ENTRIES = int(os.getenv('PERFORMANCE_CACHE_MAX_ENTRIES', 1024))
+
+    # Risk analytics: trailing calendar days of closes and the VaR/CVaR level
+    RISK_LOOKBACK_DAYS = int(os.getenv('RISK_LOOKBACK_DAYS', 365))
+    RISK_VAR_CONFIDENCE = float(os.getenv('RISK_VAR_CONFIDENCE', 0.95))
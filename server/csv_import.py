@@ -0,0 +1,274 @@
+# csv_import.py
+import csv
+import re
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+HEADER_MAPPING = {
+    "ticker": ["ticker", "symbol", "security", "stock"],
+    "shares": ["shares", "quantity", "units", "amount"],
+    "price": ["price", "cost", "unit price", "price per share"],
+    "transaction_type": ["transaction type", "type", "action", "activity"],
+    "date": ["date", "trade date", "transaction date"]
+}
+
+# Tried in order; the first format that fits the most sampled values wins
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d-%m-%y"]
+
+# Columns searched for a ticker (usually 1-5 uppercase letters) when no
+# ticker column is mapped, e.g. "Symbol / Description"
+TICKER_SOURCE_KEYWORDS = ["symbol", "description", "security"]
+TICKER_PATTERN = r'\b([A-Z]{1,5})\b'
+
+_PLAIN_NUMBER_RE = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+_DECIMAL_COMMA_RE = re.compile(r',\d{1,2}$|,\d{4,}$|\.\d{3},')
+_DECIMAL_POINT_RE = re.compile(r'\.\d{1,2}$|\.\d{4,}$|,\d{3}\.')
+_NON_NUMERIC_RE = r'[^0-9.,\-]'
+
+OUTPUT_COLUMNS = ["ticker", "shares", "price", "transaction_type", "date"]
+
+
+class NumberFormat:
+    """
+    How a numeric column is written, inferred once from sampled values.
+
+    Args:
+        plain (bool): Every value is a plain float literal
+        decimal_comma (bool): "1.234,56" style instead of "1,234.56"
+    """
+
+    def __init__(self, plain=True, decimal_comma=False):
+        self.plain = plain
+        self.decimal_comma = decimal_comma
+
+    def parse(self, series):
+        """Convert a column of strings to absolute float values (NaN if unparseable)."""
+        text = series.str.strip()
+        if not self.plain:
+            # Drops currency symbols, codes, spaces and the parentheses of
+            # accounting negatives; the sign is discarded below anyway
+            text = text.str.replace(_NON_NUMERIC_RE, "", regex=True)
+            if self.decimal_comma:
+                text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+            else:
+                text = text.str.replace(",", "", regex=False)
+        return pd.to_numeric(text, errors="coerce").astype(float).abs()
+
+    def __repr__(self):
+        return f"<NumberFormat plain={self.plain} decimal_comma={self.decimal_comma}>"
+
+
+class CsvLayout:
+    """
+    Everything phase one learns about a file, applied to every chunk in phase two.
+
+    Args:
+        broker (str): "questrade", "wealthsimple" or "generic"
+        columns (dict): Target field -> CSV header
+        ticker_sources (list): Headers to extract a ticker from, in order, when
+                               no ticker column is mapped
+        date_format (str): strptime format for the date column, or None
+        number_formats (dict): "shares"/"price" -> NumberFormat
+    """
+
+    def __init__(self, broker, columns, ticker_sources, date_format, number_formats):
+        self.broker = broker
+        self.columns = columns
+        self.ticker_sources = ticker_sources
+        self.date_format = date_format
+        self.number_formats = number_formats
+
+    def __repr__(self):
+        return (f"<CsvLayout broker={self.broker} columns={self.columns} "
+                f"ticker_sources={self.ticker_sources} date_format={self.date_format} "
+                f"number_formats={self.number_formats}>")
+
+
+def _matches_date(value, fmt):
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def infer_date_format(values):
+    """Return the format in DATE_FORMATS that parses the most values, or None."""
+    values = [value for value in values if value]
+    best_format, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = sum(1 for value in values if _matches_date(value, fmt))
+        if count > best_count:
+            best_format, best_count = fmt, count
+    return best_format
+
+
+def infer_number_format(values):
+    """Infer a NumberFormat from sampled cells of a numeric column."""
+    values = [value.strip() for value in values if value and value.strip()]
+    if all(_PLAIN_NUMBER_RE.match(value) for value in values):
+        return NumberFormat()
+    decimal_comma = (any(_DECIMAL_COMMA_RE.search(value) for value in values) and
+                     not any(_DECIMAL_POINT_RE.search(value) for value in values))
+    return NumberFormat(plain=False, decimal_comma=decimal_comma)
+
+
+def infer_layout(fieldnames, sample_rows):
+    """
+    Phase one: work out the broker layout and per-column formats from a sample.
+
+    Args:
+        fieldnames (list): The CSV headers
+        sample_rows (list): The first rows of the file, as dicts keyed by header
+
+    Returns:
+        CsvLayout: The layout to apply to the whole file
+    """
+    # Map each target field to the first header that matches one of its names
+    columns = {}
+    for target_field, possible_names in HEADER_MAPPING.items():
+        for header in fieldnames:
+            if any(possible_name.lower() == header.lower() for possible_name in possible_names):
+                columns[target_field] = header
+                break
+
+    # Special case handling for brokerages with unique formats
+    header_line = ",".join(fieldnames)
+    if "CurrencyCode_Group_Account" in header_line and "ticker" in columns:
+        broker = "questrade"
+        if "Action" in fieldnames:
+            columns["transaction_type"] = "Action"
+        if "Trade Date" in fieldnames:
+            columns["date"] = "Trade Date"
+    elif "Activity Type" in header_line and any("Symbol" in header for header in fieldnames):
+        broker = "wealthsimple"
+    else:
+        broker = "generic"
+
+    ticker_sources = []
+    if "ticker" not in columns:
+        ticker_sources = [header for header in fieldnames
+                          if any(keyword in header.lower() for keyword in TICKER_SOURCE_KEYWORDS)]
+
+    def sample(target_field):
+        header = columns.get(target_field)
+        return [row.get(header) or "" for row in sample_rows] if header else []
+
+    date_format = infer_date_format(sample("date")) if "date" in columns else None
+    number_formats = {field: infer_number_format(sample(field)) for field in ("shares", "price")}
+    return CsvLayout(broker, columns, ticker_sources, date_format, number_formats)
+
+
+def _parse_dates(series, date_format):
+    """Parse a date column with the inferred format, trying the others only for leftovers."""
+    parsed = pd.to_datetime(series, format=date_format, errors="coerce") if date_format \
+        else pd.Series(pd.NaT, index=series.index)
+    leftovers = parsed.isna() & (series != "")
+    for fmt in DATE_FORMATS:
+        if not leftovers.any():
+            break
+        if fmt == date_format:
+            continue
+        parsed[leftovers] = pd.to_datetime(series[leftovers], format=fmt, errors="coerce")
+        leftovers = parsed.isna() & (series != "")
+    dates = pd.Series(parsed.dt.date, index=series.index, dtype=object)
+    return dates.where(parsed.notna(), None)
+
+
+def convert_chunk(frame, layout):
+    """
+    Phase two: convert a chunk of raw string cells into transaction columns.
+
+    Args:
+        frame (pd.DataFrame): Raw CSV rows, every cell a string
+        layout (CsvLayout): Output of infer_layout
+
+    Returns:
+        pd.DataFrame: Valid rows only, with ticker, shares, price,
+                      transaction_type and date columns
+    """
+    columns = layout.columns
+    empty = pd.Series("", index=frame.index)
+
+    if "ticker" in columns:
+        ticker = frame[columns["ticker"]]
+    else:
+        ticker = pd.Series(np.nan, index=frame.index, dtype=object)
+        for header in layout.ticker_sources:
+            ticker = ticker.combine_first(frame[header].str.extract(TICKER_PATTERN, expand=False))
+        ticker = ticker.fillna("")
+
+    shares = layout.number_formats["shares"].parse(frame[columns["shares"]]).fillna(0.0) \
+        if "shares" in columns else pd.Series(0.0, index=frame.index)
+    price = layout.number_formats["price"].parse(frame[columns["price"]]).fillna(0.0) \
+        if "price" in columns else pd.Series(0.0, index=frame.index)
+
+    if "transaction_type" in columns:
+        is_buy = frame[columns["transaction_type"]].str.lower().str.contains("buy|purchase", regex=True)
+        transaction_type = pd.Series(np.where(is_buy, "buy", "sell"), index=frame.index)
+    else:
+        # Default to buy if not specified
+        transaction_type = pd.Series("buy", index=frame.index)
+
+    if "date" in columns:
+        date = _parse_dates(frame[columns["date"]], layout.date_format)
+    else:
+        date = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+
+    result = pd.DataFrame({
+        "ticker": ticker.where(ticker.notna(), empty),
+        "shares": shares,
+        "price": price,
+        "transaction_type": transaction_type,
+        "date": date
+    })
+    return result[(result["ticker"] != "") & (result["shares"] > 0) & (result["price"] > 0)]
+
+
+def iter_csv_transactions(stream, sample_size=None, chunk_size=None):
+    """
+    Parse a broker CSV in two phases, yielding one transaction dict per valid row.
+
+    The first sample_size rows decide the layout and column formats once;
+    the file is then read in chunks of chunk_size rows and each chunk is
+    converted with vectorized pandas operations. The stream must be seekable.
+
+    Args:
+        stream: Seekable text stream positioned anywhere
+        sample_size (int, optional): Rows used for inference
+        chunk_size (int, optional): Rows converted per pandas chunk
+
+    Yields:
+        dict: ticker, shares, price, transaction_type and date (a date or None)
+    """
+    sample_size = sample_size or Config.CSV_INFER_SAMPLE_ROWS
+    chunk_size = chunk_size or Config.CSV_PARSE_CHUNK_SIZE
+
+    stream.seek(0)
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        return
+    fieldnames = list(reader.fieldnames)
+    layout = infer_layout(fieldnames, list(islice(reader, sample_size)))
+
+    stream.seek(0)
+    chunks = pd.read_csv(stream, dtype=str, keep_default_na=False, index_col=False,
+                         chunksize=chunk_size, on_bad_lines="skip")
+    for chunk in chunks:
+        chunk = chunk.fillna("")
+        result = convert_chunk(chunk, layout)
+        # Column lists avoid DataFrame.to_dict's per-cell boxing
+        for ticker, shares, price, transaction_type, trade_date in zip(
+                *(result[column].tolist() for column in OUTPUT_COLUMNS)):
+            yield {
+                "ticker": ticker,
+                "shares": shares,
+                "price": price,
+                "transaction_type": transaction_type,
+                "date": trade_date
+            }
@@ -1,20 +1,45 @@
 # helpers.py
 import pandas as pd
+import base64
 import json
 import csv
-import re
 import openai
 import time
 import os
 import requests
-import yfinance as yf
+import uuid
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from io import StringIO
 from finvizfinance.quote import finvizfinance
 from finvizfinance.screener.ticker import Ticker
 from finvizfinance.calendar import Calendar
-from models import db, User, Watchlist, Portfolio, Transaction, PortfolioHolding, UserThread
+from finvizfinance.news import News
+from models import db, User, Watchlist, Portfolio, Transaction, PortfolioHolding, UserThread, TickerFundamentals
 from datetime import datetime, timedelta
+from sqlalchemy import select, update, func, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config import Config
+from cache import TTLCache
+from price_store import get_close_prices
+from csv_import import iter_csv_transactions
+from snapshots import invalidate_daily_values
+
+# Shared cache for finviz quote lookups, so every user holding the same ticker
+# shares one scrape per TTL window.
+quote_cache = TTLCache(
+    ttls={
+        "price": Config.QUOTE_CACHE_TTL_PRICE,
+        "fundamentals": Config.QUOTE_CACHE_TTL_FUNDAMENTALS,
+        "sector": Config.QUOTE_CACHE_TTL_SECTOR
+    },
+    max_entries=Config.QUOTE_CACHE_MAX_ENTRIES
+)
+
+# Bounded pool shared by all requests in this process, so concurrent lookups
+# never put more than FANOUT_MAX_WORKERS requests in flight upstream.
+fanout_executor = ThreadPoolExecutor(max_workers=Config.FANOUT_MAX_WORKERS, thread_name_prefix="fanout")
 
 def convert_data(data):
     """Convert a pandas DataFrame to a dictionary if needed."""
@@ -33,107 +58,83 @@ def safe_convert(value):
 
 def parse_csv_with_mapping(stream):
     """Parse CSV data using flexible header mapping"""
-    header_mapping = {
-        "ticker": ["ticker", "symbol", "security", "stock"],
-        "shares": ["shares", "quantity", "units", "amount"],
-        "price": ["price", "cost", "unit price", "price per share"],
-        "transaction_type": ["transaction type", "type", "action", "activity"],
-        "date": ["date", "trade date", "transaction date"]
-    }
+    return list(iter_csv_with_mapping(stream))
 
-    stream.seek(0)
-
-    # Read the first line to get headers
-    header_line = stream.readline().strip()
-    stream.seek(0)
-    csv_reader = csv.DictReader(stream)
-
-    # Create a mapping from actual CSV headers to our standardized field names
-    field_map = {}
-    for target_field, possible_names in header_mapping.items():
-        for header in csv_reader.fieldnames:
-            if any(possible_name.lower() == header.lower() for possible_name in possible_names):
-                field_map[header] = target_field
-                break
-
-    # Special case handling for brokerages with unique formats
-    if "CurrencyCode_Group_Account" in header_line and "Symbol" in field_map:
-        # Questrade format detected
-        field_map["Action"] = "transaction_type"
-        field_map["Trade Date"] = "date"
-
-    elif "Activity Type" in header_line and any("Symbol" in h for h in csv_reader.fieldnames):
-        # Wealthsimple format detected
-        # May need special handling for symbol extraction
-        pass
-
-    # Process rows with the field mapping
-    transactions = []
-    for row in csv_reader:
-        transaction_data = {}
-
-        # Map fields using our field_map
-        for csv_field, target_field in field_map.items():
-            if csv_field in row:
-                transaction_data[target_field] = row[csv_field]
-
-        # Special case: Extract ticker from "Symbol / Description" type fields
-        if "ticker" not in transaction_data:
-            for field in row.keys():
-                if any(keyword in field.lower() for keyword in ["symbol", "description", "security"]):
-                    # Try to extract ticker pattern (usually 1-5 uppercase letters)
-                    symbol_desc = row[field]
-                    ticker_match = re.search(r'\b[A-Z]{1,5}\b', symbol_desc)
-                    if ticker_match:
-                        transaction_data["ticker"] = ticker_match.group(0)
-                        break
-
-        # Process transaction type
-        if "transaction_type" in transaction_data:
-            tx_type = transaction_data["transaction_type"].lower()
-            transaction_data["transaction_type"] = "buy" if any(
-                word in tx_type for word in ["buy", "purchase"]) else "sell"
-        else:
-            # Default to buy if not specified
-            transaction_data["transaction_type"] = "buy"
-
-        # Process date
-        if "date" in transaction_data:
-            date_str = transaction_data["date"]
-            # Try different date formats
-            date_formats = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d-%m-%y"]
-            for fmt in date_formats:
-                try:
-                    transaction_data["date"] = datetime.strptime(date_str, fmt).date()
-                    break
-                except ValueError:
-                    continue
-
-        # Process shares and price (ensure they're positive numbers)
-        if "shares" in transaction_data:
-            try:
-                transaction_data["shares"] = abs(float(transaction_data["shares"]))
-            except (ValueError, TypeError):
-                transaction_data["shares"] = 0
 
-        if "price" in transaction_data:
+def iter_csv_with_mapping(stream):
+    """
+    Parse CSV data using flexible header mapping, one row at a time.
+
+    The header mapping, broker layout and date/number formats are inferred
+    once from a sample of rows, then applied to the file chunk by chunk (see
+    csv_import), so a large upload can be processed from disk in constant
+    memory. The stream must be seekable.
+    """
+    return iter_csv_transactions(stream)
+
+def normalize_upload_row(transaction):
+    """
+    Turn a parsed CSV transaction into a row for bulk_insert_transactions.
+
+    Args:
+        transaction (dict): Output of parse_csv_with_mapping
+
+    Returns:
+        tuple: (row, None) for a valid transaction, or (None, error message)
+    """
+    # Normalize ticker.
+    ticker = transaction.get("ticker", "").strip().upper()
+
+    try:
+        shares = float(transaction.get("shares", 0))
+        price = float(transaction.get("price", 0))
+    except ValueError as e:
+        return None, f"Invalid numeric values in transaction: {transaction}. Error: {str(e)}"
+
+    transaction_type = transaction.get("transaction_type", "buy").strip().lower()
+
+    # Process the date if provided. We'll use it to override created_at.
+    transaction_date = transaction.get("date")
+    created_at_val = None
+    if transaction_date:
+        # If the date is already a date/datetime object, combine with midnight if needed.
+        if isinstance(transaction_date, datetime):
+            created_at_val = transaction_date
+        elif hasattr(transaction_date, "year"):
+            created_at_val = datetime.combine(transaction_date, datetime.min.time())
+        else:
+            # Otherwise, try parsing from string (assumes formats like YYYY-MM-DD).
             try:
-                transaction_data["price"] = abs(float(transaction_data["price"]))
-            except (ValueError, TypeError):
-                transaction_data["price"] = 0
+                created_at_val = datetime.strptime(transaction_date, "%Y-%m-%d")
+            except Exception:
+                # If parsing fails, leave created_at_val as None (default will be used).
+                pass
 
-        # Validate and add the transaction
-        if (transaction_data.get("ticker") and
-                transaction_data.get("shares", 0) > 0 and
-                transaction_data.get("price", 0) > 0):
-            transactions.append(transaction_data)
+    if not ticker or shares <= 0 or price <= 0:
+        return None, f"Invalid data in transaction: {transaction}"
 
-    return transactions
+    return {
+        "ticker": ticker,
+        "shares": shares,
+        "price": price,
+        "transaction_type": transaction_type,
+        "created_at": created_at_val
+    }, None
 
 def fetch_stock_data(ticker):
     ticker = ticker.upper()
+    return quote_cache.get_or_load("fundamentals", ticker, lambda: _load_stock_data(ticker))
+
+def _load_stock_data(ticker):
+    errors = {}
+    stock_data = load_ticker_fundamentals([ticker], errors).get(ticker)
+    if stock_data is None:
+        raise errors[ticker]
+    return stock_data
+
+def _scrape_stock_data(ticker):
+    """Scrape the finviz quote page once and keep only the fields we serve."""
     stock = finvizfinance(ticker)
-    stock_fundament = convert_data(stock.ticker_fundament())
     stock_description = convert_data(stock.ticker_description())
     fundamentals_data = convert_data(stock.ticker_fundament())
     if isinstance(fundamentals_data, list) and len(fundamentals_data) > 0:
@@ -166,37 +167,188 @@ def fetch_stock_data(ticker):
     }
     return {
         "ticker": ticker,
-        "description": stock_description,
-        "fundamentals": filtered_fundamentals
+        "description": safe_convert(stock_description),
+        "fundamentals": {key: safe_convert(value) for key, value in filtered_fundamentals.items()}
     }
 
+def load_ticker_fundamentals(tickers, errors=None):
+    """
+    Load fundamentals for several tickers from the ticker_fundamentals table,
+    scraping finviz only for tickers whose row is missing or stale.
+
+    Args:
+        tickers (list): Ticker symbols
+        errors (dict, optional): Filled with ticker -> exception for tickers
+                                 that could not be loaded at all
+
+    Returns:
+        dict: Map of ticker to {"ticker", "description", "fundamentals"}.
+              A ticker whose scrape fails is served from its stale row if one
+              exists, and left out otherwise.
+    """
+    tickers = sorted(set(ticker.upper() for ticker in tickers))
+    if not tickers:
+        return {}
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.TICKER_FUNDAMENTALS_MAX_AGE)
+    rows = {row.ticker: row for row in TickerFundamentals.query.filter(TickerFundamentals.ticker.in_(tickers)).all()}
+
+    result = {}
+    refreshed = []
+    for ticker in tickers:
+        row = rows.get(ticker)
+        if row and row.fetched_at >= cutoff:
+            result[ticker] = {"ticker": ticker, "description": row.description, "fundamentals": row.fundamentals}
+            continue
+        try:
+            result[ticker] = _scrape_stock_data(ticker)
+            refreshed.append(result[ticker])
+        except Exception as e:
+            if not row:
+                print(f"Error fetching fundamentals for {ticker}: {e}")
+                if errors is not None:
+                    errors[ticker] = e
+                continue
+            print(f"Error refreshing fundamentals for {ticker}, serving stale row: {e}")
+            result[ticker] = {"ticker": ticker, "description": row.description, "fundamentals": row.fundamentals}
+
+    if refreshed:
+        now = datetime.utcnow()
+        stmt = pg_insert(TickerFundamentals).values([{
+            "ticker": data["ticker"],
+            "fundamentals": data["fundamentals"],
+            "description": data["description"],
+            "fetched_at": now
+        } for data in refreshed])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[TickerFundamentals.ticker],
+            set_={
+                "fundamentals": stmt.excluded.fundamentals,
+                "description": stmt.excluded.description,
+                "fetched_at": stmt.excluded.fetched_at
+            }
+        )
+        try:
+            db.session.execute(stmt)
+            db.session.commit()
+        except Exception as e:
+            print(f"Error saving fundamentals snapshot: {e}")
+            db.session.rollback()
+
+    return result
+
+def fan_out(app, func, items, deadline):
+    """
+    Call func(item) for every item on the shared pool and wait up to deadline seconds.
+
+    Each call runs inside its own app context so it can use the database.
+    Calls still queued when the deadline passes are cancelled; calls already
+    running are left to finish in the background (and still fill the cache).
+
+    Args:
+        app (Flask): The application, used to push an app context per call
+        func (callable): Function taking a single item
+        items (list): Items to process
+        deadline (float): Seconds to wait for all results
+
+    Returns:
+        list: (item, result, error) tuples in input order; error is None on success
+    """
+    def run(item):
+        with app.app_context():
+            return func(item)
+
+    futures = [(item, fanout_executor.submit(run, item)) for item in items]
+    wait([future for _, future in futures], timeout=deadline)
+
+    results = []
+    for item, future in futures:
+        if not future.done():
+            future.cancel()
+            results.append((item, None, TimeoutError(f"Timed out after {deadline:g}s")))
+        elif future.exception() is not None:
+            results.append((item, None, future.exception()))
+        else:
+            results.append((item, future.result(), None))
+    return results
+
+def _scrape_market_price(ticker):
+    fundamentals_data = finvizfinance(ticker).ticker_fundament()
+    if not fundamentals_data:
+        return None
+    return fundamentals_data.get("Price", "N/A")
+
 def fetch_market_price(ticker):
     try:
         ticker = ticker.upper()
-        stock = finvizfinance(ticker)
-        fundamentals_data = stock.ticker_fundament()
-        if not fundamentals_data:
+        market_price = quote_cache.get_or_load("price", ticker, lambda: _scrape_market_price(ticker))
+        if market_price is None:
             return {"ticker": ticker, "market_price": "N/A", "error": "No data found"}
-        market_price = fundamentals_data.get("Price", "N/A")
         return {"ticker": ticker, "market_price": market_price}
     except Exception as e:
         print(f"Error fetching market price for {ticker}: {e}")
         return {"ticker": ticker, "market_price": "N/A", "error": str(e)}
 
-def recalc_portfolio(portfolio_id, ticker):
-    transactions = Transaction.query.filter_by(portfolio_id=portfolio_id, ticker=ticker).all()
-    total_shares = 0
-    total_cost = 0.0
-    for txn in transactions:
-        txn_shares = float(txn.shares)
-        txn_price = float(txn.price)
-        if txn.transaction_type.lower() == 'buy':
-            total_shares += txn_shares
-            total_cost += txn_shares * txn_price
-        elif txn.transaction_type.lower() == 'sell' and total_shares >= txn_shares:
-            avg_cost_per_share = total_cost / total_shares if total_shares > 0 else 0
-            total_shares -= txn_shares
-            total_cost -= txn_shares * avg_cost_per_share
+def _parse_price(value):
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+def fetch_market_prices(app, tickers, max_age=None, deadline=None):
+    """
+    Look up current prices for many tickers in one batch.
+
+    Prices cached within max_age seconds are served straight from the quote
+    cache; only the rest are scraped, concurrently on the shared pool.
+
+    Args:
+        app (Flask): The application, for the fan-out app contexts
+        tickers (iterable): Ticker symbols
+        max_age (float, optional): Oldest cached price to accept, in seconds.
+                                   Never older than the price TTL.
+        deadline (float, optional): Seconds to wait for the scrapes
+
+    Returns:
+        tuple: ({ticker: price}, {ticker: error}) where price is a float or
+               None if unavailable
+    """
+    tickers = sorted(set(ticker.upper() for ticker in tickers))
+    deadline = deadline or Config.PORTFOLIO_QUOTE_DEADLINE
+    cached = quote_cache.get_many("price", tickers, max_age=max_age)
+    prices = {ticker: _parse_price(price) for ticker, price in cached.items()}
+    errors = {}
+
+    def load(ticker):
+        return quote_cache.get_or_load("price", ticker, lambda: _scrape_market_price(ticker), max_age=max_age)
+
+    missing = [ticker for ticker in tickers if ticker not in cached]
+    for ticker, price, error in fan_out(app, load, missing, deadline):
+        prices[ticker] = _parse_price(price) if error is None else None
+        if error is not None:
+            errors[ticker] = str(error)
+    for ticker, price in prices.items():
+        if price is None and ticker not in errors:
+            errors[ticker] = "No data found"
+    return prices, errors
+
+def apply_trade(total_shares, total_cost, transaction_type, txn_shares, txn_price):
+    """
+    Apply one trade to a running (shares, cost) position using average cost.
+
+    Both the incremental and the replay paths go through this function, so
+    they always agree. A sell larger than the position is ignored.
+
+    Returns:
+        tuple: The new (total_shares, total_cost)
+    """
+    if transaction_type.lower() == 'buy':
+        return total_shares + txn_shares, total_cost + txn_shares * txn_price
+    if transaction_type.lower() == 'sell' and total_shares >= txn_shares:
+        avg_cost_per_share = total_cost / total_shares if total_shares > 0 else 0
+        return total_shares - txn_shares, total_cost - txn_shares * avg_cost_per_share
+    return total_shares, total_cost
+
+def _write_holding(portfolio_id, ticker, total_shares, total_cost):
     new_book_value = max(0, total_cost)
     new_avg_cost = (new_book_value / total_shares) if total_shares > 0 else 0
     portfolio_entry = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker=ticker).first()
@@ -217,24 +369,405 @@ def recalc_portfolio(portfolio_id, ticker):
                 book_value=new_book_value
             )
             db.session.add(new_portfolio_entry)
+
+def reserve_transaction_seqs(portfolio_id, count=1):
+    """
+    Hand out the next count insertion sequence numbers for a portfolio.
+
+    The counter lives on the portfolio row, so the UPDATE also holds that
+    row's lock until commit and concurrent writers to one portfolio take
+    their turn. Does not commit.
+
+    Returns:
+        int: The first reserved number; the rest follow consecutively
+    """
+    with db.session.no_autoflush:
+        last = db.session.execute(
+            update(Portfolio)
+            .where(Portfolio.id == portfolio_id)
+            .values(transaction_seq=Portfolio.transaction_seq + count)
+            .returning(Portfolio.transaction_seq)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+    return last - count + 1
+
+def recalc_portfolio(portfolio_id, ticker, since=None):
+    """
+    Rebuild a holding by replaying its transactions in (created_at, seq) order.
+
+    With since, only transactions on or after that datetime are replayed,
+    starting from the position stored on the last transaction before it. This
+    is the path for backdated inserts and deletes.
+
+    Args:
+        portfolio_id (str): The portfolio
+        ticker (str): The ticker to rebuild
+        since (datetime, optional): Earliest transaction affected by the change
+    """
+    # A delete reserves no sequence number, so take one to move the
+    # portfolio's transactions version on; stored daily values from the
+    # change forward are now stale
+    reserve_transaction_seqs(portfolio_id)
+    invalidate_daily_values(portfolio_id, since)
+
+    transactions = Transaction.query.filter_by(portfolio_id=portfolio_id, ticker=ticker)
+    total_shares = 0.0
+    total_cost = 0.0
+    if since is not None:
+        anchor = transactions.filter(Transaction.created_at < since) \
+            .order_by(Transaction.created_at.desc(), Transaction.seq.desc()).first()
+        if anchor is None:
+            since = None
+        elif anchor.position_shares is None:
+            # Rows written before positions were tracked need a full replay
+            since = None
+        else:
+            total_shares = anchor.position_shares
+            total_cost = anchor.position_cost
+            transactions = transactions.filter(Transaction.created_at >= since)
+
+    for txn in transactions.order_by(Transaction.created_at, Transaction.seq).all():
+        total_shares, total_cost = apply_trade(
+            total_shares, total_cost, txn.transaction_type, float(txn.shares), float(txn.price))
+        txn.position_shares = total_shares
+        txn.position_cost = total_cost
+    _write_holding(portfolio_id, ticker, total_shares, total_cost)
+    db.session.commit()
+
+def apply_new_transaction(txn):
+    """
+    Update the holding for a just-added transaction.
+
+    The transaction gets the portfolio's next insertion sequence number, so
+    it replays after any earlier transaction with the same created_at. If it
+    is the latest for its ticker, its trade is applied to the position
+    stored on the previous transaction in O(1). A backdated transaction
+    replays from its date forward instead.
+
+    Args:
+        txn (Transaction): A transaction already added to the session
+    """
+    txn.seq = reserve_transaction_seqs(txn.portfolio_id)
+    db.session.flush()
+    latest = Transaction.query.filter(
+        Transaction.portfolio_id == txn.portfolio_id,
+        Transaction.ticker == txn.ticker,
+        Transaction.id != txn.id
+    ).order_by(Transaction.created_at.desc(), Transaction.seq.desc()).first()
+
+    if latest is not None and (latest.created_at, latest.seq) > (txn.created_at, txn.seq):
+        recalc_portfolio(txn.portfolio_id, txn.ticker, since=txn.created_at)
+        return
+    if latest is not None and latest.position_shares is None:
+        recalc_portfolio(txn.portfolio_id, txn.ticker)
+        return
+
+    invalidate_daily_values(txn.portfolio_id, txn.created_at)
+    total_shares = latest.position_shares if latest is not None else 0.0
+    total_cost = latest.position_cost if latest is not None else 0.0
+    total_shares, total_cost = apply_trade(
+        total_shares, total_cost, txn.transaction_type, float(txn.shares), float(txn.price))
+    txn.position_shares = total_shares
+    txn.position_cost = total_cost
+    _write_holding(txn.portfolio_id, txn.ticker, total_shares, total_cost)
     db.session.commit()
 
+def _new_transaction_rows(portfolio_id, rows):
+    """Insert-ready dicts for uploaded rows, with sequence numbers in file order."""
+    now = datetime.now()
+    first_seq = reserve_transaction_seqs(portfolio_id, len(rows))
+    return [{
+        "id": str(uuid.uuid4()),
+        "seq": first_seq + i,
+        "portfolio_id": portfolio_id,
+        "ticker": row["ticker"],
+        "shares": row["shares"],
+        "price": row["price"],
+        "transaction_type": row["transaction_type"],
+        "created_at": row.get("created_at") or now
+    } for i, row in enumerate(rows)]
+
+def _update_positions(position_updates, batch_size):
+    """Rewrite stored positions from dicts with txn_id, new_shares and new_cost."""
+    transactions_table = Transaction.__table__
+    update_position = transactions_table.update() \
+        .where(transactions_table.c.id == bindparam("txn_id")) \
+        .values(position_shares=bindparam("new_shares"), position_cost=bindparam("new_cost"))
+    for i in range(0, len(position_updates), batch_size):
+        db.session.execute(update_position, position_updates[i:i + batch_size])
+
+def bulk_insert_transactions(portfolio_id, rows, batch_size=None):
+    """
+    Insert many transactions and rebuild the affected holdings in one pass.
+
+    Existing transactions for the uploaded tickers are read in one query and
+    merged with the new rows, then each ticker is folded through apply_trade
+    once. New rows are inserted in executemany batches with their positions
+    already set, existing rows are only rewritten when their stored position
+    changed, and everything is committed together.
+
+    Args:
+        portfolio_id (str): The portfolio
+        rows (list): Dicts with ticker, shares, price, transaction_type and
+                     optionally created_at (defaults to now)
+        batch_size (int, optional): Rows per executemany batch
+
+    Returns:
+        dict: Number of transactions inserted and holdings rebuilt
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    if not rows:
+        return {"inserted": 0, "holdings": 0}
+    tickers = sorted({row["ticker"] for row in rows})
+
+    try:
+        new_rows = _new_transaction_rows(portfolio_id, rows)
+        invalidate_daily_values(portfolio_id, min(row["created_at"] for row in new_rows))
+        existing = db.session.execute(
+            select(Transaction.id, Transaction.seq, Transaction.ticker, Transaction.shares, Transaction.price,
+                   Transaction.transaction_type, Transaction.created_at,
+                   Transaction.position_shares, Transaction.position_cost)
+            .where(Transaction.portfolio_id == portfolio_id, Transaction.ticker.in_(tickers))
+        ).all()
+
+        # (created_at, seq, id, transaction_type, shares, price, new row or existing row).
+        # New rows have the highest seqs, in file order, so same-timestamp rows
+        # (same-day trades, undated rows) are folded in the order they were written.
+        by_ticker = {ticker: [] for ticker in tickers}
+        for txn in existing:
+            by_ticker[txn.ticker].append(
+                (txn.created_at, txn.seq, txn.id, txn.transaction_type, float(txn.shares), float(txn.price), txn))
+        for row in new_rows:
+            by_ticker[row["ticker"]].append(
+                (row["created_at"], row["seq"], row["id"], row["transaction_type"], row["shares"], row["price"], row))
+
+        position_updates = []
+        positions = {}
+        for ticker, txns in by_ticker.items():
+            total_shares, total_cost = 0.0, 0.0
+            txns.sort(key=lambda txn: (txn[0], txn[1]))
+            for _, _, txn_id, transaction_type, txn_shares, txn_price, source in txns:
+                total_shares, total_cost = apply_trade(total_shares, total_cost, transaction_type, txn_shares, txn_price)
+                if isinstance(source, dict):
+                    source["position_shares"] = total_shares
+                    source["position_cost"] = total_cost
+                elif source.position_shares != total_shares or source.position_cost != total_cost:
+                    position_updates.append({"txn_id": txn_id, "new_shares": total_shares, "new_cost": total_cost})
+            positions[ticker] = (total_shares, total_cost)
+
+        for i in range(0, len(new_rows), batch_size):
+            db.session.execute(Transaction.__table__.insert(), new_rows[i:i + batch_size])
+
+        _update_positions(position_updates, batch_size)
+
+        # One query for the current holdings, then one flush for all changes
+        holdings = {
+            holding.ticker: holding for holding in
+            PortfolioHolding.query.filter(
+                PortfolioHolding.portfolio_id == portfolio_id,
+                PortfolioHolding.ticker.in_(tickers)
+            ).all()
+        }
+        for ticker, (total_shares, total_cost) in positions.items():
+            book_value = max(0, total_cost)
+            average_cost = (book_value / total_shares) if total_shares > 0 else 0
+            holding = holdings.get(ticker)
+            if total_shares <= 0:
+                if holding:
+                    db.session.delete(holding)
+            elif holding:
+                holding.shares = total_shares
+                holding.average_cost = average_cost
+                holding.book_value = book_value
+            else:
+                db.session.add(PortfolioHolding(
+                    portfolio_id=portfolio_id,
+                    ticker=ticker,
+                    shares=total_shares,
+                    average_cost=average_cost,
+                    book_value=book_value
+                ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"inserted": len(new_rows), "holdings": len(positions)}
+
+def insert_transaction_rows(portfolio_id, rows, batch_size=None):
+    """
+    Insert uploaded transactions without their running positions.
+
+    For streaming imports: each chunk costs only its own rows, however much
+    history its tickers already have. Positions and holdings are filled in
+    afterwards by one rebuild_positions call. Does not commit, so a chunk
+    commits together with its caller's progress.
+
+    Args:
+        portfolio_id (str): The portfolio
+        rows (list): Same dicts as bulk_insert_transactions
+        batch_size (int, optional): Rows per executemany batch
+
+    Returns:
+        int: Number of transactions inserted
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    if not rows:
+        return 0
+    new_rows = _new_transaction_rows(portfolio_id, rows)
+    invalidate_daily_values(portfolio_id, min(row["created_at"] for row in new_rows))
+    for row in new_rows:
+        row["position_shares"] = row["position_cost"] = None
+    for i in range(0, len(new_rows), batch_size):
+        db.session.execute(Transaction.__table__.insert(), new_rows[i:i + batch_size])
+    return len(new_rows)
+
+def rebuild_positions(portfolio_id, batch_size=None):
+    """
+    Fill in every missing running position and rewrite the affected holdings.
+
+    For each ticker with transactions lacking a position, the fold starts
+    from the position stored on the last transaction before the earliest
+    such row, so every later row is read once whatever order they arrived in.
+
+    Args:
+        portfolio_id (str): The portfolio
+        batch_size (int, optional): Rows per executemany batch
+
+    Returns:
+        int: Number of holdings rebuilt
+    """
+    batch_size = batch_size or Config.INGEST_BATCH_SIZE
+    try:
+        pending = db.session.query(Transaction.ticker, func.min(Transaction.created_at)) \
+            .filter(Transaction.portfolio_id == portfolio_id, Transaction.position_shares.is_(None)) \
+            .group_by(Transaction.ticker).all()
+        for ticker, since in pending:
+            ticker_rows = select(Transaction.id, Transaction.transaction_type, Transaction.shares,
+                                 Transaction.price, Transaction.position_shares, Transaction.position_cost) \
+                .where(Transaction.portfolio_id == portfolio_id, Transaction.ticker == ticker)
+            anchor = db.session.execute(
+                ticker_rows.where(Transaction.created_at < since)
+                .order_by(Transaction.created_at.desc(), Transaction.seq.desc()).limit(1)
+            ).first()
+            total_shares = anchor.position_shares if anchor else 0.0
+            total_cost = anchor.position_cost if anchor else 0.0
+
+            position_updates = []
+            for txn in db.session.execute(
+                    ticker_rows.where(Transaction.created_at >= since)
+                    .order_by(Transaction.created_at, Transaction.seq)):
+                total_shares, total_cost = apply_trade(
+                    total_shares, total_cost, txn.transaction_type, float(txn.shares), float(txn.price))
+                if txn.position_shares != total_shares or txn.position_cost != total_cost:
+                    position_updates.append({"txn_id": txn.id, "new_shares": total_shares, "new_cost": total_cost})
+            _update_positions(position_updates, batch_size)
+            _write_holding(portfolio_id, ticker, total_shares, total_cost)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(pending)
+
+def encode_cursor(created_at, txn_id):
+    """Encode a (created_at, id) keyset position as an opaque page cursor."""
+    raw = json.dumps([created_at.isoformat(), txn_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from encode_cursor.
+
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, txn_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(txn_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+EXPORT_COLUMNS = ["id", "ticker", "shares", "price", "transaction_type", "created_at"]
+
+def stream_transactions(portfolio_id, export_format="ndjson", batch_size=1000):
+    """
+    Yield a portfolio's transactions as NDJSON lines or CSV text, oldest first.
+
+    Rows come from a server-side cursor in batches of batch_size as plain
+    tuples, never ORM objects, so memory use is constant however long the
+    history is.
+
+    Args:
+        portfolio_id (str): The portfolio
+        export_format (str): "ndjson" or "csv"
+        batch_size (int): Rows fetched and encoded per chunk
+
+    Yields:
+        str: One encoded chunk per batch (the CSV header comes first)
+    """
+    stmt = select(
+        Transaction.id, Transaction.ticker, Transaction.shares, Transaction.price,
+        Transaction.transaction_type, Transaction.created_at
+    ).where(Transaction.portfolio_id == portfolio_id).order_by(Transaction.created_at, Transaction.id)
+
+    if export_format == "csv":
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for rows in result.partitions():
+            if export_format == "csv":
+                buffer = StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    (txn_id, ticker, shares, price, transaction_type, created_at.isoformat() if created_at else "")
+                    for txn_id, ticker, shares, price, transaction_type, created_at in rows
+                )
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps({
+                    "id": txn_id,
+                    "ticker": ticker,
+                    "shares": float(shares),
+                    "price": float(price),
+                    "transaction_type": transaction_type,
+                    "created_at": created_at.isoformat() if created_at else None
+                }) + "\n" for txn_id, ticker, shares, price, transaction_type, created_at in rows)
+
+def _load_stock_sector(ticker):
+    # Check if data exists and sector is present
+    sector = fetch_stock_data(ticker)["fundamentals"].get("sector")
+    if sector is None:
+        sector = "Unknown"
+    return sector
+
 def fetch_stock_sector(ticker):
     ticker = ticker.upper()
     try:
-        stock = finvizfinance(ticker)
-        fundamentals_data = stock.ticker_fundament()
-
-        # Check if data exists and sector is present
-        sector = fundamentals_data.get("Sector")
-        if sector is None:
-            sector = "Unknown"
+        sector = quote_cache.get_or_load("sector", ticker, lambda: _load_stock_sector(ticker))
     except Exception as e:
         print(f"Error fetching sector for {ticker}: {e}")
         sector = "Unknown"
 
     return sector
 
+def fetch_market_news_payload():
+    """Scrape the finviz news page and return the /api/market-news response body as JSON text."""
+    news_data = News().get_news()
+    news_data_converted = {}
+    for key, value in news_data.items():
+        if hasattr(value, "to_dict"):
+            news_data_converted[key] = value.to_dict(orient='records')
+        else:
+            news_data_converted[key] = value
+    return json.dumps({"relevant_news": news_data_converted}, default=str)
+
 # Helper function to wait for OpenAI run completion
 def wait_for_run_completion(thread_id, run_id, timeout=60):
     """Wait for a run to complete, with timeout."""
@@ -280,137 +813,65 @@ def cleanup_old_threads():
         db.session.rollback()
 
 
-def fetch_historical_price(ticker, date_str):
-    """
-    Fetch historical price data for a ticker on a specific date using Yahoo Finance.
-
-    Args:
-        ticker (str): The stock ticker symbol
-        date_str (str): Date in ISO format (YYYY-MM-DD)
-
-    Returns:
-        float: The closing price for that date, or None if not available
-    """
-    try:
-        # Convert the string date to a datetime object
-        date = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-        # To handle weekend/holiday, we might need to look a few days back
-        # Get data for a window of 5 days before the requested date
-        start_date = (date - timedelta(days=5)).strftime("%Y-%m-%d")
-        end_date = (date + timedelta(days=1)).strftime("%Y-%m-%d")  # Add one day to include the target date
-
-        # Fetch data from Yahoo Finance
-        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
-
-        if data.empty:
-            print(f"No data returned from yfinance for {ticker} around {date_str}")
-            return None
-
-        # Get the last available date on or before the requested date
-        data = data[data.index <= pd.Timestamp(date)]
-        if data.empty:
-            print(f"No data on or before {date_str} for {ticker}")
-            return None
-
-        # Get the closing price from the most recent date
-        latest_date = data.index[-1]
-        price = float(data.loc[latest_date, 'Close'])
-
-        print(f"Found price for {ticker} on {latest_date.strftime('%Y-%m-%d')}: ${price:.2f}")
-        return price
-
-    except Exception as e:
-        print(f"Error fetching historical price for {ticker} on {date_str}: {e}")
-        return None
-
-
-def fetch_batch_historical_prices(ticker, start_date, end_date=None):
+def fetch_batch_close_prices(tickers, start_date, end_date=None):
     """
-    Fetch historical prices for a ticker within a date range using Yahoo Finance.
+    Fetch closing prices for many tickers from the price store, downloading any
+    missing ranges with batched multi-symbol yf.download calls.
 
     Args:
-        ticker (str): The stock ticker symbol
+        tickers (iterable): Ticker symbols
         start_date (str): Start date in ISO format (YYYY-MM-DD)
         end_date (str, optional): End date in ISO format. Defaults to current date.
 
     Returns:
-        dict: Map of dates to closing prices
+        pd.DataFrame: Date-indexed frame with one close-price column per ticker.
+                      Rows start a few days before start_date so the first
+                      requested date can be valued as-of; missing prices are NaN.
     """
+    tickers = sorted(set(ticker.upper() for ticker in tickers))
     if end_date is None:
         end_date = datetime.now().date().isoformat()
 
-    try:
-        # Add a buffer day at the beginning and end to ensure we get the exact dates
-        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
-        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-
-        adjusted_start = (start_date_obj - timedelta(days=5)).strftime("%Y-%m-%d")
-        adjusted_end = (end_date_obj + timedelta(days=1)).strftime("%Y-%m-%d")
-
-        # Fetch data from Yahoo Finance
-        data = yf.download(ticker, start=adjusted_start, end=adjusted_end, progress=False)
-
-        if data.empty:
-            print(f"No data returned from yfinance for {ticker} between {start_date} and {end_date}")
-            return {}
-
-        # Convert DataFrame to dictionary mapping dates to closing prices
-        prices = {}
-        for date, row in data.iterrows():
-            date_str = date.strftime("%Y-%m-%d")
-            # Only include dates in our requested range
-            if start_date <= date_str <= end_date:
-                prices[date_str] = float(row['Close'])
-
-        if prices:
-            print(f"Fetched {len(prices)} historical prices for {ticker} from {start_date} to {end_date}")
-            # Print a few sample prices for debugging
-            sample_keys = list(prices.keys())
-            if len(sample_keys) > 3:
-                sample_keys = [sample_keys[0], sample_keys[len(sample_keys) // 2], sample_keys[-1]]
-            for key in sample_keys:
-                print(f"{key}: ${prices[key]:.2f}")
-        else:
-            print(f"No prices found in the specified range for {ticker}")
-
-        return prices
-
-    except Exception as e:
-        print(f"Error fetching batch historical prices for {ticker}: {e}")
-        return {}
-
-def fetch_market_benchmarks():
-    """Fetch performance data for major market indices"""
-    try:
-        # Get S&P 500, Nasdaq, and Dow Jones data
-        benchmarks = {
-            "S&P500": "^GSPC",
-            "NASDAQ": "^IXIC",
-            "DOW": "^DJI"
-        }
-
-        result = {}
-        for name, ticker in benchmarks.items():
-            data = yf.Ticker(ticker)
-            hist = data.history(period="1mo")  # Get 1 month of data
-
-            if not hist.empty:
-                # Calculate performance metrics
-                current = hist['Close'].iloc[-1]
-                week_ago = hist['Close'].iloc[-5] if len(hist) >= 5 else hist['Close'].iloc[0]
-                month_ago = hist['Close'].iloc[0]
+    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
+    prices = get_close_prices(tickers, start_date_obj - timedelta(days=5), end_date_obj)
+    return prices.reindex(columns=tickers)
 
-                # Calculate percentage changes
-                weekly_change = ((current - week_ago) / week_ago) * 100
-                monthly_change = ((current - month_ago) / month_ago) * 100
+def load_market_benchmarks(benchmarks=None):
+    """
+    Compute current level and 1-week / 1-month change for each benchmark index.
 
-                result[name] = {
-                    "current": current,
-                    "weekly_change_pct": weekly_change,
-                    "monthly_change_pct": monthly_change
-                }
+    Args:
+        benchmarks (dict, optional): Map of display name to index symbol.
+                                     Defaults to BENCHMARK_INDICES.
 
-        return result
-    except Exception as e:
-        return {"error": str(e)}
+    Returns:
+        dict: Map of name to {"current", "weekly_change_pct", "monthly_change_pct"}
+    """
+    benchmarks = benchmarks or Config.BENCHMARK_INDICES
+    today = datetime.now().date()
+    closes = get_close_prices(benchmarks.values(), today - timedelta(days=31), today)
+
+    result = {}
+    for name, ticker in benchmarks.items():
+        hist = closes[ticker.upper()].dropna() if ticker.upper() in closes.columns else pd.Series(dtype=float)
+
+        if not hist.empty:
+            # Calculate performance metrics
+            current = float(hist.iloc[-1])
+            week_ago = float(hist.iloc[-5] if len(hist) >= 5 else hist.iloc[0])
+            month_ago = float(hist.iloc[0])
+
+            # Calculate percentage changes
+            weekly_change = ((current - week_ago) / week_ago) * 100
+            monthly_change = ((current - month_ago) / month_ago) * 100
+
+            result[name] = {
+                "current": current,
+                "weekly_change_pct": weekly_change,
+                "monthly_change_pct": monthly_change
+            }
+
+    if not result:
+        raise ValueError("No benchmark data available")
+    return result
@@ -0,0 +1,152 @@
+# http_client.py
+import random
+import threading
+import time
+import requests
+
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from config import Config
+
+# Responses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _Host:
+    """Pooled session, concurrency cap and latency counters for one upstream host."""
+
+    def __init__(self, pool_size, max_concurrency):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, error=False):
+        with self.lock:
+            self.requests += 1
+            self.errors += 1 if error else 0
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "in_flight": self.in_flight,
+                "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 1)
+            }
+
+
+class HttpClient:
+    """
+    Outbound HTTP client with one keep-alive session per host.
+
+    Every request gets default connect/read timeouts, is retried a bounded
+    number of times with jittered exponential backoff on connection errors and
+    retryable statuses, and waits for a per-host concurrency slot.
+
+    Args:
+        connect_timeout (float): Seconds to wait for a connection
+        read_timeout (float): Seconds to wait for a response
+        max_retries (int): Retries after the first attempt
+        backoff (float): Base backoff in seconds
+        max_per_host (int): Concurrent requests allowed per host
+    """
+
+    def __init__(self, connect_timeout, read_timeout, max_retries, backoff, max_per_host):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_per_host = max_per_host
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = _Host(pool_size=self.max_per_host, max_concurrency=self.max_per_host)
+                self._hosts[host] = state
+            return state
+
+    def session(self, host):
+        """Return the pooled session for a host, for libraries that accept one."""
+        return self._host(host).session
+
+    def get(self, url, params=None, headers=None, timeout=None, retries=None):
+        """
+        Send a GET request through the host's pooled session.
+
+        Args:
+            url (str): Absolute URL
+            params (dict, optional): Query parameters
+            headers (dict, optional): Request headers
+            timeout (float or tuple, optional): Overrides the default (connect, read) timeouts
+            retries (int, optional): Overrides the default retry count
+
+        Returns:
+            requests.Response: The final response (which may still be an error status)
+
+        Raises:
+            requests.RequestException: If every attempt failed to get a response
+        """
+        host = self._host(urlsplit(url).netloc)
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            with host.semaphore:
+                with host.lock:
+                    host.in_flight += 1
+                start = time.monotonic()
+                try:
+                    response = host.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+                except (requests.ConnectionError, requests.Timeout):
+                    host.record(time.monotonic() - start, error=True)
+                    if attempt >= retries:
+                        raise
+                    response = None
+                finally:
+                    with host.lock:
+                        host.in_flight -= 1
+
+            if response is not None:
+                retryable = response.status_code in RETRY_STATUSES
+                host.record(time.monotonic() - start, error=retryable)
+                if not retryable or attempt >= retries:
+                    return response
+
+            # Full jitter keeps retrying workers from hitting the host in lockstep
+            with host.lock:
+                host.retries += 1
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+            attempt += 1
+
+    def stats(self):
+        """Return request, error, retry and latency counters per host."""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {name: state.stats() for name, state in hosts.items()}
+
+
+client = HttpClient(
+    connect_timeout=Config.HTTP_CONNECT_TIMEOUT,
+    read_timeout=Config.HTTP_READ_TIMEOUT,
+    max_retries=Config.HTTP_MAX_RETRIES,
+    backoff=Config.HTTP_RETRY_BACKOFF,
+    max_per_host=Config.HTTP_MAX_PER_HOST
+)
+
+get = client.get
+session = client.session
+stats = client.stats
@@ -0,0 +1,114 @@
+# ingest.py
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from config import Config
+from helpers import iter_csv_with_mapping, normalize_upload_row, insert_transaction_rows, rebuild_positions
+from models import db, IngestJob
+
+# Uploads are processed off the request path, a few at a time per process
+ingest_executor = ThreadPoolExecutor(max_workers=Config.INGEST_MAX_WORKERS, thread_name_prefix="ingest")
+
+
+def spool_upload(file):
+    """
+    Save an uploaded file to a temporary path without reading it into memory.
+
+    Args:
+        file (FileStorage): The uploaded file from request.files
+
+    Returns:
+        str: Path of the spooled file; the ingest job deletes it once it succeeds
+    """
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".csv", dir=Config.INGEST_SPOOL_DIR)
+    os.close(fd)
+    file.save(path)
+    return path
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_ingest_job(job_id, path, chunk_size=None):
+    """
+    Stream a spooled CSV into the job's portfolio, one chunk at a time.
+
+    Only one chunk of rows is held in memory. Each chunk's rows are inserted
+    without positions and committed together with the job's counters, so
+    progress can be polled and rows_parsed always marks the last committed
+    chunk. Positions and holdings are then rebuilt once for the whole file,
+    which keeps a large import linear in its size.
+
+    A failed job keeps its spool file; running it again skips the rows it
+    already committed and carries on. Must run inside an app context.
+
+    Args:
+        job_id (str): The IngestJob to run or resume
+        path (str): Spooled CSV file, deleted once the job is done
+        chunk_size (int, optional): Rows per chunk
+    """
+    chunk_size = chunk_size or Config.INGEST_CHUNK_SIZE
+    job = db.session.get(IngestJob, job_id)
+    try:
+        job.status = 'running'
+        job.message = None
+        db.session.commit()
+
+        with open(path, newline="", encoding="utf-8") as stream:
+            remaining = islice(iter_csv_with_mapping(stream), job.rows_parsed, None)
+            for chunk in _chunks(remaining, chunk_size):
+                rows = []
+                errors = []
+                for transaction in chunk:
+                    row, error = normalize_upload_row(transaction)
+                    if error:
+                        errors.append(error)
+                    else:
+                        rows.append(row)
+
+                inserted = insert_transaction_rows(job.portfolio_id, rows)
+
+                job.rows_parsed += len(chunk)
+                job.rows_inserted += inserted
+                job.error_count += len(errors)
+                if errors and len(job.errors) < Config.INGEST_MAX_ERRORS:
+                    # Reassign so the JSON column is marked as changed
+                    job.errors = (job.errors + errors)[:Config.INGEST_MAX_ERRORS]
+                db.session.commit()
+
+        rebuild_positions(job.portfolio_id)
+
+        job.status = 'done'
+        job.spool_path = None
+        if job.rows_parsed == 0:
+            job.message = "No valid transactions found in the file"
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error running ingest job {job_id}: {e}")
+        job = db.session.get(IngestJob, job_id)
+        job.status = 'failed'
+        job.message = str(e)
+        db.session.commit()
+        return
+
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def submit_ingest_job(app, job_id, path):
+    """Run or resume an ingest job on the background pool inside an app context."""
+    def run():
+        with app.app_context():
+            run_ingest_job(job_id, path)
+    return ingest_executor.submit(run)
@@ -0,0 +1,239 @@
+# migrations.py
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+from models import db, Transaction, PortfolioHolding, Watchlist, UserThread
+
+# Arbitrary key for pg_advisory_lock, so only one gunicorn worker migrates
+MIGRATION_LOCK_KEY = 72_114_001
+
+
+def _columns(conn, table):
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _index_names(conn, table):
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+def _has_unique(conn, table, columns):
+    """True if a unique index or constraint already covers exactly these columns."""
+    inspector = inspect(conn)
+    unique_sets = [index["column_names"] for index in inspector.get_indexes(table) if index.get("unique")]
+    unique_sets += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+    return any(list(existing) == list(columns) for existing in unique_sets)
+
+
+def _create_index(conn, name, table, columns, unique=False):
+    if name not in _index_names(conn, table):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+
+
+def add_transaction_positions(conn):
+    existing = _columns(conn, "transactions")
+    for column in ("position_shares", "position_cost"):
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE transactions ADD COLUMN {column} DOUBLE PRECISION"))
+
+
+def index_transactions(conn):
+    # Per-ticker replays (portfolio_id, ticker) and keyset pages (portfolio_id)
+    # both read in (created_at, id) order straight off these indexes
+    _create_index(conn, "ix_transactions_portfolio_ticker_created", "transactions",
+                  ["portfolio_id", "ticker", "created_at", "id"])
+    _create_index(conn, "ix_transactions_portfolio_created", "transactions",
+                  ["portfolio_id", "created_at", "id"])
+
+
+def unique_holdings(conn):
+    if _has_unique(conn, "portfolio_holdings", ["portfolio_id", "ticker"]):
+        return
+    # Keep the most recently written row of any duplicates; holdings are
+    # rebuilt from transactions anyway
+    conn.execute(text("""
+        DELETE FROM portfolio_holdings a
+        USING portfolio_holdings b
+        WHERE a.portfolio_id = b.portfolio_id AND a.ticker = b.ticker AND a.ctid < b.ctid
+    """))
+    _create_index(conn, "ux_portfolio_holdings_portfolio_ticker", "portfolio_holdings",
+                  ["portfolio_id", "ticker"], unique=True)
+
+
+def unique_watchlist(conn):
+    if _has_unique(conn, "watchlist", ["user_id", "ticker"]):
+        return
+    conn.execute(text("""
+        DELETE FROM watchlist a
+        USING watchlist b
+        WHERE a.user_id = b.user_id AND a.ticker = b.ticker AND a.ctid > b.ctid
+    """))
+    _create_index(conn, "ux_watchlist_user_ticker", "watchlist", ["user_id", "ticker"], unique=True)
+
+
+def index_user_threads(conn):
+    _create_index(conn, "ix_user_threads_user_thread", "user_threads", ["user_id", "thread_id"])
+
+
+def drop_holdings_shares_index(conn):
+    # Nothing filters or sorts holdings by share count
+    if "ix_portfolio_holdings_shares" in _index_names(conn, "portfolio_holdings"):
+        conn.execute(text("DROP INDEX ix_portfolio_holdings_shares"))
+
+
+def sequence_transactions(conn):
+    if "transaction_seq" not in _columns(conn, "portfolios"):
+        conn.execute(text("ALTER TABLE portfolios ADD COLUMN transaction_seq BIGINT NOT NULL DEFAULT 0"))
+    if "seq" not in _columns(conn, "transactions"):
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN seq BIGINT"))
+        # Number existing rows in the order they were replayed until now
+        conn.execute(text("""
+            UPDATE transactions SET seq = numbered.seq
+            FROM (
+                SELECT id, row_number() OVER (PARTITION BY portfolio_id ORDER BY created_at, id) AS seq
+                FROM transactions
+            ) numbered
+            WHERE transactions.id = numbered.id
+        """))
+        conn.execute(text("ALTER TABLE transactions ALTER COLUMN seq SET NOT NULL"))
+        conn.execute(text("""
+            UPDATE portfolios SET transaction_seq = latest.seq
+            FROM (SELECT portfolio_id, max(seq) AS seq FROM transactions GROUP BY portfolio_id) latest
+            WHERE portfolios.id = latest.portfolio_id
+        """))
+    if "ix_transactions_portfolio_ticker_created" in _index_names(conn, "transactions"):
+        conn.execute(text("DROP INDEX ix_transactions_portfolio_ticker_created"))
+    _create_index(conn, "ix_transactions_portfolio_ticker_seq", "transactions",
+                  ["portfolio_id", "ticker", "created_at", "seq"])
+
+
+def add_ingest_spool_path(conn):
+    if "spool_path" not in _columns(conn, "ingest_jobs"):
+        conn.execute(text("ALTER TABLE ingest_jobs ADD COLUMN spool_path VARCHAR(1024)"))
+
+
+def add_provisional_daily_values(conn):
+    if "provisional" not in _columns(conn, "portfolio_daily_values"):
+        conn.execute(text("ALTER TABLE portfolio_daily_values ADD COLUMN provisional BOOLEAN NOT NULL DEFAULT FALSE"))
+
+
+# Applied in order, once each. Never edit or reorder a released entry; add a
+# new version instead. Every step checks before it changes anything, since a
+# fresh database already gets the model's indexes from create_all.
+MIGRATIONS = [
+    (1, "Add running position columns to transactions", add_transaction_positions),
+    (2, "Composite indexes on transactions for replays and keyset pages", index_transactions),
+    (3, "Unique (portfolio_id, ticker) on portfolio_holdings", unique_holdings),
+    (4, "Unique (user_id, ticker) on watchlist", unique_watchlist),
+    (5, "Index user_threads on (user_id, thread_id)", index_user_threads),
+    (6, "Drop the unused index on portfolio_holdings.shares", drop_holdings_shares_index),
+    (7, "Insertion sequence on transactions to order same-timestamp rows", sequence_transactions),
+    (8, "Spool path on ingest_jobs so failed imports can resume", add_ingest_spool_path),
+    (9, "Provisional flag on daily values priced with fallbacks", add_provisional_daily_values),
+]
+
+
+def upgrade(engine=None, migrations=MIGRATIONS):
+    """
+    Create missing tables, then apply every pending migration.
+
+    Runs under a Postgres advisory lock so concurrent workers starting up
+    together don't race; each migration commits together with its row in
+    schema_migrations.
+
+    Args:
+        engine (Engine, optional): Defaults to the app's engine
+        migrations (list): (version, description, step) entries
+
+    Returns:
+        list: Versions applied by this call
+    """
+    engine = engine or db.engine
+    applied_now = []
+    with engine.connect() as lock_conn:
+        postgres = engine.dialect.name == "postgresql"
+        if postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            db.metadata.create_all(engine, checkfirst=True)
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                    "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+                ))
+            with engine.connect() as conn:
+                applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+            for version, description, step in sorted(migrations, key=lambda migration: migration[0]):
+                if version in applied:
+                    continue
+                with engine.begin() as conn:
+                    step(conn)
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, description, applied_at) "
+                             "VALUES (:version, :description, :applied_at)"),
+                        {"version": version, "description": description, "applied_at": datetime.utcnow()}
+                    )
+                print(f"Applied migration {version}: {description}")
+                applied_now.append(version)
+        finally:
+            if postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                lock_conn.commit()
+    return applied_now
+
+
+def hot_queries(portfolio_id="00000000-0000-0000-0000-000000000000",
+                user_id="00000000-0000-0000-0000-000000000000", ticker="AAPL", thread_id="thread_abc"):
+    """The lookups on request paths that must be served by an index."""
+    return {
+        "transactions by portfolio and ticker": select(Transaction.id, Transaction.position_shares)
+        .where(Transaction.portfolio_id == portfolio_id, Transaction.ticker == ticker)
+        .order_by(Transaction.created_at, Transaction.seq),
+        "transactions page by keyset": select(Transaction.id, Transaction.created_at)
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(16),
+        "holding by portfolio and ticker": select(PortfolioHolding.id)
+        .where(PortfolioHolding.portfolio_id == portfolio_id, PortfolioHolding.ticker == ticker),
+        "watchlist item by user and ticker": select(Watchlist.id)
+        .where(Watchlist.user_id == user_id, Watchlist.ticker == ticker),
+        "user thread by user and thread": select(UserThread.id)
+        .where(UserThread.user_id == user_id, UserThread.thread_id == thread_id),
+    }
+
+
+def _seq_scans(plan):
+    """Relations read by a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = [plan.get("Relation Name")] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", []):
+        found += _seq_scans(child)
+    return found
+
+
+def check_query_plans(engine=None, queries=None):
+    """
+    EXPLAIN every hot query and report the ones that fall back to a Seq Scan.
+
+    Plans come from the default planner settings, so the check is only
+    meaningful against tables of realistic size with fresh statistics: on a
+    near-empty table a Seq Scan is the right plan. Run it against production
+    (or a copy) after ANALYZE; tests/test_query_plans.py seeds such a
+    database.
+
+    Args:
+        engine (Engine, optional): Defaults to the app's engine
+        queries (dict, optional): Name -> statement; defaults to hot_queries()
+
+    Returns:
+        dict: Query name -> list of tables scanned sequentially (empty if fine)
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Query plan checks need Postgres")
+    results = {}
+    with engine.connect() as conn:
+        with conn.begin():
+            for name, stmt in (queries or hot_queries()).items():
+                sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                results[name] = _seq_scans(plan[0]["Plan"])
+    return results
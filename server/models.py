@@ -21,6 +21,9 @@ class Portfolio(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Last Transaction.seq handed out for this portfolio; deletes bump it too,
+    # so it doubles as the version of the portfolio's transactions
+    transaction_seq = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
 
     # Relationship - A portfolio has many holdings & transactions
     user = db.relationship('User', back_populates='portfolio')
@@ -32,7 +35,7 @@ class PortfolioHolding(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     portfolio_id = db.Column(db.String(36), db.ForeignKey('portfolios.id', ondelete='CASCADE'), nullable=False)
     ticker = db.Column(db.String(10), nullable=False)
-    shares = db.Column(db.Numeric(12,2), nullable=False, default=0, index=True)  # Index added for fast lookups
+    shares = db.Column(db.Numeric(12,2), nullable=False, default=0)
     average_cost = db.Column(db.Numeric(12,2), nullable=False, default=0)
     book_value = db.Column(db.Numeric(12,2), nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -41,6 +44,10 @@ class PortfolioHolding(db.Model):
     # Relationship - Belongs to a portfolio
     portfolio = db.relationship('Portfolio', back_populates='holdings')
 
+    __table_args__ = (
+        db.Index('ux_portfolio_holdings_portfolio_ticker', 'portfolio_id', 'ticker', unique=True),
+    )
+
 class Transaction(db.Model):
     __tablename__ = 'transactions'
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -50,10 +57,22 @@ class Transaction(db.Model):
     price = db.Column(db.Numeric(12,2), nullable=False)  # Prevent negative price
     transaction_type = db.Column(db.String(10), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.current_timestamp())
+    # Insertion order within the portfolio; breaks ties between transactions
+    # with the same created_at (same-day trades, undated uploads)
+    seq = db.Column(db.BigInteger, nullable=False)
+    # Running position for the ticker after this transaction, so a holding can
+    # be updated (or replayed from a date) without re-reading older rows
+    position_shares = db.Column(db.Float)
+    position_cost = db.Column(db.Float)
 
     # Relationship - Belongs to a portfolio
     portfolio = db.relationship('Portfolio', back_populates='transactions')
 
+    __table_args__ = (
+        db.Index('ix_transactions_portfolio_ticker_seq', 'portfolio_id', 'ticker', 'created_at', 'seq'),
+        db.Index('ix_transactions_portfolio_created', 'portfolio_id', 'created_at', 'id'),
+    )
+
 class Watchlist(db.Model):
     __tablename__ = 'watchlist'
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -61,6 +80,10 @@ class Watchlist(db.Model):
     ticker = db.Column(db.String(10), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ux_watchlist_user_ticker', 'user_id', 'ticker', unique=True),
+    )
+
 
 # Database model for user threads
 class UserThread(db.Model):
@@ -72,5 +95,85 @@ class UserThread(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     last_used = db.Column(db.DateTime, nullable=False, default=datetime.now)
 
+    __table_args__ = (
+        db.Index('ix_user_threads_user_thread', 'user_id', 'thread_id'),
+    )
+
     def __repr__(self):
         return f'<UserThread {self.id} for user {self.user_id}>'
+
+
+# Cached finviz fundamentals, shared by all users and workers
+class TickerFundamentals(db.Model):
+    __tablename__ = 'ticker_fundamentals'
+
+    ticker = db.Column(db.String(10), primary_key=True)
+    fundamentals = db.Column(db.JSON, nullable=False)  # Filtered fields returned by fetch_stock_data
+    description = db.Column(db.Text)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TickerFundamentals {self.ticker} fetched {self.fetched_at}>'
+
+
+# Daily closing prices, filled in incrementally from Yahoo Finance
+class PriceBar(db.Model):
+    __tablename__ = 'price_bars'
+
+    ticker = db.Column(db.String(10), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    close = db.Column(db.Float, nullable=False)
+    adj_close = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<PriceBar {self.ticker} {self.date} {self.close}>'
+
+
+# Contiguous date range already downloaded for a ticker, so non-trading days
+# inside it are not mistaken for gaps
+class PriceCoverage(db.Model):
+    __tablename__ = 'price_coverage'
+
+    ticker = db.Column(db.String(10), primary_key=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Background CSV upload, processed in chunks and polled for progress
+class IngestJob(db.Model):
+    __tablename__ = 'ingest_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), nullable=False)
+    portfolio_id = db.Column(db.String(36), nullable=False)
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done or failed
+    rows_parsed = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)  # First INGEST_MAX_ERRORS row errors
+    message = db.Column(db.Text)
+    spool_path = db.Column(db.String(1024))  # Kept until the job is done, so a failed job can resume
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<IngestJob {self.id} {self.status}>'
+
+
+# End-of-day market value of a portfolio, filled in by the nightly refresh.
+# Rows always form a contiguous run of days from the first transaction; any
+# change to the transactions deletes the rows from its date forward.
+class PortfolioDailyValue(db.Model):
+    __tablename__ = 'portfolio_daily_values'
+
+    portfolio_id = db.Column(db.String(36), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+    # Valued while a held ticker had no downloaded prices; the next refresh values it again
+    provisional = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PortfolioDailyValue {self.portfolio_id} {self.date} {self.value}>'
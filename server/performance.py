@@ -0,0 +1,210 @@
+# performance.py
+import numpy as np
+import pandas as pd
+
+from datetime import date, timedelta
+from config import Config
+from cache import TTLCache
+from models import db, Portfolio, Transaction, PortfolioHolding
+from portfolio_engine import (transactions_frame, daily_cash_flows, time_weighted_return, xirr,
+                              daily_growth, max_drawdown, risk_metrics)
+from price_store import get_close_prices
+from snapshots import load_daily_values
+
+WINDOWS = ("1M", "3M", "6M", "YTD", "1Y", "3Y", "5Y", "ALL")
+_WINDOW_OFFSETS = {
+    "1M": pd.DateOffset(months=1),
+    "3M": pd.DateOffset(months=3),
+    "6M": pd.DateOffset(months=6),
+    "1Y": pd.DateOffset(years=1),
+    "3Y": pd.DateOffset(years=3),
+    "5Y": pd.DateOffset(years=5),
+}
+
+# Results per (portfolio, window, transactions version); any change to the
+# transactions changes the version, so stale entries are never served
+performance_cache = TTLCache(
+    ttls={"returns": Config.PERFORMANCE_CACHE_TTL, "risk": Config.PERFORMANCE_CACHE_TTL},
+    max_entries=Config.PERFORMANCE_CACHE_MAX_ENTRIES
+)
+
+
+def transactions_version(portfolio_id):
+    """
+    The portfolio's transaction counter, which every insert and delete moves
+    forward (see reserve_transaction_seqs), so any change gives a new version.
+    """
+    return db.session.query(Portfolio.transaction_seq).filter(Portfolio.id == portfolio_id).scalar()
+
+
+def window_start(window, end):
+    """
+    First day of a named window ending on end (inclusive).
+
+    Returns:
+        pd.Timestamp: The start, or None for "ALL"
+    """
+    if window == "ALL":
+        return None
+    if window == "YTD":
+        return pd.Timestamp(end.year, 1, 1)
+    return end - _WINDOW_OFFSETS[window] + pd.Timedelta(days=1)
+
+
+def _load_transactions(portfolio_id):
+    return db.session.query(
+        Transaction.created_at, Transaction.ticker, Transaction.shares,
+        Transaction.price, Transaction.transaction_type
+    ).filter(Transaction.portfolio_id == portfolio_id).order_by(Transaction.created_at, Transaction.seq).all()
+
+
+def compute_returns(portfolio_id, window="ALL", start=None, end=None):
+    """
+    Time-weighted and money-weighted returns over a window of stored daily values.
+
+    Args:
+        portfolio_id (str): The portfolio
+        window (str): One of WINDOWS, used when start is not given
+        start (date, optional): First day of the window
+        end (date, optional): Last day; defaults to the last stored close
+
+    Returns:
+        dict: start/end dates and values, net flows, gain, time-weighted
+              return (plus annualized, for windows of a year or more) and
+              XIRR, with returns as fractions (0.05 = 5%)
+    """
+    values = load_daily_values(portfolio_id)
+    if values.empty:
+        return None
+    first_day, last_day = values.index[0], values.index[-1]
+    end = min(pd.Timestamp(end), last_day) if end else last_day
+    start = pd.Timestamp(start) if start else window_start(window, end)
+    start = max(start, first_day) if start is not None else first_day
+    if start > end:
+        return None
+
+    window_values = values.loc[start:end]
+    start_value = float(values.get(start - pd.Timedelta(days=1), 0.0))
+    end_value = float(window_values.iloc[-1])
+    flows = daily_cash_flows(transactions_frame(_load_transactions(portfolio_id)))
+    window_flows = flows.loc[start:end]
+
+    twr = time_weighted_return(window_values, flows, start_value)
+    days = (end - start).days + 1
+    twr_annualized = (1 + twr) ** (365.0 / days) - 1 if days >= 365 and twr > -1 else None
+
+    # Investor's side: money in is negative, the closing value is paid out
+    amounts = [-start_value] if start_value > 0 else []
+    flow_dates = [start - pd.Timedelta(days=1)] if start_value > 0 else []
+    amounts += list(-window_flows.to_numpy(dtype=float)) + [end_value]
+    flow_dates += list(window_flows.index) + [end]
+    mwr = xirr(amounts, flow_dates)
+
+    net_flows = float(window_flows.sum())
+    return {
+        "start": start.date().isoformat(),
+        "end": end.date().isoformat(),
+        "start_value": round(start_value, 2),
+        "end_value": round(end_value, 2),
+        "net_flows": round(net_flows, 2),
+        "gain": round(end_value - start_value - net_flows, 2),
+        "time_weighted_return": round(twr, 6),
+        "time_weighted_return_annualized": round(twr_annualized, 6) if twr_annualized is not None else None,
+        "xirr": round(mwr, 6) if mwr is not None else None
+    }
+
+
+def portfolio_returns(portfolio_id, window="ALL", start=None, end=None):
+    """compute_returns, cached per (portfolio, window, transactions version)."""
+    key = (portfolio_id, window, str(start), str(end), date.today().isoformat(),
+           transactions_version(portfolio_id))
+    return performance_cache.get_or_load(
+        "returns", key, lambda: compute_returns(portfolio_id, window, start, end))
+
+
+def _round_or_none(value, digits=6):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def compute_risk(portfolio_id, confidence=None, lookback_days=None):
+    """
+    Risk of the current holdings over the trailing lookback window.
+
+    Volatility, betas, correlations and VaR/CVaR apply today's market value
+    weights to the holdings' aligned daily close-to-close returns; max
+    drawdown is measured on the portfolio's own flow-adjusted daily values.
+
+    Args:
+        portfolio_id (str): The portfolio
+        confidence (float, optional): VaR/CVaR confidence level
+        lookback_days (int, optional): Calendar days of history to use
+
+    Returns:
+        dict: The metrics, as fractions (0.05 = 5%), or None without holdings
+              or enough price history
+    """
+    confidence = confidence or Config.RISK_VAR_CONFIDENCE
+    lookback_days = lookback_days or Config.RISK_LOOKBACK_DAYS
+    end = date.today()
+    start = end - timedelta(days=lookback_days)
+
+    holdings = db.session.query(PortfolioHolding.ticker, PortfolioHolding.shares) \
+        .filter(PortfolioHolding.portfolio_id == portfolio_id, PortfolioHolding.shares > 0).all()
+    if not holdings:
+        return None
+    shares = pd.Series({row.ticker.upper(): float(row.shares) for row in holdings})
+    benchmarks = Config.BENCHMARK_INDICES
+
+    # One read for holdings and benchmarks, aligned on the days every one traded
+    closes = get_close_prices(list(shares.index) + list(benchmarks.values()), start, end)
+    closes = closes.reindex(columns=list(shares.index) + list(benchmarks.values()))
+    if closes.empty:
+        return None
+    last_close = closes[shares.index].ffill().iloc[-1]
+    priced = list(last_close.dropna().index)
+    # A benchmark with no stored closes would otherwise drop every row below
+    benchmarks = {name: ticker for name, ticker in benchmarks.items() if closes[ticker].notna().any()}
+    # Align on the days every series traded before differencing, so a ticker
+    # that also trades at weekends contributes its Friday-to-Monday move
+    returns = closes[priced + list(benchmarks.values())].dropna().pct_change().dropna()
+    if not priced or len(returns) < 2:
+        return None
+
+    market_values = shares[priced] * last_close[priced]
+    weights = (market_values / market_values.sum()).to_numpy(dtype=float)
+    metrics = risk_metrics(
+        returns[priced].to_numpy(dtype=float),
+        weights,
+        returns[list(benchmarks.values())].to_numpy(dtype=float),
+        confidence
+    )
+
+    values = load_daily_values(portfolio_id).loc[pd.Timestamp(start):]
+    flows = daily_cash_flows(transactions_frame(_load_transactions(portfolio_id)))
+    drawdown = max_drawdown(daily_growth(values, flows)) if not values.empty else 0.0
+
+    tickers = priced
+    return {
+        "as_of": pd.Timestamp(returns.index[-1]).date().isoformat(),
+        "observations": len(returns),
+        "confidence": confidence,
+        "volatility": round(metrics["volatility"], 6),
+        "daily_volatility": round(metrics["daily_volatility"], 6),
+        "var": round(metrics["var"], 6),
+        "cvar": round(metrics["cvar"], 6),
+        "value_at_risk": round(metrics["var"] * float(market_values.sum()), 2),
+        "max_drawdown": round(drawdown, 6),
+        "betas": {name: _round_or_none(beta) for name, beta in zip(benchmarks, metrics["betas"])},
+        "weights": {ticker: round(float(weight), 6) for ticker, weight in zip(tickers, weights)},
+        "correlation": {
+            "tickers": tickers,
+            "matrix": np.round(metrics["correlation"], 4).tolist()
+        },
+        "unpriced": sorted(set(shares.index) - set(priced))
+    }
+
+
+def portfolio_risk(portfolio_id, confidence=None):
+    """compute_risk, cached per portfolio per day and transactions version."""
+    key = (portfolio_id, confidence, date.today().isoformat(), transactions_version(portfolio_id))
+    return performance_cache.get_or_load("risk", key, lambda: compute_risk(portfolio_id, confidence))
@@ -0,0 +1,334 @@
+# portfolio_engine.py
+import numpy as np
+import pandas as pd
+
+RESOLUTIONS = ("daily", "weekly", "monthly")
+
+
+def transactions_frame(transactions):
+    """
+    Build a frame of signed share changes from transaction rows.
+
+    Args:
+        transactions (iterable): Objects with created_at, ticker, shares, price
+                                 and transaction_type (ORM rows or query tuples)
+
+    Returns:
+        pd.DataFrame: Columns date (normalized Timestamp), ticker, shares (signed:
+                      buys positive, sells negative) and price, in input order
+    """
+    records = [(
+        txn.created_at,
+        txn.ticker.upper(),
+        float(txn.shares) if txn.transaction_type.lower() == 'buy' else -float(txn.shares),
+        float(txn.price)
+    ) for txn in transactions if txn.transaction_type.lower() in ('buy', 'sell')]
+    frame = pd.DataFrame(records, columns=["date", "ticker", "shares", "price"])
+    frame["date"] = pd.to_datetime(frame["date"]).dt.normalize()
+    return frame
+
+
+def sample_dates(start_date, end_date, resolution="weekly"):
+    """
+    Sample dates from start_date up to, but not including, end_date.
+
+    Args:
+        start_date (date): First sample
+        end_date (date): Exclusive upper bound (today's point is valued live)
+        resolution (str): "daily", "weekly" or "monthly"
+
+    Returns:
+        pd.DatetimeIndex: The sample dates
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if resolution == "daily":
+        dates = pd.date_range(start, end, freq="D")
+    elif resolution == "weekly":
+        dates = pd.date_range(start, end, freq="7D")
+    elif resolution == "monthly":
+        # Offset each sample from the start so month-end starts don't drift
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        dates = pd.DatetimeIndex([start + pd.DateOffset(months=i) for i in range(months)])
+    else:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    return dates[dates < end]
+
+
+def _as_of(frame, dates):
+    """Reindex a date-indexed frame onto dates, carrying the last known value forward."""
+    frame = frame.sort_index()
+    return frame.reindex(frame.index.union(dates)).ffill().reindex(dates)
+
+
+def position_matrix(txns, dates):
+    """
+    Shares held per ticker at the end of each date.
+
+    Args:
+        txns (pd.DataFrame): Output of transactions_frame
+        dates (pd.DatetimeIndex): Dates to sample
+
+    Returns:
+        pd.DataFrame: dates x tickers
+    """
+    daily_changes = txns.pivot_table(index="date", columns="ticker", values="shares", aggfunc="sum", fill_value=0)
+    return _as_of(daily_changes.cumsum(), dates).fillna(0.0)
+
+
+def price_matrix(txns, closes, dates):
+    """
+    As-of price per ticker on each date.
+
+    Uses the last close on or before each date; before a ticker's first close
+    (or when it has none) falls back to the last transaction price.
+
+    Args:
+        txns (pd.DataFrame): Output of transactions_frame
+        closes (pd.DataFrame): Date-indexed closes, one column per ticker
+        dates (pd.DatetimeIndex): Dates to sample
+
+    Returns:
+        pd.DataFrame: dates x tickers, NaN where no price is known
+    """
+    tickers = sorted(txns["ticker"].unique())
+    prices = _as_of(closes.reindex(columns=tickers), dates)
+    txn_prices = txns.pivot_table(index="date", columns="ticker", values="price", aggfunc="last")
+    return prices.fillna(_as_of(txn_prices.reindex(columns=tickers), dates))
+
+
+def value_portfolio(txns, closes, dates):
+    """
+    Value the portfolio on every sample date in one vectorized pass.
+
+    Args:
+        txns (pd.DataFrame): Output of transactions_frame
+        closes (pd.DataFrame): Date-indexed closes, one column per ticker
+        dates (pd.DatetimeIndex): Dates to value
+
+    Returns:
+        pd.Series: Portfolio market value indexed by date
+    """
+    if txns.empty or len(dates) == 0:
+        return pd.Series(0.0, index=dates)
+    positions = position_matrix(txns, dates)
+    prices = price_matrix(txns, closes, dates).reindex(columns=positions.columns)
+    shares = positions.to_numpy(dtype=float)
+    px = prices.to_numpy(dtype=float)
+    # Short or closed positions and unknown prices contribute nothing
+    values = np.where((shares > 0) & ~np.isnan(px), shares * px, 0.0).sum(axis=1)
+    return pd.Series(values, index=dates)
+
+
+def daily_cash_flows(txns):
+    """
+    Net money put into the portfolio on each day: buys add, sells withdraw.
+
+    Args:
+        txns (pd.DataFrame): Output of transactions_frame
+
+    Returns:
+        pd.Series: Net flow indexed by date (only days with trades)
+    """
+    if txns.empty:
+        return pd.Series(dtype=float)
+    return (txns["shares"] * txns["price"]).groupby(txns["date"]).sum()
+
+
+def time_weighted_return(values, flows, start_value=0.0):
+    """
+    Chain-linked daily time-weighted return.
+
+    Each day's flow is treated as arriving at the start of the day, so the
+    day's return is value / (previous value + flow) - 1. Days with nothing
+    invested contribute no return.
+
+    Args:
+        values (pd.Series): End-of-day values for consecutive days in the window
+        flows (pd.Series): Net flows by date (may include days outside the window)
+        start_value (float): Value at the close before the first day
+
+    Returns:
+        float: The compounded return over the window (0.05 = 5%)
+    """
+    if values.empty:
+        return 0.0
+    return float(np.prod(daily_growth(values, flows, start_value)) - 1.0)
+
+
+def daily_growth(values, flows, start_value=0.0):
+    """
+    Flow-adjusted growth factor for each day, as used by time_weighted_return.
+
+    Returns:
+        np.ndarray: value / (previous value + flow) per day, 1.0 where nothing
+                    was invested
+    """
+    day_flows = flows.reindex(values.index, fill_value=0.0).to_numpy(dtype=float)
+    current = values.to_numpy(dtype=float)
+    previous = np.concatenate(([start_value], current[:-1]))
+    invested = previous + day_flows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(invested > 0, current / invested, 1.0)
+
+
+def _npv(rate, amounts, years):
+    return float(np.sum(amounts * (1.0 + rate) ** -years))
+
+
+def _npv_derivative(rate, amounts, years):
+    return float(np.sum(-years * amounts * (1.0 + rate) ** (-years - 1.0)))
+
+
+def _brent(f, low, high, tol=1e-10, max_iter=200):
+    """Brent's method for a root of f bracketed by [low, high]."""
+    a, b = low, high
+    fa, fb = f(a), f(b)
+    if fa * fb > 0:
+        return None
+    if abs(fa) < abs(fb):
+        a, b, fa, fb = b, a, fb, fa
+    c, fc, d = a, fa, b - a
+    bisected = True
+    for _ in range(max_iter):
+        if fb == 0 or abs(b - a) < tol:
+            return b
+        if fa != fc and fb != fc:
+            # Inverse quadratic interpolation
+            s = (a * fb * fc / ((fa - fb) * (fa - fc)) +
+                 b * fa * fc / ((fb - fa) * (fb - fc)) +
+                 c * fa * fb / ((fc - fa) * (fc - fb)))
+        else:
+            s = b - fb * (b - a) / (fb - fa)
+        use_bisection = (
+            not ((3 * a + b) / 4 < s < b or b < s < (3 * a + b) / 4) or
+            (bisected and abs(s - b) >= abs(b - c) / 2) or
+            (not bisected and abs(s - b) >= abs(c - d) / 2)
+        )
+        if use_bisection:
+            s = (a + b) / 2
+        bisected = use_bisection
+        fs = f(s)
+        d, c, fc = c, b, fb
+        if fa * fs < 0:
+            b, fb = s, fs
+        else:
+            a, fa = s, fs
+        if abs(fa) < abs(fb):
+            a, b, fa, fb = b, a, fb, fa
+    return b
+
+
+def xirr(amounts, dates, guess=0.1, tol=1e-10, max_iter=50):
+    """
+    Annualized money-weighted return of dated cash flows.
+
+    Newton's method from guess, falling back to Brent's method on a bracketed
+    interval if Newton leaves the valid range or does not converge.
+
+    Args:
+        amounts (array-like): Flows from the investor's side (money in negative,
+                              money out and the final value positive)
+        dates (array-like): Date of each flow
+        guess (float): Starting rate for Newton's method
+        tol (float): Convergence tolerance on the rate
+        max_iter (int): Newton iterations before falling back
+
+    Returns:
+        float: The rate (0.08 = 8% a year), or None if the flows have no
+               sign change or no root was found
+    """
+    amounts = np.asarray(amounts, dtype=float)
+    if len(amounts) < 2 or not (amounts.min() < 0 < amounts.max()):
+        return None
+    days = pd.DatetimeIndex(dates)
+    years = ((days - days.min()).days.to_numpy() / 365.0).astype(float)
+
+    rate = guess
+    for _ in range(max_iter):
+        derivative = _npv_derivative(rate, amounts, years)
+        if derivative == 0 or not np.isfinite(derivative):
+            break
+        step = _npv(rate, amounts, years) / derivative
+        rate -= step
+        if rate <= -1 or not np.isfinite(rate):
+            break
+        if abs(step) < tol:
+            return float(rate)
+
+    # Widen a bracket upward from just above -100% until the NPV changes sign
+    def npv(rate):
+        return _npv(rate, amounts, years)
+    low, high = -0.9999, 1.0
+    while npv(low) * npv(high) > 0 and high < 1e6:
+        high *= 10
+    root = _brent(npv, low, high, tol=tol)
+    return float(root) if root is not None else None
+
+
+def max_drawdown(growth):
+    """
+    Largest peak-to-trough fall of a growth index.
+
+    Args:
+        growth (np.ndarray): Daily growth factors (output of daily_growth)
+
+    Returns:
+        float: The drawdown as a negative fraction (-0.2 = 20% below the peak)
+    """
+    if len(growth) == 0:
+        return 0.0
+    index = np.cumprod(np.concatenate(([1.0], growth)))
+    return float(np.min(index / np.maximum.accumulate(index) - 1.0))
+
+
+def risk_metrics(asset_returns, weights, benchmark_returns, confidence=0.95, periods_per_year=252):
+    """
+    Volatility, benchmark betas, correlations and historical VaR/CVaR of a
+    set of weights applied to aligned daily returns.
+
+    Args:
+        asset_returns (np.ndarray): T x N daily returns, one column per holding
+        weights (np.ndarray): N portfolio weights summing to 1
+        benchmark_returns (np.ndarray): T x K daily returns of the benchmarks
+        confidence (float): VaR/CVaR confidence level
+        periods_per_year (int): Trading days used to annualize
+
+    Returns:
+        dict: volatility (annualized), daily_volatility, betas (K), correlation
+              (N x N), var and cvar (positive one-day loss fractions)
+    """
+    portfolio = asset_returns @ weights
+    observations = len(portfolio)
+
+    # Sample covariance of the holdings; portfolio variance is w' S w
+    centered = asset_returns - asset_returns.mean(axis=0)
+    covariance = centered.T @ centered / max(observations - 1, 1)
+    daily_volatility = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(std, std)
+    correlation[~np.isfinite(correlation)] = 0.0
+    np.fill_diagonal(correlation, 1.0)
+
+    # Beta of the portfolio against every benchmark at once
+    portfolio_centered = portfolio - portfolio.mean()
+    benchmark_centered = benchmark_returns - benchmark_returns.mean(axis=0)
+    benchmark_variance = (benchmark_centered ** 2).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        betas = np.where(benchmark_variance > 0,
+                         portfolio_centered @ benchmark_centered / benchmark_variance, np.nan)
+
+    # Historical simulation: the loss exceeded on (1 - confidence) of days
+    var = float(-np.quantile(portfolio, 1.0 - confidence)) if observations else 0.0
+    tail = portfolio[portfolio <= -var]
+    cvar = float(-tail.mean()) if len(tail) else var
+
+    return {
+        "volatility": daily_volatility * np.sqrt(periods_per_year),
+        "daily_volatility": daily_volatility,
+        "betas": betas,
+        "correlation": correlation,
+        "var": var,
+        "cvar": cvar
+    }
@@ -0,0 +1,226 @@
+# price_store.py
+import pandas as pd
+import yfinance as yf
+import http_client
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config import Config
+from models import db, PriceBar, PriceCoverage
+
+YAHOO_HOST = "query2.finance.yahoo.com"
+
+
+def plan_missing_ranges(coverage, start_date, end_date):
+    """
+    Work out which date ranges still need to be downloaded for each ticker.
+
+    Args:
+        coverage (dict): Map of ticker to its covered (start, end) dates, or None
+        start_date (date): First date requested
+        end_date (date): Last date requested
+
+    Returns:
+        dict: Map of ticker to a list of (start, end) date ranges to download.
+              Tickers that are fully covered are left out.
+    """
+    plan = {}
+    for ticker, covered in coverage.items():
+        if covered is None:
+            plan[ticker] = [(start_date, end_date)]
+            continue
+        # Gaps always run up to the covered range so it stays contiguous
+        covered_start, covered_end = covered
+        gaps = []
+        if start_date < covered_start:
+            gaps.append((start_date, covered_start - timedelta(days=1)))
+        if end_date > covered_end:
+            gaps.append((covered_end + timedelta(days=1), end_date))
+        if gaps:
+            plan[ticker] = gaps
+    return plan
+
+
+def download_bars(tickers, start_date, end_date):
+    """
+    Download daily bars for several tickers, one multi-symbol yf.download call
+    per chunk of HISTORY_DOWNLOAD_CHUNK_SIZE tickers.
+
+    Args:
+        tickers (list): Ticker symbols
+        start_date (date): First date to download
+        end_date (date): Last date to download (inclusive)
+
+    Returns:
+        tuple: (bars, fetched, empty) where bars is a list of row dicts for
+               PriceBar, fetched is the set of tickers that came back with at
+               least one bar and empty is the set whose download completed
+               with no rows at all (a range with no trading days). yfinance
+               reports a ticker that failed inside a multi-symbol download
+               (rate limit, timeout, unknown symbol) as an all-NaN column, so
+               such tickers are in neither set.
+    """
+    chunk_size = Config.HISTORY_DOWNLOAD_CHUNK_SIZE
+    bars = []
+    fetched = set()
+    empty = set()
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        try:
+            data = yf.download(chunk, start=start_date.isoformat(), end=(end_date + timedelta(days=1)).isoformat(),
+                               progress=False, group_by="column", session=http_client.session(YAHOO_HOST))
+        except Exception as e:
+            print(f"Error downloading historical prices for {', '.join(chunk)}: {e}")
+            continue
+        if data.empty:
+            print(f"No data returned from yfinance for {', '.join(chunk)} between {start_date} and {end_date}")
+            empty.update(chunk)
+            continue
+
+        if isinstance(data.columns, pd.MultiIndex):
+            closes = data["Close"]
+            adj_closes = data["Adj Close"] if "Adj Close" in data.columns.get_level_values(0) else closes
+        else:
+            # A single-symbol download comes back with flat columns
+            closes = data[["Close"]].rename(columns={"Close": chunk[0]})
+            adj_column = "Adj Close" if "Adj Close" in data.columns else "Close"
+            adj_closes = data[[adj_column]].rename(columns={adj_column: chunk[0]})
+
+        index = pd.DatetimeIndex(data.index).tz_localize(None).normalize()
+        for ticker in chunk:
+            if ticker not in closes.columns:
+                continue
+            close_values = closes[ticker].to_numpy(dtype=float)
+            adj_values = adj_closes[ticker].to_numpy(dtype=float)
+            ticker_bars = [{
+                "ticker": ticker,
+                "date": day.date(),
+                "close": float(close),
+                "adj_close": None if pd.isna(adj_close) else float(adj_close)
+            } for day, close, adj_close in zip(index, close_values, adj_values) if not pd.isna(close)]
+            if ticker_bars:
+                bars.extend(ticker_bars)
+                fetched.add(ticker)
+    return bars, fetched, empty
+
+
+def upsert_bars(bars, batch_size=1000):
+    """Bulk insert price bars, overwriting existing (ticker, date) rows."""
+    stmt = pg_insert(PriceBar.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["ticker", "date"],
+        set_={"close": stmt.excluded.close, "adj_close": stmt.excluded.adj_close}
+    )
+    for i in range(0, len(bars), batch_size):
+        db.session.execute(stmt, bars[i:i + batch_size])
+
+
+def fill_price_gaps(tickers, start_date, end_date):
+    """
+    Download only the date ranges missing from the store for each ticker.
+
+    Today's bar is stored but not marked as covered, since it keeps changing
+    until the market closes. A ticker is only marked as covered for a range
+    when its download returned bars, or returned nothing for a range the
+    market was closed throughout: one without weekdays, or one ending before
+    bars already stored. A failed download is retried on the next call
+    instead of leaving a permanent hole.
+
+    Args:
+        tickers (list): Ticker symbols
+        start_date (date): First date needed
+        end_date (date): Last date needed
+
+    Returns:
+        set: Tickers whose missing ranges could not be downloaded
+    """
+    rows = PriceCoverage.query.filter(PriceCoverage.ticker.in_(tickers)).all()
+    coverage = {ticker: None for ticker in tickers}
+    coverage.update({row.ticker: (row.start_date, row.end_date) for row in rows})
+    plan = plan_missing_ranges(coverage, start_date, end_date)
+    if not plan:
+        return set()
+
+    # Tickers missing the same range share one batched download
+    tickers_by_gap = defaultdict(list)
+    for ticker, gaps in plan.items():
+        for gap in gaps:
+            tickers_by_gap[gap].append(ticker)
+
+    last_final_date = date.today() - timedelta(days=1)
+    failed = set()
+    try:
+        for (gap_start, gap_end), gap_tickers in tickers_by_gap.items():
+            bars, fetched, empty = download_bars(sorted(gap_tickers), gap_start, gap_end)
+            no_weekdays = len(pd.bdate_range(gap_start, gap_end)) == 0
+            closed = {
+                ticker for ticker in empty
+                if no_weekdays or (coverage.get(ticker) and gap_end < coverage[ticker][0])
+            }
+            failed.update(set(gap_tickers) - fetched - closed)
+            upsert_bars(bars)
+            covered_end = min(gap_end, last_final_date)
+            if covered_end < gap_start:
+                continue
+            for ticker in fetched | closed:
+                covered = coverage.get(ticker)
+                new_start = min(covered[0], gap_start) if covered else gap_start
+                new_end = max(covered[1], covered_end) if covered else covered_end
+                coverage[ticker] = (new_start, new_end)
+                stmt = pg_insert(PriceCoverage.__table__).values(
+                    ticker=ticker, start_date=new_start, end_date=new_end, updated_at=datetime.utcnow())
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["ticker"],
+                    set_={
+                        "start_date": db.func.least(PriceCoverage.__table__.c.start_date, stmt.excluded.start_date),
+                        "end_date": db.func.greatest(PriceCoverage.__table__.c.end_date, stmt.excluded.end_date),
+                        "updated_at": stmt.excluded.updated_at
+                    }
+                )
+                db.session.execute(stmt)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if failed:
+        print(f"Price gaps left unfilled for {', '.join(sorted(failed))} between {start_date} and {end_date}")
+    return failed
+
+
+def get_close_prices(tickers, start_date, end_date=None, field="close", fill=True):
+    """
+    Read daily closes from the price_bars store, downloading missing ranges first.
+
+    Args:
+        tickers (iterable): Ticker symbols
+        start_date (date): First date to return
+        end_date (date, optional): Last date to return. Defaults to today.
+        field (str): "close" or "adj_close"
+        fill (bool): Download missing ranges first. Filling commits, so
+                     callers holding a lock read the store as it is instead.
+
+    Returns:
+        pd.DataFrame: Date-indexed frame with one column per ticker; days
+                      without a bar for a ticker are NaN
+    """
+    tickers = sorted(set(ticker.upper() for ticker in tickers))
+    if end_date is None:
+        end_date = date.today()
+    if not tickers:
+        return pd.DataFrame(dtype=float)
+
+    if fill:
+        fill_price_gaps(tickers, start_date, end_date)
+
+    column = getattr(PriceBar, field)
+    rows = db.session.query(PriceBar.date, PriceBar.ticker, column) \
+        .filter(PriceBar.ticker.in_(tickers), PriceBar.date >= start_date, PriceBar.date <= end_date) \
+        .all()
+    if not rows:
+        return pd.DataFrame(columns=tickers, dtype=float)
+
+    frame = pd.DataFrame(rows, columns=["date", "ticker", "price"])
+    prices = frame.pivot(index="date", columns="ticker", values="price").reindex(columns=tickers)
+    prices.index = pd.DatetimeIndex(prices.index)
+    return prices.sort_index().astype(float)
@@ -0,0 +1,40 @@
+# query_stats.py
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+
+
+def install_query_counter(app):
+    """
+    Count the SQL statements each request runs, when QUERY_COUNT_ENABLED is set.
+
+    The count is returned in an X-Query-Count response header, and requests
+    running more than QUERY_COUNT_WARN_THRESHOLD statements are logged, so a
+    route that starts re-querying what authenticate already loaded shows up.
+    Work done on background threads is not counted.
+    """
+    if not app.config['QUERY_COUNT_ENABLED']:
+        return
+    # Listens on every engine, so only once per process however many apps are created
+    if not event.contains(Engine, "before_cursor_execute", _count_query):
+        event.listen(Engine, "before_cursor_execute", _count_query)
+
+    @app.before_request
+    def reset_query_count():
+        # g belongs to the app context, which outlives the request when one
+        # was already pushed (the CLI, tests)
+        g.query_count = 0
+
+    @app.after_request
+    def report_query_count(response):
+        count = g.get("query_count", 0)
+        response.headers["X-Query-Count"] = str(count)
+        threshold = app.config['QUERY_COUNT_WARN_THRESHOLD']
+        if threshold and count > threshold:
+            app.logger.warning(f"{request.method} {request.path} ran {count} queries (threshold {threshold})")
+        return response
@@ -0,0 +1,104 @@
+# refresher.py
+import os
+import threading
+import time
+
+from scheduler import BACKGROUND, priority
+
+
+class BackgroundRefresher:
+    """
+    Keeps the result of loader() fresh from a daemon thread.
+
+    Readers always get the last good snapshot immediately, even while a refresh
+    is running or after a refresh fails. Only the very first read, before any
+    snapshot exists, waits for a load. The thread starts on first use so each
+    gunicorn worker gets its own after forking.
+
+    Args:
+        name (str): Name used for the thread and in logs
+        loader (callable): Produces a new snapshot
+        interval (float): Seconds between refreshes
+        app (Flask, optional): If given, loader runs inside an app context
+    """
+
+    def __init__(self, name, loader, interval, app=None):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        self.app = app
+        self._snapshot = None
+        self._refreshed_at = None
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread_pid = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def _load(self):
+        if self.app is None:
+            return self.loader()
+        with self.app.app_context():
+            return self.loader()
+
+    def refresh(self):
+        """Load a new snapshot now. Keeps the previous one if the load fails."""
+        with self._refresh_lock:
+            try:
+                snapshot = self._load()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Error refreshing {self.name}: {e}")
+                return False
+            self._snapshot = snapshot
+            self._refreshed_at = time.time()
+            self.refreshes += 1
+            self.last_error = None
+            return True
+
+    def get(self):
+        """
+        Return the latest snapshot.
+
+        Raises:
+            RuntimeError: If no snapshot has ever loaded successfully
+        """
+        self._ensure_started()
+        if self._snapshot is None:
+            with self._start_lock:
+                if self._snapshot is None:
+                    self.refresh()
+            if self._snapshot is None:
+                raise RuntimeError(f"{self.name} unavailable: {self.last_error}")
+        return self._snapshot
+
+    def _ensure_started(self):
+        if self._thread_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._run, name=f"refresher-{self.name}", daemon=True)
+            thread.start()
+            self._thread_pid = os.getpid()
+
+    def _run(self):
+        # Upstream calls from the refresh thread queue behind user requests
+        with priority(BACKGROUND):
+            while not self._stop.wait(self.interval):
+                self.refresh()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "refreshed_at": self._refreshed_at,
+            "age_seconds": round(time.time() - self._refreshed_at, 1) if self._refreshed_at else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
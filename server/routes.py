@@ -2,6 +2,7 @@
 import uuid
 from re import findall
 import os
+import math
 import time
 import json
 import requests
@@ -9,24 +10,42 @@ import pandas as pd
 import csv
 import openai
 
-from flask import Flask, jsonify, request, g
-from firebase_admin import auth
+from flask import Flask, jsonify, request, g, stream_with_context
 from finvizfinance.quote import finvizfinance
-from finvizfinance.news import News
 from io import StringIO
 from datetime import datetime
-from datetime import datetime, timedelta
-from collections import defaultdict
-
-from models import db, User, Watchlist, Portfolio, Transaction, PortfolioHolding, UserThread
-from helpers import convert_data, safe_convert, parse_csv_with_mapping, fetch_stock_data, fetch_market_price, recalc_portfolio, fetch_stock_sector, wait_for_run_completion, cleanup_old_threads, fetch_historical_price, fetch_batch_historical_prices, fetch_market_benchmarks
+from sqlalchemy import tuple_
+
+import alpha_vantage
+import http_client
+from alpha_vantage import AlphaVantageError, time_series_parser
+from symbol_index import SymbolIndex
+from refresher import BackgroundRefresher
+from portfolio_engine import RESOLUTIONS, transactions_frame, sample_dates
+from snapshots import load_daily_values
+from models import db, User, Watchlist, Portfolio, Transaction, PortfolioHolding, UserThread, IngestJob
+from helpers import convert_data, safe_convert, parse_csv_with_mapping, fetch_stock_data, fetch_market_price, fetch_market_prices, encode_cursor, decode_cursor, stream_transactions, recalc_portfolio, fetch_stock_sector, wait_for_run_completion, cleanup_old_threads, quote_cache, load_ticker_fundamentals, fan_out, fetch_batch_close_prices, fetch_market_news_payload, load_market_benchmarks, apply_new_transaction, bulk_insert_transactions, normalize_upload_row
+from ingest import spool_upload, submit_ingest_job
+from auth_cache import authenticate_token, token_cache, PortfolioRef
+from performance import WINDOWS, performance_cache, portfolio_returns, portfolio_risk
 
 openai.api_key = os.getenv("OPENAI_AGENT_API_KEY")
 ASSISTANT_ID = os.getenv("STOCKR_ASSISTANT_ID")
-ALPHA_ID = os.getenv("STOCKR_ALPHA_ID")
 
 def register_routes(app):
 
+    # Local symbol index so search-as-you-type rarely needs an upstream call
+    symbols = SymbolIndex(app.config['SYMBOL_LISTING_PATH'], app.config['SYMBOL_INDEX_RELOAD_INTERVAL'])
+    symbols.load()
+
+    # Market news is the same for every user, so it is scraped on an interval
+    # and served pre-serialized
+    market_news = BackgroundRefresher("market-news", fetch_market_news_payload, app.config['MARKET_NEWS_REFRESH_SECONDS'])
+
+    # Benchmark indices are identical for every chat, so keep a shared snapshot
+    benchmark_snapshot = BackgroundRefresher(
+        "benchmarks", load_market_benchmarks, app.config['BENCHMARK_REFRESH_SECONDS'], app=app)
+
     # Before each request, check Firebase token for protected endpoints.
     @app.before_request
     def authenticate():
@@ -39,7 +58,8 @@ def register_routes(app):
             'withdraw_cash', 'delete_transaction', 'get_transactions', 'buy_asset', 'sell_asset',
             'get_portfolio_id', 'sell_portfolio_asset', 'add_portfolio_asset', 'get_stock_market_price',
             'search_stocks', 'upload_transactions', 'get_portfolio_assistant_context', 'start_chat_thread',
-            'continue_chat_thread', 'get_portfolio_history'
+            'continue_chat_thread', 'get_portfolio_history', 'create_upload_job', 'get_upload_job',
+            'export_transactions', 'get_portfolio_returns', 'get_portfolio_risk', 'resume_upload_job'
         ]
         if request.endpoint in protected_endpoints:
             auth_header = request.headers.get('Authorization')
@@ -47,29 +67,60 @@ def register_routes(app):
                 return jsonify({"error": "Unauthorized"}), 401
             id_token = auth_header.split('Bearer ')[1]
             try:
-                decoded_token = auth.verify_id_token(id_token)
-                g.user = User.query.filter_by(firebase_uid=decoded_token['uid']).first()
+                # Verified tokens are cached until they expire, so repeat
+                # requests skip signature checks and the user lookup
+                g.user = authenticate_token(id_token)
                 if not g.user:
                     return jsonify({"error": "User not found"}), 401
+                # Loaded together with the user, so routes never query for it
+                g.portfolio = PortfolioRef(g.user.portfolio_id, g.user.id) if g.user.portfolio_id else None
             except Exception as e:
                 return jsonify({"error": str(e)}), 401
 
+    def owned_portfolio(portfolio_id=None):
+        """
+        The signed-in user's portfolio as loaded by authenticate, or None if
+        they have none or portfolio_id is someone else's.
+        """
+        portfolio = g.get('portfolio')
+        if portfolio is None or (portfolio_id is not None and portfolio.id != portfolio_id):
+            return None
+        return portfolio
+
     # --- Route Definitions ---
 
     @app.route("/")
     def home():
         return jsonify({"message": "FinViz Stock Watchlist API is running!"})
 
+    @app.route("/api/metrics", methods=["GET"])
+    def get_metrics():
+        return jsonify({
+            "quote_cache": quote_cache.stats(),
+            "alpha_vantage_cache": alpha_vantage.av_cache.stats(),
+            "alpha_vantage_scheduler": alpha_vantage.av_scheduler.stats(),
+            "http": http_client.stats(),
+            "symbol_index_size": len(symbols),
+            "market_news": market_news.stats(),
+            "benchmarks": benchmark_snapshot.stats(),
+            "auth_token_cache": token_cache.stats(),
+            "performance_cache": performance_cache.stats()
+        }), 200
+
     @app.route("/api/calendar", methods=["GET"])
     def get_economic_calendar():
         return jsonify({"message": "FinViz Stock Watchlist API is running!"})
 
     @app.route("/api/stocks/<string:query>", methods=["GET"])
     def search_stocks(query):
+        local_matches = symbols.search(query, limit=5)
+        if local_matches:
+            stocks = [{"symbol": match["symbol"], "name": match["name"]} for match in local_matches]
+            return jsonify({"stocks": stocks}), 200
         try:
             yahoo_api_url = f"https://query1.finance.yahoo.com/v6/finance/autocomplete?lang=en&query={query}"
             headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(yahoo_api_url, headers=headers, timeout=5)
+            response = http_client.get(yahoo_api_url, headers=headers)
             response.raise_for_status()
             data = response.json()
             results = data.get("ResultSet", {}).get("Result", [])
@@ -111,12 +162,14 @@ def register_routes(app):
         try:
             watchlist_items = Watchlist.query.filter_by(user_id=g.user.id).all()
             tickers = [item.ticker for item in watchlist_items]
+            # Fetch all tickers concurrently; tickers that error or miss the
+            # deadline are returned with an error instead of failing the request.
+            results = fan_out(app, fetch_stock_data, tickers, app.config['WATCHLIST_FETCH_DEADLINE'])
             stocks_data = []
-            for ticker in tickers:
-                try:
-                    stock_data = fetch_stock_data(ticker)
+            for ticker, stock_data, inner_error in results:
+                if inner_error is None:
                     stocks_data.append(stock_data)
-                except Exception as inner_error:
+                else:
                     stocks_data.append({"ticker": ticker, "error": str(inner_error)})
             return jsonify(stocks_data), 200
         except Exception as e:
@@ -129,6 +182,9 @@ def register_routes(app):
             return jsonify({"error": "Ticker is required"}), 400
         ticker = data['ticker'].upper()
         try:
+            # (user_id, ticker) is unique, so adding a ticker twice is a no-op
+            if Watchlist.query.filter_by(user_id=g.user.id, ticker=ticker).first():
+                return jsonify({"message": "Ticker already in watchlist", "ticker": ticker, "user_id": g.user.id}), 200
             new_watchlist_item = Watchlist(user_id=g.user.id, ticker=ticker)
             db.session.add(new_watchlist_item)
             db.session.commit()
@@ -154,67 +210,60 @@ def register_routes(app):
     @app.route("/api/stock/historical/<string:symbol>", methods=["GET"])
     def get_stock_historical(symbol):
         symbol = symbol.upper()
-        url = f'https://www.alphavantage.co/query?function=TIME_SERIES_WEEKLY_ADJUSTED&symbol={symbol}&outputsize=full&apikey={ALPHA_ID}'
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "Error Message" in data:
-                return jsonify({"error": data["Error Message"]}), 400
-            if "Weekly Adjusted Time Series" not in data:
-                return jsonify({"error": "Invalid response from Alpha Vantage"}), 400
-            time_series = data["Weekly Adjusted Time Series"]
-            dates = sorted(time_series.keys())
-            prices = [time_series[date]["5. adjusted close"] for date in dates]
-            graph_data = {"dates": dates, "prices": prices}
+            graph_data = alpha_vantage.query(
+                "TIME_SERIES_WEEKLY_ADJUSTED",
+                {"symbol": symbol, "outputsize": "full"},
+                parse=time_series_parser("Weekly Adjusted Time Series", "5. adjusted close")
+            )
             return jsonify(graph_data), 200
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/crypto/historical/<string:symbol>", methods=["GET"])
     def get_crypto_historical(symbol):
         symbol = symbol.upper()
-        url = f'https://www.alphavantage.co/query?function=DIGITAL_CURRENCY_DAILY&symbol={symbol}&market=USD&apikey={ALPHA_ID}'
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-            if "Error Message" in data:
-                return jsonify({"error": data["Error Message"]}), 400
-            if "Time Series (Digital Currency Daily)" not in data:
-                return jsonify({"error": "Invalid response from Alpha Vantage"}), 400
-            time_series = data["Time Series (Digital Currency Daily)"]
-            dates = sorted(time_series.keys())
-            prices = [time_series[date]["4a. close (USD)"] for date in dates]
-            graph_data = {"dates": dates, "prices": prices}
+            graph_data = alpha_vantage.query(
+                "DIGITAL_CURRENCY_DAILY",
+                {"symbol": symbol, "market": "USD"},
+                parse=time_series_parser("Time Series (Digital Currency Daily)", "4a. close (USD)")
+            )
             return jsonify(graph_data), 200
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/market-news", methods=["GET"])
     def get_market_news():
         try:
-            news = News()
-            news_data = news.get_news()
-            news_data_converted = {}
-            for key, value in news_data.items():
-                if hasattr(value, "to_dict"):
-                    news_data_converted[key] = value.to_dict(orient='records')
-                else:
-                    news_data_converted[key] = value
-            response = {"relevant_news": news_data_converted}
-            return jsonify(response), 200
+            return app.response_class(market_news.get(), status=200, mimetype="application/json")
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
     @app.route("/api/ticker-search", methods=["GET"])
     def get_ticker():
         keyword = request.args.get('keywords', 'Microsoft')
-        url = f'https://www.alphavantage.co/query?function=SYMBOL_SEARCH&keywords={keyword}&apikey={ALPHA_ID}'
-        r = requests.get(url)
-        if r.status_code != 200:
+        local_matches = symbols.search(keyword, limit=10)
+        if local_matches:
+            # Same shape as Alpha Vantage SYMBOL_SEARCH; the listing only covers US markets
+            best_matches = [{
+                "1. symbol": match["symbol"],
+                "2. name": match["name"],
+                "3. type": "Equity" if match["type"] == "Stock" else match["type"],
+                "4. region": "United States",
+                "8. currency": "USD"
+            } for match in local_matches]
+            return jsonify({"bestMatches": best_matches}), 200
+        try:
+            data = alpha_vantage.query("SYMBOL_SEARCH", {"keywords": keyword})
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
+        except requests.RequestException:
             return jsonify({"error": "Failed to fetch data from Alpha Vantage"}), 500
-        data = r.json()
         return jsonify(data), 200
 
     @app.route("/api/news-sentiment", methods=["GET"])
@@ -223,17 +272,14 @@ def register_routes(app):
         if not tickers:
             return jsonify({"error": "The 'tickers' query parameter is required."}), 400
         topics = request.args.get('topics')
-        url = f'https://www.alphavantage.co/query?function=NEWS_SENTIMENT&tickers={tickers}'
-        if topics:
-            url += f'&topics={topics}'
-        url += f'&apikey={ALPHA_ID}'
-        print(url)
+        if not alpha_vantage.canonical_sentiment_params(tickers)[0]:
+            return jsonify({"error": "The 'tickers' query parameter is required."}), 400
         try:
-            response = requests.get(url)
-            response.raise_for_status()
+            data = alpha_vantage.news_sentiment(tickers, topics)
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except requests.RequestException as req_err:
             return jsonify({"error": f"Failed to fetch data from Alpha Vantage: {req_err}"}), 500
-        data = response.json()
         return jsonify(data), 200
 
     @app.route("/api/income-statement", methods=["GET"])
@@ -241,13 +287,12 @@ def register_routes(app):
         symbol = request.args.get('symbol')
         if not symbol:
             return jsonify({"error": "The 'symbol' query parameter is required."}), 400
-        url = f'https://www.alphavantage.co/query?function=INCOME_STATEMENT&symbol={symbol}&apikey={ALPHA_ID}'
         try:
-            response = requests.get(url)
-            response.raise_for_status()
+            data = alpha_vantage.query("INCOME_STATEMENT", {"symbol": symbol.upper()})
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except requests.RequestException as req_err:
             return jsonify({"error": f"Failed to fetch data from Alpha Vantage: {req_err}"}), 500
-        data = response.json()
         return jsonify(data), 200
 
     @app.route("/api/balance-sheet", methods=["GET"])
@@ -255,13 +300,12 @@ def register_routes(app):
         symbol = request.args.get('symbol')
         if not symbol:
             return jsonify({"error": "The 'symbol' query parameter is required."}), 400
-        url = f'https://www.alphavantage.co/query?function=BALANCE_SHEET&symbol={symbol}&apikey={ALPHA_ID}'
         try:
-            response = requests.get(url)
-            response.raise_for_status()
+            data = alpha_vantage.query("BALANCE_SHEET", {"symbol": symbol.upper()})
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except requests.RequestException as req_err:
             return jsonify({"error": f"Failed to fetch data from Alpha Vantage: {req_err}"}), 500
-        data = response.json()
         return jsonify(data), 200
 
     @app.route("/api/cash-flow", methods=["GET"])
@@ -269,13 +313,12 @@ def register_routes(app):
         symbol = request.args.get('symbol')
         if not symbol:
             return jsonify({"error": "The 'symbol' query parameter is required."}), 400
-        url = f'https://www.alphavantage.co/query?function=CASH_FLOW&symbol={symbol}&apikey={ALPHA_ID}'
         try:
-            response = requests.get(url)
-            response.raise_for_status()
+            data = alpha_vantage.query("CASH_FLOW", {"symbol": symbol.upper()})
+        except AlphaVantageError as e:
+            return jsonify({"error": str(e)}), 400
         except requests.RequestException as req_err:
             return jsonify({"error": f"Failed to fetch data from Alpha Vantage: {req_err}"}), 500
-        data = response.json()
         return jsonify(data), 200
 
     @app.route("/api/portfolio/<string:portfolio_id>", methods=["GET"])
@@ -283,18 +326,54 @@ def register_routes(app):
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
+            try:
+                max_age = float(request.args.get('max_age', app.config['PORTFOLIO_QUOTE_MAX_AGE']))
+            except ValueError:
+                max_age = None
+            # A negative or NaN max_age would turn every cached quote into a scrape
+            if max_age is None or not math.isfinite(max_age) or max_age < 0:
+                return jsonify({"error": "max_age must be a non-negative number of seconds"}), 400
             portfolio_entries = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id).all()
-            portfolio_list = [{
-                "ticker": entry.ticker,
-                "shares": float(entry.shares),
-                "average_cost": float(entry.average_cost) if entry.average_cost is not None else 0,
-                "book_value": float(entry.book_value) if entry.book_value is not None else 0,
-                "market_value": 0
-            } for entry in portfolio_entries]
-            return jsonify({"portfolio": portfolio_list}), 200
+
+            # One batched quote lookup for every holding, served from the
+            # cache when prices are at most max_age seconds old
+            prices, quote_errors = fetch_market_prices(
+                app, [entry.ticker for entry in portfolio_entries], max_age=max_age)
+
+            portfolio_list = []
+            for entry in portfolio_entries:
+                shares = float(entry.shares)
+                book_value = float(entry.book_value) if entry.book_value is not None else 0
+                price = prices.get(entry.ticker.upper())
+                market_value = round(shares * price, 2) if price is not None else None
+                portfolio_list.append({
+                    "ticker": entry.ticker,
+                    "shares": shares,
+                    "average_cost": float(entry.average_cost) if entry.average_cost is not None else 0,
+                    "book_value": book_value,
+                    "market_price": price,
+                    "market_value": market_value,
+                    "unrealized_gain": round(market_value - book_value, 2) if market_value is not None else None,
+                    "unrealized_gain_pct": round((market_value - book_value) / book_value * 100, 2)
+                    if market_value is not None and book_value else None,
+                    "quote_error": quote_errors.get(entry.ticker.upper())
+                })
+
+            # Weights are shares of the total priced market value
+            total_market_value = sum(item["market_value"] for item in portfolio_list if item["market_value"] is not None)
+            for item in portfolio_list:
+                item["weight"] = round(item["market_value"] / total_market_value, 4) \
+                    if item["market_value"] is not None and total_market_value else None
+
+            total_book_value = sum(item["book_value"] for item in portfolio_list)
+            return jsonify({
+                "portfolio": portfolio_list,
+                "total_market_value": round(total_market_value, 2),
+                "total_book_value": round(total_book_value, 2)
+            }), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -310,8 +389,7 @@ def register_routes(app):
             return jsonify({"error": "Ticker, shares, and price are required."}), 400
         ticker = ticker.upper()
         try:
-            user = g.user
-            portfolio = Portfolio.query.filter_by(user_id=user.id).first()
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "Portfolio not found"}), 404
             new_txn = Transaction(
@@ -322,8 +400,7 @@ def register_routes(app):
                 transaction_type="buy"
             )
             db.session.add(new_txn)
-            db.session.commit()
-            recalc_portfolio(portfolio.id, ticker)
+            apply_new_transaction(new_txn)
             return jsonify({"message": "Asset purchased successfully.", "ticker": ticker}), 201
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -340,8 +417,7 @@ def register_routes(app):
             return jsonify({"error": "Ticker, shares, and price are required."}), 400
         ticker = ticker.upper()
         try:
-            user = g.user
-            portfolio = Portfolio.query.filter_by(user_id=user.id).first()
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "Portfolio not found"}), 404
             holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio.id, ticker=ticker).first()
@@ -355,8 +431,7 @@ def register_routes(app):
                 transaction_type="sell"
             )
             db.session.add(new_txn)
-            db.session.commit()
-            recalc_portfolio(portfolio.id, ticker)
+            apply_new_transaction(new_txn)
             return jsonify({"message": "Asset sold successfully.", "ticker": ticker}), 201
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -376,7 +451,7 @@ def register_routes(app):
             if not ticker or shares is None or price is None:
                 return jsonify({"error": "Ticker, shares, and price are required."}), 400
             ticker = ticker.upper()
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
             new_txn = Transaction(
@@ -387,8 +462,7 @@ def register_routes(app):
                 transaction_type=transaction_type
             )
             db.session.add(new_txn)
-            recalc_portfolio(portfolio.id, ticker)
-            db.session.commit()
+            apply_new_transaction(new_txn)
             return jsonify({"message": "Transaction recorded and portfolio updated successfully."}), 201
         except Exception as e:
             db.session.rollback()
@@ -409,7 +483,7 @@ def register_routes(app):
             if not ticker or shares is None or price is None:
                 return jsonify({"error": "Ticker, shares, and price are required."}), 400
             ticker = ticker.upper()
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
             portfolio_entry = PortfolioHolding.query.filter_by(portfolio_id=portfolio.id, ticker=ticker).first()
@@ -423,8 +497,7 @@ def register_routes(app):
                 transaction_type=transaction_type
             )
             db.session.add(new_txn)
-            recalc_portfolio(portfolio.id, ticker)
-            db.session.commit()
+            apply_new_transaction(new_txn)
             return jsonify({"message": "Transaction recorded and portfolio updated successfully."}), 201
         except Exception as e:
             db.session.rollback()
@@ -435,7 +508,7 @@ def register_routes(app):
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
             portfolio_entries = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id).all()
@@ -449,13 +522,40 @@ def register_routes(app):
 
     @app.route("/api/transactions", methods=["GET"])
     def get_transactions():
+        """
+        Returns one page of transactions, newest first. Pass ?limit= for the
+        page size and the previous page's next_cursor as ?cursor= to page back.
+        """
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
-            portfolio = Portfolio.query.filter_by(user_id=g.user.id).first()
+            try:
+                limit = int(request.args.get('limit', app.config['TRANSACTIONS_PAGE_SIZE']))
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+            limit = max(1, min(limit, app.config['TRANSACTIONS_MAX_PAGE_SIZE']))
+            cursor = request.args.get('cursor')
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except ValueError:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "Portfolio not found"}), 404
-            transactions = Transaction.query.filter_by(portfolio_id=portfolio.id).order_by(Transaction.created_at.desc()).limit(15).all()
+
+            # Keyset pagination: continue strictly after the last row seen, in
+            # (created_at, id) order, so deep pages cost the same as the first
+            query = db.session.query(
+                Transaction.id, Transaction.ticker, Transaction.shares, Transaction.price,
+                Transaction.transaction_type, Transaction.created_at
+            ).filter(Transaction.portfolio_id == portfolio.id)
+            if after is not None:
+                query = query.filter(tuple_(Transaction.created_at, Transaction.id) < after)
+            rows = query.order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(limit + 1).all()
+
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             transactions_list = [{
                 "id": txn.id,
                 "ticker": txn.ticker,
@@ -463,49 +563,52 @@ def register_routes(app):
                 "price": float(txn.price),
                 "transaction_type": txn.transaction_type,
                 "created_at": txn.created_at.isoformat()
-            } for txn in transactions]
-            return jsonify({"transactions": transactions_list}), 200
+            } for txn in rows]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+            return jsonify({"transactions": transactions_list, "next_cursor": next_cursor}), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/api/transactions/export", methods=["GET"])
+    def export_transactions():
+        """
+        Streams every transaction, oldest first, as NDJSON (?format=ndjson, the
+        default) or CSV (?format=csv). Rows are read through a server-side
+        cursor in batches, so memory use does not grow with the history.
+        """
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ("ndjson", "csv"):
+            return jsonify({"error": "format must be ndjson or csv"}), 400
+        portfolio = owned_portfolio()
+        if not portfolio:
+            return jsonify({"error": "Portfolio not found"}), 404
+
+        chunks = stream_transactions(portfolio.id, export_format, app.config['EXPORT_BATCH_SIZE'])
+        mimetype = "application/x-ndjson" if export_format == "ndjson" else "text/csv"
+        return app.response_class(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=transactions.{export_format}"}
+        )
+
     @app.route("/api/transactions/<string:transaction_id>", methods=["DELETE"])
     def delete_transaction(transaction_id):
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
-            portfolio = Portfolio.query.filter_by(user_id=g.user.id).first()
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "Portfolio not found"}), 404
             transaction = Transaction.query.filter_by(id=transaction_id, portfolio_id=portfolio.id).first()
             if not transaction:
                 return jsonify({"error": "Transaction not found"}), 404
             ticker = transaction.ticker
-            shares = float(transaction.shares)
-            price = float(transaction.price)
-            total_value = shares * price
-            holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio.id, ticker=ticker).first()
-            if transaction.transaction_type.lower() == 'buy':
-                if holding:
-                    holding.shares -= shares
-                    holding.book_value -= total_value
-                    if holding.shares <= 0:
-                        db.session.delete(holding)
-            elif transaction.transaction_type.lower() == 'sell':
-                if holding:
-                    holding.shares += shares
-                    holding.book_value += total_value
-                else:
-                    new_holding = PortfolioHolding(
-                        id=str(uuid.uuid4()),
-                        portfolio_id=portfolio.id,
-                        ticker=ticker,
-                        shares=shares,
-                        average_cost=price,
-                        book_value=total_value
-                    )
-                    db.session.add(new_holding)
+            since = transaction.created_at
             db.session.delete(transaction)
-            db.session.commit()
+            db.session.flush()
+            # Replay only the transactions after the deleted one
+            recalc_portfolio(portfolio.id, ticker, since=since)
+            holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio.id, ticker=ticker).first()
             return jsonify({
                 "message": "Transaction deleted successfully.",
                 "updated_portfolio": {
@@ -555,7 +658,7 @@ def register_routes(app):
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
-            portfolio = Portfolio.query.filter_by(user_id=g.user.id).first()
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "Portfolio not found"}), 404
             return jsonify({"portfolio_id": portfolio.id}), 200
@@ -587,113 +690,139 @@ def register_routes(app):
                 return jsonify({"error": "No valid transactions found in the file"}), 400
 
             # Get the portfolio for the authenticated user using the provided portfolio_id.
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
 
-            transactions_added = 0
+            rows = []
             errors = []
-            tickers_set = set()
 
             for transaction in transactions:
-                # Normalize ticker.
-                ticker = transaction.get("ticker", "").strip().upper()
-
-                try:
-                    shares = float(transaction.get("shares", 0))
-                    price = float(transaction.get("price", 0))
-                except ValueError as e:
-                    errors.append(f"Invalid numeric values in transaction: {transaction}. Error: {str(e)}")
-                    continue
-
-                transaction_type = transaction.get("transaction_type", "buy").strip().lower()
-
-                # Process the date if provided. We'll use it to override created_at.
-                transaction_date = transaction.get("date")
-                created_at_val = None
-                if transaction_date:
-                    # If the date is already a date/datetime object, combine with midnight if needed.
-                    if isinstance(transaction_date, datetime):
-                        created_at_val = transaction_date
-                    elif hasattr(transaction_date, "year"):
-                        created_at_val = datetime.combine(transaction_date, datetime.min.time())
-                    else:
-                        # Otherwise, try parsing from string (assumes formats like YYYY-MM-DD).
-                        try:
-                            created_at_val = datetime.strptime(transaction_date, "%Y-%m-%d")
-                        except Exception:
-                            # If parsing fails, leave created_at_val as None (default will be used).
-                            pass
-
-                if not ticker or shares <= 0 or price <= 0:
-                    errors.append(f"Invalid data in transaction: {transaction}")
-                    continue
-
-                tickers_set.add(ticker)
-
-                # Create the transaction record.
-                # If a CSV date is provided, override created_at.
-                if created_at_val is not None:
-                    new_txn = Transaction(
-                        portfolio_id=portfolio.id,
-                        ticker=ticker,
-                        shares=shares,
-                        price=price,
-                        transaction_type=transaction_type,
-                        created_at=created_at_val
-                    )
+                row, error = normalize_upload_row(transaction)
+                if error:
+                    errors.append(error)
                 else:
-                    new_txn = Transaction(
-                        portfolio_id=portfolio.id,
-                        ticker=ticker,
-                        shares=shares,
-                        price=price,
-                        transaction_type=transaction_type
-                    )
-
-                db.session.add(new_txn)
-                transactions_added += 1
-
-            if transactions_added > 0:
-                db.session.commit()
-                # Recalculate portfolio holdings for each unique ticker.
-                for ticker in tickers_set:
-                    recalc_portfolio(portfolio.id, ticker)
+                    rows.append(row)
+
+            # Insert every row in batches and rebuild the touched holdings in
+            # one set-based pass, committed atomically.
+            started = time.perf_counter()
+            transactions_added = bulk_insert_transactions(portfolio.id, rows)["inserted"]
+            elapsed = time.perf_counter() - started
+            rows_per_second = round(transactions_added / elapsed, 1) if elapsed > 0 else None
 
             if errors:
                 return (
                     jsonify({
                         "message": f"{transactions_added} transactions added with some errors.",
                         "errors": errors,
+                        "rows_per_second": rows_per_second
                     }),
                     207,
                 )
 
-            return jsonify({"message": f"{transactions_added} transactions added successfully."}), 201
+            return jsonify({
+                "message": f"{transactions_added} transactions added successfully.",
+                "rows_per_second": rows_per_second
+            }), 201
 
         except Exception as e:
             db.session.rollback()
             app.logger.error(f"Error processing CSV file: {str(e)}")
             return jsonify({"error": f"Error processing file: {str(e)}"}), 500
 
+    @app.route("/api/portfolio/<string:portfolio_id>/upload-jobs", methods=["POST"])
+    def create_upload_job(portfolio_id):
+        """
+        Starts a background import of a CSV file and returns its job ID at once.
+        Poll /api/upload-jobs/<job_id> for progress.
+        """
+        if "file" not in request.files:
+            return jsonify({"error": "No file part in the request"}), 400
+
+        file = request.files["file"]
+        if file.filename == "":
+            return jsonify({"error": "No selected file"}), 400
+
+        try:
+            portfolio = owned_portfolio(portfolio_id)
+            if not portfolio:
+                return jsonify({"error": "Portfolio not found or unauthorized"}), 404
+
+            # Spool to disk so the file is never held in memory
+            path = spool_upload(file)
+            job = IngestJob(user_id=g.user.id, portfolio_id=portfolio.id, filename=file.filename,
+                            spool_path=path, errors=[])
+            db.session.add(job)
+            db.session.commit()
+            submit_ingest_job(app, job.id, path)
+            return jsonify({"job_id": job.id, "status": job.status}), 202
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/upload-jobs/<string:job_id>", methods=["GET"])
+    def get_upload_job(job_id):
+        job = IngestJob.query.filter_by(id=job_id, user_id=g.user.id).first()
+        if not job:
+            return jsonify({"error": "Upload job not found"}), 404
+        return jsonify({
+            "job_id": job.id,
+            "portfolio_id": job.portfolio_id,
+            "filename": job.filename,
+            "status": job.status,
+            "rows_parsed": job.rows_parsed,
+            "rows_inserted": job.rows_inserted,
+            "error_count": job.error_count,
+            "errors": job.errors,
+            "message": job.message,
+            "resumable": job.status == 'failed' and bool(job.spool_path) and os.path.exists(job.spool_path),
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None
+        }), 200
+
+    @app.route("/api/upload-jobs/<string:job_id>/resume", methods=["POST"])
+    def resume_upload_job(job_id):
+        """
+        Restarts a failed import from the row after its last committed chunk.
+        """
+        job = IngestJob.query.filter_by(id=job_id, user_id=g.user.id).first()
+        if not job:
+            return jsonify({"error": "Upload job not found"}), 404
+        if job.status != 'failed' or not job.spool_path or not os.path.exists(job.spool_path):
+            return jsonify({"error": "Only a failed job whose upload is still spooled can resume"}), 409
+
+        job.status = 'queued'
+        db.session.commit()
+        submit_ingest_job(app, job.id, job.spool_path)
+        return jsonify({"job_id": job.id, "status": job.status, "rows_parsed": job.rows_parsed}), 202
+
     @app.route("/api/portfolio/<string:portfolio_id>/history", methods=["GET"])
     def get_portfolio_history(portfolio_id):
         """
         Calculates the portfolio's market value over time based on transaction history
         and historical market prices using helper functions.
-        Returns data points for plotting a line chart of portfolio growth.
+        Returns data points for plotting a line chart of portfolio growth, sampled
+        at the ?resolution= given (daily, weekly or monthly; default weekly).
         """
         try:
             if not hasattr(g, 'user') or g.user is None:
                 return jsonify({"error": "User not authenticated"}), 401
 
+            resolution = request.args.get('resolution', 'weekly').lower()
+            if resolution not in RESOLUTIONS:
+                return jsonify({"error": f"resolution must be one of: {', '.join(RESOLUTIONS)}"}), 400
+
             # Verify the portfolio belongs to the user
-            portfolio = Portfolio.query.filter_by(id=portfolio_id, user_id=g.user.id).first()
+            portfolio = owned_portfolio(portfolio_id)
             if not portfolio:
                 return jsonify({"error": "Portfolio not found or unauthorized"}), 404
 
-            # Get all transactions sorted by date
-            transactions = Transaction.query.filter_by(portfolio_id=portfolio_id).order_by(Transaction.created_at).all()
+            # Get all transactions sorted by date (plain rows, no ORM objects)
+            transactions = db.session.query(
+                Transaction.created_at, Transaction.ticker, Transaction.shares,
+                Transaction.price, Transaction.transaction_type
+            ).filter(Transaction.portfolio_id == portfolio_id).order_by(Transaction.created_at).all()
 
             if not transactions:
                 return jsonify({"history": [], "message": "No transactions found"}), 200
@@ -735,87 +864,17 @@ def register_routes(app):
                 except Exception as e:
                     app.logger.error(f"Error fetching current market price for {ticker}: {e}")
 
-            # Fetch historical price data for each ticker
-            ticker_historical_prices = {}
-
-            for ticker in unique_tickers:
-                # Use the fetch_batch_historical_prices helper function
-                prices = fetch_batch_historical_prices(
-                    ticker,
-                    start_date.isoformat(),
-                    end_date.isoformat()
-                )
-                ticker_historical_prices[ticker] = prices
-
-                # Ensure we don't hit API rate limits
-                time.sleep(0.5)  # Add a small delay between API calls
-
-            # Create a day-by-day portfolio value calculation
-            portfolio_history = []
-
-            # Sample dates - weekly intervals for past data points
-            sampling_rate = 7  # One data point per week
-
-            date_range = []
-            current_date = start_date
-            while current_date < end_date:  # Note: we'll handle end_date separately for current prices
-                date_range.append(current_date)
-                current_date += timedelta(days=sampling_rate)
-
-            # Process each sampled date
-            for current_date in date_range:
-                date_str = current_date.isoformat()
-
-                # Calculate holdings as of this date
-                holdings = defaultdict(float)  # ticker -> shares
-
-                # Apply all transactions up to and including this date
-                for txn in transactions:
-                    if txn.created_at.date() <= current_date:
-                        ticker = txn.ticker
-                        shares = float(txn.shares)
-
-                        if txn.transaction_type.lower() == 'buy':
-                            holdings[ticker] += shares
-                        elif txn.transaction_type.lower() == 'sell':
-                            holdings[ticker] -= shares
-
-                # Calculate portfolio value for this day using historical market prices
-                day_value = 0
-
-                for ticker, shares in holdings.items():
-                    if shares <= 0:
-                        continue
-
-                    # Try to get the market price for this ticker on this date
-                    price = None
-
-                    if date_str in ticker_historical_prices.get(ticker, {}):
-                        # Use price from our already fetched batch
-                        price = ticker_historical_prices[ticker][date_str]
-                    else:
-                        # Fetch individual price if not in batch (as a fallback)
-                        price = fetch_historical_price(ticker, date_str)
-
-                        if price is None:
-                            # If still no price, use the last transaction price for this ticker
-                            for t in reversed(transactions):
-                                if t.ticker == ticker and t.created_at.date() <= current_date:
-                                    price = float(t.price)
-                                    break
-
-                    # If a price was found, add to the day's value
-                    if price:
-                        day_value += shares * price
-                    else:
-                        app.logger.warning(f"No price found for {ticker} on {date_str}")
-
-                # Add data point for this day
-                portfolio_history.append({
-                    "date": date_str,
-                    "value": round(day_value, 2),
-                    "market_value": round(day_value, 2)
-                })
+            # Past days come from the stored daily values, so only days added
+            # since the last refresh are valued here; today is valued live below
+            daily_values = load_daily_values(portfolio_id)
+            sampled_values = daily_values.reindex(sample_dates(start_date, end_date, resolution)).dropna()
+            txns = transactions_frame(transactions)
+            close_prices = None
+            portfolio_history = [{
+                "date": day.date().isoformat(),
+                "value": round(float(value), 2),
+                "market_value": round(float(value), 2)
+            } for day, value in sampled_values.items()]
 
             # Add current day using real-time market prices
             current_day_value = 0
@@ -832,19 +891,19 @@ def register_routes(app):
                     # Fallback if real-time price not available
                     app.logger.warning(f"No current market price available for {ticker}, using fallback")
 
-                    # Try historical prices first
-                    latest_prices = ticker_historical_prices.get(ticker, {})
-                    if latest_prices:
-                        latest_date = max(latest_prices.keys())
-                        price = latest_prices[latest_date]
+                    # Try recent closes first
+                    if close_prices is None:
+                        close_prices = fetch_batch_close_prices(current_holdings.keys(), end_date.isoformat())
+                    latest_prices = close_prices[ticker].dropna() if ticker in close_prices.columns else []
+                    if len(latest_prices) > 0:
+                        price = float(latest_prices.iloc[-1])
                         current_day_value += shares * price
                     else:
                         # Last resort: use transaction price
-                        for t in reversed(transactions):
-                            if t.ticker == ticker:
-                                price = float(t.price)
-                                current_day_value += shares * price
-                                break
+                        ticker_txns = txns[txns["ticker"] == ticker]
+                        if not ticker_txns.empty:
+                            price = float(ticker_txns["price"].iloc[-1])
+                            current_day_value += shares * price
 
             # Add current day data point
             portfolio_history.append({
@@ -866,6 +925,65 @@ def register_routes(app):
             app.logger.error(f"Error calculating portfolio history: {e}", exc_info=True)
             return jsonify({"error": str(e)}), 500
 
+    @app.route("/api/portfolio/<string:portfolio_id>/returns", methods=["GET"])
+    def get_portfolio_returns(portfolio_id):
+        """
+        Time-weighted return and XIRR over ?window= (1M, 3M, 6M, YTD, 1Y, 3Y,
+        5Y or ALL; default ALL), or between ?start= and ?end= (YYYY-MM-DD).
+        Windows end at the last stored daily close.
+        """
+        try:
+            portfolio = owned_portfolio(portfolio_id)
+            if not portfolio:
+                return jsonify({"error": "Portfolio not found or unauthorized"}), 404
+
+            window = request.args.get('window', 'ALL').upper()
+            if window not in WINDOWS:
+                return jsonify({"error": f"window must be one of: {', '.join(WINDOWS)}"}), 400
+            try:
+                start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() \
+                    if request.args.get('start') else None
+                end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() \
+                    if request.args.get('end') else None
+            except ValueError:
+                return jsonify({"error": "start and end must be dates as YYYY-MM-DD"}), 400
+
+            returns = portfolio_returns(portfolio.id, window, start, end)
+            if returns is None:
+                return jsonify({"error": "No daily values in this window"}), 404
+            return jsonify(returns), 200
+
+        except Exception as e:
+            app.logger.error(f"Error calculating portfolio returns: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+    @app.route("/api/portfolio/<string:portfolio_id>/risk", methods=["GET"])
+    def get_portfolio_risk(portfolio_id):
+        """
+        Volatility, benchmark betas, holding correlations, historical VaR/CVaR
+        (at ?confidence=, default from config) and max drawdown of the portfolio.
+        """
+        try:
+            portfolio = owned_portfolio(portfolio_id)
+            if not portfolio:
+                return jsonify({"error": "Portfolio not found or unauthorized"}), 404
+
+            try:
+                confidence = float(request.args['confidence']) if request.args.get('confidence') else None
+            except ValueError:
+                return jsonify({"error": "confidence must be a number"}), 400
+            if confidence is not None and not 0.5 <= confidence < 1:
+                return jsonify({"error": "confidence must be between 0.5 and 1"}), 400
+
+            risk = portfolio_risk(portfolio.id, confidence)
+            if risk is None:
+                return jsonify({"error": "Not enough holdings or price history"}), 404
+            return jsonify(risk), 200
+
+        except Exception as e:
+            app.logger.error(f"Error calculating portfolio risk: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
     # --- Assistant ---
 
     @app.route('/api/portfolio/chat', methods=['POST'])
@@ -881,13 +999,17 @@ def register_routes(app):
                 return jsonify({"error": "Question is required"}), 400
 
             # Get the user's portfolio (removed is_default filter since Portfolio doesn't have it)
-            portfolio = Portfolio.query.filter_by(user_id=g.user.id).first()
+            portfolio = owned_portfolio()
             if not portfolio:
                 return jsonify({"error": "No portfolio found for this user"}), 404
 
             # Retrieve portfolio holdings and benchmarks
             portfolio_entries = PortfolioHolding.query.filter_by(portfolio_id=portfolio.id).all()
-            benchmarks = fetch_market_benchmarks()
+            try:
+                benchmarks = benchmark_snapshot.get()
+            except Exception as e:
+                benchmarks = {"error": str(e)}
+            fundamentals_by_ticker = load_ticker_fundamentals([entry.ticker for entry in portfolio_entries])
 
             if not portfolio_entries:
                 # Provide a default message if no holdings exist.
@@ -904,11 +1026,11 @@ def register_routes(app):
                         )
                 else:
                     portfolio_context += "Market benchmark data unavailable.\n"
-                portfolio_context = "Portfolio Holdings:\n"
+                portfolio_context += "\nPortfolio Holdings:\n"
                 for entry in portfolio_entries:
                     # Get detailed stock data
                     try:
-                        stock_data = fetch_stock_data(entry.ticker)
+                        stock_data = fundamentals_by_ticker.get(entry.ticker.upper()) or fetch_stock_data(entry.ticker)
                         fundamentals = stock_data.get('fundamentals', {})
                         sector = fundamentals.get('sector') or fetch_stock_sector(entry.ticker) or "Unknown"
                         total_value = float(entry.shares) * float(entry.average_cost)
@@ -1050,7 +1172,7 @@ def register_routes(app):
                 return jsonify({"error": "Thread not found or unauthorized"}), 404
 
             # Check if any portfolio holdings have been updated since thread creation
-            portfolio = Portfolio.query.filter_by(user_id=g.user.id).first()
+            portfolio = owned_portfolio()
             if portfolio:
                 # Find the most recently updated holding
                 latest_holding_update = db.session.query(db.func.max(PortfolioHolding.updated_at)) \
@@ -0,0 +1,168 @@
+# scheduler.py
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Priority used when a caller doesn't pass one; background threads set it
+# once so every upstream call they make queues behind user requests
+_thread_priority = threading.local()
+
+
+def current_priority():
+    """The calling thread's default priority (INTERACTIVE unless set)."""
+    return getattr(_thread_priority, "value", INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Run a block with level as the calling thread's default priority."""
+    previous = current_priority()
+    _thread_priority.value = level
+    try:
+        yield
+    finally:
+        _thread_priority.value = previous
+
+
+class MonotonicClock:
+    """Wall clock used in production."""
+
+    def now(self):
+        return time.monotonic()
+
+    def wait(self, condition, timeout):
+        condition.wait(timeout)
+
+
+class FakeClock:
+    """
+    Deterministic clock for offline tests.
+
+    Time only moves when advance() is called. Waiters block until then, so a
+    test can queue several requests and release them by advancing the clock.
+    """
+
+    def __init__(self, start=0.0):
+        self.current = start
+        self._conditions = set()
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self.current
+
+    def wait(self, condition, timeout):
+        with self._lock:
+            self._conditions.add(condition)
+        condition.wait()
+
+    def advance(self, seconds):
+        with self._lock:
+            self.current += seconds
+            conditions = list(self._conditions)
+        for condition in conditions:
+            with condition:
+                condition.notify_all()
+
+
+class TokenBucketScheduler:
+    """
+    Process-wide token bucket that queues callers by priority.
+
+    Callers block in acquire() until a token is available and no
+    higher-priority (or earlier, same-priority) caller is waiting ahead of
+    them. Requests are never rejected, only delayed.
+
+    Args:
+        rate (float): Tokens added per period
+        per (float): Period length in seconds (default one minute)
+        burst (int, optional): Bucket capacity. Defaults to rate.
+        clock (optional): MonotonicClock or FakeClock
+    """
+
+    def __init__(self, rate, per=60.0, burst=None, clock=None):
+        self.rate = rate / per
+        self.capacity = burst or rate
+        self.clock = clock or MonotonicClock()
+        self.tokens = float(self.capacity)
+        self._last_refill = self.clock.now()
+        self._queue = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self.granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self.total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self.max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+
+    def _refill(self):
+        now = self.clock.now()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, priority=None):
+        """
+        Block until this caller may make one upstream request.
+
+        Args:
+            priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to
+                                      the calling thread's current_priority().
+
+        Returns:
+            float: Seconds spent waiting in the queue
+        """
+        if priority is None:
+            priority = current_priority()
+        with self._cond:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            enqueued_at = self.clock.now()
+            try:
+                while True:
+                    self._refill()
+                    if self._queue[0] == ticket and self.tokens >= 1:
+                        heapq.heappop(self._queue)
+                        self.tokens -= 1
+                        break
+                    self.clock.wait(self._cond, (1 - self.tokens) / self.rate if self.tokens < 1 else None)
+            except BaseException:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+            waited = self.clock.now() - enqueued_at
+            self.granted[priority] = self.granted.get(priority, 0) + 1
+            self.total_wait[priority] = self.total_wait.get(priority, 0.0) + waited
+            self.max_wait[priority] = max(self.max_wait.get(priority, 0.0), waited)
+            # Let the next caller in line re-check the bucket
+            self._cond.notify_all()
+            return waited
+
+    def stats(self):
+        """Return queue depth, tokens available and wait times per priority."""
+        with self._cond:
+            self._refill()
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            waits = {}
+            for priority, name in PRIORITY_NAMES.items():
+                granted = self.granted.get(priority, 0)
+                waits[name] = {
+                    "granted": granted,
+                    "avg_wait_seconds": round(self.total_wait.get(priority, 0.0) / granted, 3) if granted else 0.0,
+                    "max_wait_seconds": round(self.max_wait.get(priority, 0.0), 3)
+                }
+            return {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": depth,
+                "tokens_available": round(self.tokens, 3),
+                "requests_per_minute": round(self.rate * 60, 3),
+                "waits": waits
+            }
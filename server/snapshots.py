@@ -0,0 +1,222 @@
+# snapshots.py
+import pandas as pd
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import db, Portfolio, Transaction, PortfolioDailyValue
+from portfolio_engine import transactions_frame, position_matrix, value_portfolio
+from price_store import fill_price_gaps, get_close_prices
+
+
+def _lock_portfolio(portfolio_id):
+    """
+    Lock the portfolio row until the end of the transaction.
+
+    Invalidating and refreshing daily values both take this lock, so a
+    refresh that read the transactions before a write cannot store its stale
+    values after that write has deleted them.
+    """
+    db.session.query(Portfolio.id).filter(Portfolio.id == portfolio_id).with_for_update().scalar()
+
+
+def invalidate_daily_values(portfolio_id, since=None):
+    """
+    Delete stored daily values from a date forward, so the next refresh
+    recomputes them. Does not commit; callers commit with their own change,
+    which also releases the portfolio lock taken here.
+
+    Args:
+        portfolio_id (str): The portfolio
+        since (date or datetime, optional): First affected day. Deletes every
+                                            row when omitted.
+    """
+    _lock_portfolio(portfolio_id)
+    rows = PortfolioDailyValue.query.filter(PortfolioDailyValue.portfolio_id == portfolio_id)
+    if since is not None:
+        if isinstance(since, datetime):
+            since = since.date()
+        rows = rows.filter(PortfolioDailyValue.date >= since)
+    rows.delete(synchronize_session=False)
+
+
+def _upsert_daily_values(portfolio_id, values, provisional, batch_size=1000):
+    now = datetime.utcnow()
+    rows = [{
+        "portfolio_id": portfolio_id,
+        "date": day.date(),
+        "value": round(float(value), 2),
+        "provisional": bool(provisional[day]),
+        "computed_at": now
+    } for day, value in values.items()]
+    stmt = pg_insert(PortfolioDailyValue.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["portfolio_id", "date"],
+        set_={"value": stmt.excluded.value, "provisional": stmt.excluded.provisional,
+              "computed_at": stmt.excluded.computed_at}
+    )
+    for i in range(0, len(rows), batch_size):
+        db.session.execute(stmt, rows[i:i + batch_size])
+
+
+def _provisional_days(txns, dates, failed):
+    """
+    Flag the dates on which a held ticker's prices failed to download.
+
+    Args:
+        txns (pd.DataFrame): Output of transactions_frame
+        dates (pd.DatetimeIndex): Dates being valued
+        failed (set): Tickers fill_price_gaps could not download
+
+    Returns:
+        pd.Series: True for each date whose value used a fallback price
+    """
+    positions = position_matrix(txns, dates)
+    failed_columns = [ticker for ticker in positions.columns if ticker in failed]
+    return (positions[failed_columns] > 0).any(axis=1)
+
+
+def _refresh_start(portfolio_id, first_txn, retry_provisional):
+    """
+    First day to value: the day after the last stored one, or the earliest
+    provisional day when retrying those.
+    """
+    first_provisional, last_stored = db.session.query(
+        func.min(PortfolioDailyValue.date).filter(PortfolioDailyValue.provisional),
+        func.max(PortfolioDailyValue.date)
+    ).filter(PortfolioDailyValue.portfolio_id == portfolio_id).one()
+    if retry_provisional and first_provisional:
+        return first_provisional
+    return last_stored + timedelta(days=1) if last_stored else first_txn.date()
+
+
+def _portfolio_transactions(portfolio_id):
+    return db.session.query(
+        Transaction.created_at, Transaction.ticker, Transaction.shares,
+        Transaction.price, Transaction.transaction_type
+    ).filter(Transaction.portfolio_id == portfolio_id) \
+        .order_by(Transaction.created_at, Transaction.seq).all()
+
+
+def refresh_daily_values(portfolio_id, through=None, retry_provisional=True):
+    """
+    Compute and store the daily values missing for a portfolio.
+
+    Only the days after the last stored row are valued, so a refresh after an
+    append-only day values a single day. Today is never stored, since its
+    prices keep changing until the close. Days on which a held ticker's
+    prices failed to download are stored as provisional and valued again by
+    the next refresh that retries them.
+
+    Prices are downloaded first; the transactions are then re-read and the
+    values stored under the portfolio lock, so a concurrent write either
+    lands before the read or invalidates what this refresh stored.
+
+    Args:
+        portfolio_id (str): The portfolio
+        through (date, optional): Last day to store. Defaults to yesterday.
+        retry_provisional (bool): Also revalue stored provisional days. Off on
+                                  request paths, so a ticker that never
+                                  downloads costs one retry per nightly run
+                                  rather than one per view.
+
+    Returns:
+        int: Number of days stored
+    """
+    through = through or date.today() - timedelta(days=1)
+    transactions = _portfolio_transactions(portfolio_id)
+    if not transactions:
+        return 0
+    start = _refresh_start(portfolio_id, transactions[0].created_at, retry_provisional)
+    if start > through:
+        return 0
+    # A few days of lookback so the first day can be valued as-of
+    failed = fill_price_gaps(sorted({txn.ticker.upper() for txn in transactions}), start - timedelta(days=5), through)
+
+    try:
+        _lock_portfolio(portfolio_id)
+        transactions = _portfolio_transactions(portfolio_id)
+        if not transactions:
+            db.session.commit()
+            return 0
+        start = _refresh_start(portfolio_id, transactions[0].created_at, retry_provisional)
+        if start > through:
+            db.session.commit()
+            return 0
+
+        txns = transactions_frame(transactions)
+        dates = pd.date_range(start, through, freq="D")
+        # Store reads only: filling a gap would commit and release the lock
+        closes = get_close_prices(txns["ticker"].unique(), start - timedelta(days=5), through, fill=False)
+        values = value_portfolio(txns, closes, dates)
+        _upsert_daily_values(portfolio_id, values, _provisional_days(txns, dates, failed))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(values)
+
+
+def load_daily_values(portfolio_id):
+    """
+    Read a portfolio's stored daily values, refreshing any missing days first.
+    Provisional days are left to the nightly refresh.
+
+    Returns:
+        pd.Series: Market value indexed by date (Timestamp), one row per day
+                   from the first transaction through yesterday
+    """
+    refresh_daily_values(portfolio_id, retry_provisional=False)
+    rows = db.session.query(PortfolioDailyValue.date, PortfolioDailyValue.value) \
+        .filter(PortfolioDailyValue.portfolio_id == portfolio_id) \
+        .order_by(PortfolioDailyValue.date).all()
+    return pd.Series(
+        [row.value for row in rows],
+        index=pd.DatetimeIndex([row.date for row in rows]),
+        dtype=float
+    )
+
+
+def refresh_all_daily_values():
+    """
+    Nightly job: bring every portfolio's daily values up to yesterday.
+
+    Prices for every held ticker are filled into the price store with one
+    batched download before the portfolios are valued one by one.
+
+    Returns:
+        dict: Portfolios refreshed, days stored and failures
+    """
+    yesterday = date.today() - timedelta(days=1)
+    portfolios = db.session.query(Transaction.portfolio_id, func.min(Transaction.created_at)) \
+        .group_by(Transaction.portfolio_id).all()
+    stored = {
+        row.portfolio_id: row for row in db.session.query(
+            PortfolioDailyValue.portfolio_id,
+            func.min(PortfolioDailyValue.date).filter(PortfolioDailyValue.provisional).label("first_provisional"),
+            func.max(PortfolioDailyValue.date).label("last_stored")
+        ).group_by(PortfolioDailyValue.portfolio_id)
+    }
+
+    starts = []
+    for portfolio_id, first_txn in portfolios:
+        row = stored.get(portfolio_id)
+        if row is None:
+            starts.append(first_txn.date())
+        else:
+            starts.append(row.first_provisional or row.last_stored + timedelta(days=1))
+    starts = [start for start in starts if start <= yesterday]
+    if starts:
+        tickers = [row.ticker for row in db.session.query(Transaction.ticker).distinct()]
+        get_close_prices(tickers, min(starts) - timedelta(days=5), yesterday)
+
+    summary = {"portfolios": 0, "days": 0, "failures": 0}
+    for portfolio_id, _ in portfolios:
+        try:
+            summary["days"] += refresh_daily_values(portfolio_id, through=yesterday)
+            summary["portfolios"] += 1
+        except Exception as e:
+            db.session.rollback()
+            summary["failures"] += 1
+            print(f"Error refreshing daily values for portfolio {portfolio_id}: {e}")
+    return summary
@@ -0,0 +1,203 @@
+# symbol_index.py
+import csv
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+# Matches kept per symbol trie node, enough for any top-k we serve. Name
+# token postings are kept whole, since a multi-token query intersects them.
+MAX_MATCHES_PER_NODE = 50
+NAME_PREFIX_MAX_LENGTH = 12
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NO_POSITIONS = np.array([], dtype=np.int32)
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+class _Index:
+    """Immutable snapshot of a listing file, built once and swapped in whole."""
+
+    def __init__(self, entries):
+        # Listed order is the tie-breaker, so shorter (usually primary) symbols win
+        self.entries = sorted(entries, key=lambda entry: (len(entry["symbol"]), entry["symbol"]))
+        self.by_symbol = {}
+        self.trie = {}
+        name_prefixes = {}
+        whole_tokens = {}
+        name_lengths = []
+        for position, entry in enumerate(self.entries):
+            symbol = entry["symbol"]
+            name_tokens = set(_tokens(entry["name"]))
+            name_lengths.append(len(name_tokens))
+            self.by_symbol.setdefault(symbol, position)
+
+            node = self.trie
+            for char in symbol:
+                node = node.setdefault(char, {"": []})
+                if len(node[""]) < MAX_MATCHES_PER_NODE:
+                    node[""].append(position)
+
+            # Every prefix of every name token, so "micro" finds "Microsoft Corp"
+            for token in name_tokens:
+                whole_tokens.setdefault(token, []).append(position)
+                for length in range(1, min(len(token), NAME_PREFIX_MAX_LENGTH) + 1):
+                    matches = name_prefixes.setdefault(token[:length], [])
+                    if not matches or matches[-1] != position:
+                        matches.append(position)
+
+        # Sorted position arrays, so multi-token queries intersect vectorized
+        self.name_prefixes = {prefix: np.array(positions, dtype=np.int32)
+                              for prefix, positions in name_prefixes.items()}
+        self.whole_tokens = {token: np.array(positions, dtype=np.int32)
+                             for token, positions in whole_tokens.items()}
+        self.name_lengths = np.array(name_lengths, dtype=np.int32)
+
+    def symbol_matches(self, prefix):
+        node = self.trie
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node[""]
+
+    def name_matches(self, query, limit):
+        """
+        Top limit entries with a name token starting with every query token.
+
+        Postings are intersected starting from the rarest token, and every
+        match is ranked before truncating, so "apple inc" puts "Apple Inc"
+        ahead of a longer "Apple ... Inc" name: names where more query tokens
+        are whole words come first, then shorter names, then symbol rank.
+        """
+        tokens = set(_tokens(query))
+        if not tokens:
+            return []
+        postings = sorted((self.name_prefixes.get(token[:NAME_PREFIX_MAX_LENGTH], _NO_POSITIONS)
+                           for token in tokens), key=len)
+        matches = postings[0]
+        for other in postings[1:]:
+            matches = np.intersect1d(matches, other, assume_unique=True)
+
+        whole_word_hits = np.zeros(len(matches), dtype=np.int32)
+        for token in tokens:
+            if token in self.whole_tokens:
+                whole_word_hits += np.isin(matches, self.whole_tokens[token], assume_unique=True)
+        order = np.lexsort((matches, self.name_lengths[matches], -whole_word_hits))
+        return matches[order[:limit]].tolist()
+
+
+class SymbolIndex:
+    """
+    In-memory symbol search over a listing file.
+
+    The listing is a CSV with at least "symbol" and "name" columns (the Alpha
+    Vantage LISTING_STATUS export works as-is). Symbols are indexed in a
+    prefix trie and company names by token prefix, and the file is reloaded
+    when its modification time changes.
+
+    Args:
+        path (str): Path to the listing CSV
+        reload_interval (float): Minimum seconds between modification checks
+    """
+
+    def __init__(self, path, reload_interval=30):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._index = _Index([])
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """(Re)build the index from the listing file. Returns the number of symbols."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                entries = []
+                for row in reader:
+                    row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+                    symbol = row.get("symbol", "").upper()
+                    if not symbol or row.get("status", "active").lower() != "active":
+                        continue
+                    entries.append({
+                        "symbol": symbol,
+                        "name": row.get("name", ""),
+                        "exchange": row.get("exchange", ""),
+                        "type": row.get("assettype", "")
+                    })
+        except OSError as e:
+            print(f"Warning: symbol listing not loaded from {self.path} ({e}); searches will use upstream "
+                  f"APIs until it exists. Run `flask download-symbol-listing` to fetch it.")
+            return len(self._index.entries)
+
+        index = _Index(entries)
+        with self._lock:
+            self._index = index
+            self._mtime = mtime
+        if index.entries:
+            print(f"Loaded {len(index.entries)} symbols from {self.path}")
+        else:
+            print(f"Warning: symbol listing {self.path} has no active symbols; searches will use upstream APIs")
+        return len(index.entries)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.load()
+
+    def search(self, query, limit=5):
+        """
+        Return up to limit ranked matches for a search box query.
+
+        Exact symbol matches rank first, then symbol prefix matches, then
+        companies whose name tokens start with every query token.
+
+        Args:
+            query (str): What the user has typed so far
+            limit (int): Maximum number of results
+
+        Returns:
+            list: Dicts with symbol, name, exchange and type
+        """
+        self._maybe_reload()
+        index = self._index
+        query = query.strip()
+        if not query or not index.entries:
+            return []
+
+        results = []
+        seen = set()
+
+        def add(positions):
+            for position in positions:
+                if len(results) >= limit:
+                    return
+                if position not in seen:
+                    seen.add(position)
+                    results.append(index.entries[position])
+
+        exact = index.by_symbol.get(query.upper())
+        if exact is not None:
+            add([exact])
+        add(index.symbol_matches(query.upper()))
+        if len(results) < limit:
+            # Enough name matches to fill the page even if some were already added
+            add(index.name_matches(query, limit + len(results)))
+        return results
+
+    def __len__(self):
+        return len(self._index.entries)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Config requires an Alpha Vantage key at import time; tests never call it
+os.environ.setdefault("STOCKR_ALPHA_ID", "")
+
+from flask import Flask  # noqa: E402
+
+from models import db, User, Portfolio  # noqa: E402
+
+
+def _postgres_functions(dbapi_connection, connection_record):
+    # The price coverage upsert widens ranges with Postgres' least/greatest
+    dbapi_connection.create_function("least", -1, min)
+    dbapi_connection.create_function("greatest", -1, max)
+
+
+@pytest.fixture
+def app():
+    """An app bound to a fresh database: in-memory SQLite unless TEST_DATABASE_URL is set."""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("TEST_DATABASE_URL", "sqlite://")
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            db.event.listen(db.engine, "connect", _postgres_functions)
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def portfolio_id(app):
+    user = User(firebase_uid="uid-1")
+    db.session.add(user)
+    db.session.flush()
+    portfolio = Portfolio(user_id=user.id)
+    db.session.add(portfolio)
+    db.session.commit()
+    return portfolio.id
@@ -0,0 +1,68 @@
+import pytest
+
+import alpha_vantage
+from alpha_vantage import SENTIMENT_FEED_LIMIT, av_cache, news_sentiment
+
+
+def article(n, *tickers):
+    return {
+        "url": f"https://news.example/{n}",
+        "time_published": f"20240101T{n:06d}",
+        "ticker_sentiment": [{"ticker": ticker} for ticker in tickers]
+    }
+
+
+def feed(articles):
+    return {"items": str(len(articles)), "sentiment_score_definition": "x", "feed": articles}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def fetch(function, params, parse, priority):
+        calls.append(params)
+        return feed([article(999, "AAPL", "MSFT")])
+    av_cache.clear()
+    monkeypatch.setattr(alpha_vantage, "_fetch", fetch)
+    yield calls
+    av_cache.clear()
+
+
+def test_ticker_order_and_case_share_one_entry(upstream):
+    first = news_sentiment("AAPL,MSFT")
+    second = news_sentiment(" msft, aapl ")
+
+    assert first is second
+    assert upstream == [{"tickers": "AAPL,MSFT"}]
+
+
+def test_composes_from_complete_single_ticker_feeds(upstream):
+    av_cache.set("NEWS_SENTIMENT", (("tickers", "AAPL"),), feed([article(2, "AAPL", "MSFT"), article(1, "AAPL")]))
+    av_cache.set("NEWS_SENTIMENT", (("tickers", "MSFT"),), feed([article(2, "AAPL", "MSFT"), article(3, "MSFT")]))
+
+    result = news_sentiment("MSFT,AAPL")
+
+    assert upstream == []
+    assert [item["url"] for item in result["feed"]] == ["https://news.example/2"]
+    assert result["items"] == "1"
+
+
+def test_truncated_single_ticker_feed_goes_upstream(upstream):
+    # A feed at the limit is only the latest page, so older joint articles may be missing
+    full = feed([article(n, "AAPL") for n in range(SENTIMENT_FEED_LIMIT)])
+    av_cache.set("NEWS_SENTIMENT", (("tickers", "AAPL"),), full)
+    av_cache.set("NEWS_SENTIMENT", (("tickers", "MSFT"),), feed([article(1, "AAPL", "MSFT")]))
+
+    result = news_sentiment("AAPL,MSFT")
+
+    assert upstream == [{"tickers": "AAPL,MSFT"}]
+    assert [item["url"] for item in result["feed"]] == ["https://news.example/999"]
+
+
+def test_missing_single_ticker_feed_goes_upstream(upstream):
+    av_cache.set("NEWS_SENTIMENT", (("tickers", "AAPL"),), feed([article(1, "AAPL", "MSFT")]))
+
+    news_sentiment("AAPL,MSFT")
+
+    assert upstream == [{"tickers": "AAPL,MSFT"}]
@@ -0,0 +1,167 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from helpers import apply_new_transaction, apply_trade, bulk_insert_transactions, recalc_portfolio
+from models import db, PortfolioHolding, Transaction
+
+BASE = datetime(2024, 3, 1)
+
+
+def add(portfolio_id, ticker, transaction_type, shares, price, created_at):
+    """What the buy/sell/add-asset routes do."""
+    txn = Transaction(portfolio_id=portfolio_id, ticker=ticker, shares=shares, price=price,
+                      transaction_type=transaction_type, created_at=created_at)
+    db.session.add(txn)
+    apply_new_transaction(txn)
+    return txn.id
+
+
+def delete(portfolio_id, txn_id):
+    """What the delete-transaction route does."""
+    txn = db.session.get(Transaction, txn_id)
+    ticker, since = txn.ticker, txn.created_at
+    db.session.delete(txn)
+    db.session.flush()
+    recalc_portfolio(portfolio_id, ticker, since=since)
+
+
+def full_replay(portfolio_id, ticker):
+    """Positions after every transaction, replayed from scratch in (created_at, seq) order."""
+    txns = Transaction.query.filter_by(portfolio_id=portfolio_id, ticker=ticker) \
+        .order_by(Transaction.created_at, Transaction.seq).all()
+    shares, cost = 0.0, 0.0
+    positions = {}
+    for txn in txns:
+        shares, cost = apply_trade(shares, cost, txn.transaction_type, float(txn.shares), float(txn.price))
+        positions[txn.id] = (shares, cost)
+    return positions, (shares, cost)
+
+
+def assert_matches_full_replay(portfolio_id, tickers):
+    for ticker in tickers:
+        positions, (shares, cost) = full_replay(portfolio_id, ticker)
+        for txn_id, (position_shares, position_cost) in positions.items():
+            txn = db.session.get(Transaction, txn_id)
+            assert (txn.position_shares, txn.position_cost) == pytest.approx((position_shares, position_cost))
+        holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker=ticker).first()
+        if shares > 0:
+            assert holding is not None
+            assert float(holding.shares) == pytest.approx(shares, abs=0.01)
+            assert float(holding.book_value) == pytest.approx(max(0, cost), abs=0.01)
+        else:
+            assert holding is None
+
+
+def test_same_timestamp_buy_then_sell_leaves_no_holding(portfolio_id):
+    # Both trades land on the same day, so only insertion order can tell them apart
+    for _ in range(20):
+        add(portfolio_id, "AAPL", "buy", 10, 100, BASE)
+        add(portfolio_id, "AAPL", "sell", 10, 110, BASE)
+
+    assert PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker="AAPL").first() is None
+    assert_matches_full_replay(portfolio_id, ["AAPL"])
+
+
+def test_backdated_insert_replays_later_positions(portfolio_id):
+    add(portfolio_id, "AAPL", "buy", 10, 100, BASE + timedelta(days=2))
+    add(portfolio_id, "AAPL", "sell", 15, 120, BASE + timedelta(days=3))  # ignored: only 10 held
+    add(portfolio_id, "AAPL", "buy", 5, 90, BASE + timedelta(days=1))
+
+    holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker="AAPL").first()
+    assert holding is None
+    assert_matches_full_replay(portfolio_id, ["AAPL"])
+
+
+def test_deleting_a_same_timestamp_transaction(portfolio_id):
+    buy = add(portfolio_id, "AAPL", "buy", 10, 100, BASE)
+    add(portfolio_id, "AAPL", "buy", 5, 120, BASE)
+    add(portfolio_id, "AAPL", "sell", 12, 130, BASE)
+    delete(portfolio_id, buy)
+
+    # Without the first buy the sell of 12 exceeds the 5 held and is ignored
+    holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker="AAPL").first()
+    assert float(holding.shares) == 5
+    assert_matches_full_replay(portfolio_id, ["AAPL"])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_updates_match_full_replay(portfolio_id, seed):
+    rng = random.Random(seed)
+    tickers = ["AAPL", "MSFT"]
+    # Few distinct days, so appends, backdated inserts and timestamp ties all happen often
+    days = [BASE + timedelta(days=day) for day in range(6)]
+    latest_day = 0
+    txn_ids = []
+    for _ in range(60):
+        action = rng.random()
+        if action < 0.15 and txn_ids:
+            delete(portfolio_id, txn_ids.pop(rng.randrange(len(txn_ids))))
+        else:
+            if action < 0.35:
+                day = rng.randrange(len(days))  # backdated or same day
+            else:
+                latest_day = min(latest_day + rng.choice([0, 0, 1]), len(days) - 1)
+                day = latest_day
+            txn_ids.append(add(
+                portfolio_id,
+                rng.choice(tickers),
+                "buy" if rng.random() < 0.6 else "sell",
+                rng.randint(1, 20),
+                round(rng.uniform(10, 200), 2),
+                days[day]
+            ))
+        assert_matches_full_replay(portfolio_id, tickers)
+
+
+def upload_row(ticker, transaction_type, shares, price, created_at=None):
+    row = {"ticker": ticker, "transaction_type": transaction_type, "shares": shares, "price": price}
+    if created_at is not None:
+        row["created_at"] = created_at
+    return row
+
+
+@pytest.mark.parametrize("created_at", [BASE, None], ids=["same-day", "undated"])
+def test_upload_applies_tied_rows_in_file_order(portfolio_id, created_at):
+    rows = []
+    for _ in range(20):
+        rows += [upload_row("AAPL", "buy", 10, 100, created_at), upload_row("AAPL", "sell", 10, 110, created_at)]
+    bulk_insert_transactions(portfolio_id, rows)
+
+    assert PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker="AAPL").first() is None
+    assert_matches_full_replay(portfolio_id, ["AAPL"])
+
+
+def test_upload_merges_with_existing_transactions(portfolio_id):
+    add(portfolio_id, "AAPL", "buy", 10, 100, BASE + timedelta(days=1))
+    add(portfolio_id, "AAPL", "sell", 4, 120, BASE + timedelta(days=3))
+    bulk_insert_transactions(portfolio_id, [
+        upload_row("AAPL", "buy", 5, 90, BASE),                         # before everything
+        upload_row("AAPL", "sell", 8, 110, BASE + timedelta(days=1)),   # same day, after the existing buy
+        upload_row("MSFT", "buy", 3, 300, BASE + timedelta(days=2)),
+    ], batch_size=2)
+
+    holding = PortfolioHolding.query.filter_by(portfolio_id=portfolio_id, ticker="AAPL").first()
+    assert float(holding.shares) == 3
+    assert_matches_full_replay(portfolio_id, ["AAPL", "MSFT"])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_uploads_and_single_writes_match_full_replay(portfolio_id, seed):
+    rng = random.Random(seed)
+    tickers = ["AAPL", "MSFT"]
+    days = [BASE + timedelta(days=day) for day in range(4)] + [None]
+
+    def random_row():
+        return upload_row(rng.choice(tickers), "buy" if rng.random() < 0.6 else "sell",
+                          rng.randint(1, 20), round(rng.uniform(10, 200), 2), rng.choice(days))
+
+    for _ in range(8):
+        if rng.random() < 0.5:
+            bulk_insert_transactions(portfolio_id, [random_row() for _ in range(rng.randint(1, 15))])
+        else:
+            row = random_row()
+            add(portfolio_id, row["ticker"], row["transaction_type"], row["shares"], row["price"],
+                row.get("created_at") or datetime.now())
+        assert_matches_full_replay(portfolio_id, tickers)
@@ -0,0 +1,130 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import performance
+import price_store
+from models import db, PortfolioHolding
+from performance import (compute_returns, compute_risk, performance_cache, portfolio_returns,
+                         transactions_version, window_start)
+from test_holdings import add, delete
+
+
+@pytest.fixture
+def compute_calls(monkeypatch):
+    calls = []
+
+    def compute_returns(portfolio_id, window="ALL", start=None, end=None):
+        calls.append(portfolio_id)
+        return {"calls": len(calls)}
+    monkeypatch.setattr(performance, "compute_returns", compute_returns)
+    performance_cache.clear()
+    yield calls
+    performance_cache.clear()
+
+
+def test_delete_then_backdated_insert_changes_version(portfolio_id, compute_calls):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    middle = add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 3))
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 4))
+    before = transactions_version(portfolio_id)
+    assert portfolio_returns(portfolio_id) == {"calls": 1}
+    assert portfolio_returns(portfolio_id) == {"calls": 1}
+
+    # Same count and same latest created_at as before
+    delete(portfolio_id, middle)
+    add(portfolio_id, "AAPL", "sell", 5, 100, datetime(2024, 1, 1))
+
+    assert transactions_version(portfolio_id) != before
+    assert portfolio_returns(portfolio_id) == {"calls": 2}
+
+
+def test_delete_changes_version(portfolio_id, compute_calls):
+    txn_id = add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    portfolio_returns(portfolio_id)
+    before = transactions_version(portfolio_id)
+
+    delete(portfolio_id, txn_id)
+
+    assert transactions_version(portfolio_id) > before
+    assert portfolio_returns(portfolio_id) == {"calls": 2}
+
+
+def test_window_start():
+    end = pd.Timestamp("2024-03-15")
+
+    assert window_start("YTD", end) == pd.Timestamp("2024-01-01")
+    assert window_start("1M", end) == pd.Timestamp("2024-02-16")
+    assert window_start("ALL", end) is None
+
+
+def test_ytd_returns_start_from_the_previous_close(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2023, 12, 29))
+    values = pd.Series([1000.0, 1000.0, 1000.0, 1100.0, 1100.0, 1210.0],
+                       index=pd.date_range("2023-12-29", "2024-01-03"))
+    monkeypatch.setattr(performance, "load_daily_values", lambda portfolio_id: values)
+
+    returns = compute_returns(portfolio_id, window="YTD")
+
+    assert (returns["start"], returns["end"]) == ("2024-01-01", "2024-01-03")
+    assert (returns["start_value"], returns["end_value"], returns["net_flows"], returns["gain"]) == \
+        (1000.0, 1210.0, 0.0, 210.0)
+    assert returns["time_weighted_return"] == pytest.approx(0.21)
+    # 1000 in on New Year's Eve, 1210 out three days later
+    assert returns["xirr"] == pytest.approx(1.21 ** (365 / 3) - 1, rel=1e-6)
+
+
+def test_all_returns_count_the_opening_buy_as_a_flow(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2023, 1, 1))
+    values = pd.Series(1000.0, index=pd.date_range("2023-01-01", "2024-01-01"))
+    values.iloc[-1] = 1100.0
+    monkeypatch.setattr(performance, "load_daily_values", lambda portfolio_id: values)
+
+    returns = compute_returns(portfolio_id)
+
+    assert (returns["start_value"], returns["net_flows"], returns["gain"]) == (0.0, 1000.0, 100.0)
+    assert returns["time_weighted_return"] == pytest.approx(0.10)
+    assert returns["xirr"] == pytest.approx(0.10)
+    assert returns["time_weighted_return_annualized"] == pytest.approx(1.1 ** (365 / 366) - 1, abs=1e-6)
+
+
+def fake_download(tickers, start, end, **kwargs):
+    """Stocks and indices trade on weekdays, BTC-USD every day and jumps at weekends."""
+    days = pd.date_range(start, pd.Timestamp(end) - pd.Timedelta(days=1), freq="D")
+    data = {}
+    for ticker in tickers:
+        if ticker == "BTC-USD":
+            moves = np.where(days.weekday >= 5, 1.05, 1.0)
+        else:
+            moves = np.where(days.weekday >= 5, np.nan, 1.001)
+        closes = 100 * np.cumprod(np.nan_to_num(moves, nan=1.0))
+        closes[np.isnan(moves)] = np.nan
+        data[("Close", ticker)] = closes
+        data[("Adj Close", ticker)] = closes
+    return pd.DataFrame(data, index=days)
+
+
+def test_risk_uses_returns_across_weekends(portfolio_id, monkeypatch):
+    monkeypatch.setattr(price_store.yf, "download", fake_download)
+    db.session.add_all([
+        PortfolioHolding(portfolio_id=portfolio_id, ticker="AAPL", shares=10, average_cost=100, book_value=1000),
+        PortfolioHolding(portfolio_id=portfolio_id, ticker="BTC-USD", shares=1, average_cost=100, book_value=100),
+    ])
+    db.session.commit()
+
+    risk = compute_risk(portfolio_id, lookback_days=30)
+
+    # One return per pair of consecutive weekdays, Mondays included
+    weekdays = pd.bdate_range(date.today() - timedelta(days=30), date.today())
+    assert risk["observations"] == len(weekdays) - 1
+    # BTC-USD only moves at weekends, so all of its variance is in the Monday returns
+    assert risk["correlation"]["tickers"] == ["AAPL", "BTC-USD"]
+    mondays = (weekdays[1:].weekday == 0).sum()
+    btc = np.where(weekdays[1:].weekday == 0, 1.05 ** 2 - 1, 0.0)
+    aapl = np.full(len(btc), 0.001)
+    weights = np.array([risk["weights"]["AAPL"], risk["weights"]["BTC-USD"]])
+    expected = np.std(np.column_stack([aapl, btc]) @ weights, ddof=1)
+    assert mondays > 0
+    assert risk["daily_volatility"] == pytest.approx(expected, abs=1e-6)
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_engine import (_brent, daily_cash_flows, max_drawdown, risk_metrics, time_weighted_return,
+                              transactions_frame, xirr)
+
+# Two holdings over four days, held half and half
+ASSET_RETURNS = np.array([
+    [0.01, 0.02],
+    [-0.02, 0.00],
+    [0.03, -0.01],
+    [0.00, 0.01],
+])
+WEIGHTS = np.array([0.5, 0.5])
+# The portfolio's own daily returns: 0.015, -0.01, 0.01, 0.005
+PORTFOLIO = ASSET_RETURNS @ WEIGHTS
+
+
+def test_risk_metrics_volatility_is_w_s_w():
+    metrics = risk_metrics(ASSET_RETURNS, WEIGHTS, PORTFOLIO.reshape(-1, 1))
+
+    # Deviations from the 0.005 mean: 0.01, -0.015, 0.005, 0 -> sample variance 3.5e-4 / 3
+    assert metrics["daily_volatility"] == pytest.approx(np.sqrt(3.5e-4 / 3))
+    assert metrics["volatility"] == pytest.approx(np.sqrt(3.5e-4 / 3) * np.sqrt(252))
+
+
+def test_risk_metrics_correlation():
+    metrics = risk_metrics(ASSET_RETURNS, WEIGHTS, PORTFOLIO.reshape(-1, 1))
+
+    # Co-deviation sum -2e-4 over deviation sums of squares 1.3e-3 and 5e-4
+    expected = -2e-4 / np.sqrt(1.3e-3 * 5e-4)
+    assert metrics["correlation"] == pytest.approx(np.array([[1.0, expected], [expected, 1.0]]))
+
+
+def test_risk_metrics_betas():
+    benchmarks = np.column_stack([PORTFOLIO, 2 * PORTFOLIO, np.full(4, 0.01)])
+
+    metrics = risk_metrics(ASSET_RETURNS, WEIGHTS, benchmarks)
+
+    assert metrics["betas"][:2] == pytest.approx([1.0, 0.5])
+    # A benchmark that never moves has no beta
+    assert np.isnan(metrics["betas"][2])
+
+
+def test_risk_metrics_historical_var_and_cvar():
+    metrics = risk_metrics(ASSET_RETURNS, WEIGHTS, PORTFOLIO.reshape(-1, 1), confidence=0.95)
+
+    # Sorted returns -0.01, 0.005, 0.01, 0.015: the 5% quantile sits 0.15 of the
+    # way from the first to the second, and only the -0.01 day is beyond it
+    assert metrics["var"] == pytest.approx(0.00775)
+    assert metrics["cvar"] == pytest.approx(0.01)
+
+
+def test_max_drawdown():
+    # Index 1 -> 1.1 -> 0.55 -> 0.825 -> 0.99: half the 1.1 peak is lost
+    assert max_drawdown(np.array([1.1, 0.5, 1.5, 1.2])) == pytest.approx(-0.5)
+    assert max_drawdown(np.array([1.01, 1.02, 1.0])) == 0.0
+    assert max_drawdown(np.array([])) == 0.0
+
+
+def test_xirr_of_one_year_holding():
+    assert xirr([-100, 110], ["2023-01-01", "2024-01-01"]) == pytest.approx(0.10)
+
+
+def test_xirr_with_several_flows():
+    # 1000 in, another 500 a year later, valued 366 days after that, all growing at 8%
+    final = 1000 * 1.08 ** (731 / 365) + 500 * 1.08 ** (366 / 365)
+
+    rate = xirr([-1000, -500, final], ["2023-01-01", "2024-01-01", "2025-01-01"])
+
+    assert rate == pytest.approx(0.08)
+
+
+def test_xirr_without_a_sign_change_is_none():
+    assert xirr([100, 50], ["2023-01-01", "2024-01-01"]) is None
+    assert xirr([-100, -50], ["2023-01-01", "2024-01-01"]) is None
+
+
+def test_brent_finds_a_bracketed_root():
+    assert _brent(lambda x: x * x - 2, 0.0, 2.0) == pytest.approx(np.sqrt(2))
+    assert _brent(lambda x: x * x + 1, -1.0, 1.0) is None
+
+
+def test_time_weighted_return_ignores_a_deposit():
+    days = pd.date_range("2024-01-01", periods=3)
+    # Flat on the first day, 100 deposited on the second, then up 10%
+    values = pd.Series([100.0, 200.0, 220.0], index=days)
+    flows = pd.Series([100.0], index=[days[1]])
+
+    assert time_weighted_return(values, flows, start_value=100.0) == pytest.approx(0.10)
+
+
+class Row:
+    def __init__(self, created_at, ticker, shares, price, transaction_type):
+        self.created_at, self.ticker, self.shares = created_at, ticker, shares
+        self.price, self.transaction_type = price, transaction_type
+
+
+def test_daily_cash_flows_net_buys_against_sells():
+    txns = transactions_frame([
+        Row(datetime(2024, 1, 2, 10), "AAPL", 10, 100, "buy"),
+        Row(datetime(2024, 1, 2, 15), "AAPL", 5, 120, "sell"),
+        Row(datetime(2024, 1, 3), "MSFT", 2, 300, "buy"),
+    ])
+
+    flows = daily_cash_flows(txns)
+
+    assert flows.to_dict() == {pd.Timestamp("2024-01-02"): 400.0, pd.Timestamp("2024-01-03"): 600.0}
@@ -0,0 +1,98 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import price_store
+from models import db, PriceCoverage
+
+
+def fake_download(frame):
+    def download(tickers, **kwargs):
+        return frame
+    return download
+
+
+def multi_ticker_frame(columns):
+    index = pd.DatetimeIndex(["2024-01-02", "2024-01-03"])
+    data = {}
+    for field in ("Close", "Adj Close"):
+        for ticker, values in columns.items():
+            data[(field, ticker)] = values
+    return pd.DataFrame(data, index=index)
+
+
+def test_failed_ticker_in_chunk_is_not_fetched(monkeypatch):
+    # yfinance reports a ticker that failed inside a batch as an all-NaN column
+    frame = multi_ticker_frame({"AAPL": [185.0, 184.0], "MSFT": [np.nan, np.nan]})
+    monkeypatch.setattr(price_store.yf, "download", fake_download(frame))
+
+    bars, fetched, empty = price_store.download_bars(["AAPL", "MSFT"], date(2024, 1, 2), date(2024, 1, 3))
+
+    assert (fetched, empty) == ({"AAPL"}, set())
+    assert [(bar["ticker"], bar["date"]) for bar in bars] == [
+        ("AAPL", date(2024, 1, 2)), ("AAPL", date(2024, 1, 3))]
+
+
+def test_raised_download_fetches_nothing(monkeypatch):
+    def download(tickers, **kwargs):
+        raise ConnectionError("429 Too Many Requests")
+    monkeypatch.setattr(price_store.yf, "download", download)
+
+    bars, fetched, empty = price_store.download_bars(["AAPL", "MSFT"], date(2024, 1, 2), date(2024, 1, 3))
+
+    assert bars == [] and fetched == empty == set()
+
+
+def test_partially_missing_ticker_counts_as_fetched(monkeypatch):
+    # A NaN on one day (e.g. a halt) is still a completed download
+    frame = multi_ticker_frame({"AAPL": [185.0, np.nan], "MSFT": [370.0, 371.0]})
+    monkeypatch.setattr(price_store.yf, "download", fake_download(frame))
+
+    bars, fetched, empty = price_store.download_bars(["AAPL", "MSFT"], date(2024, 1, 2), date(2024, 1, 3))
+
+    assert (fetched, empty) == ({"AAPL", "MSFT"}, set())
+    assert len(bars) == 3
+
+
+def covered_through(ticker):
+    return db.session.get(PriceCoverage, ticker).end_date
+
+
+def test_weekend_tail_with_no_bars_is_covered_once(app, monkeypatch):
+    db.session.add(PriceCoverage(ticker="AAPL", start_date=date(2024, 1, 1), end_date=date(2024, 1, 5)))
+    db.session.commit()
+    downloads = []
+
+    def download(tickers, start, end, **kwargs):
+        downloads.append((start, end))
+        return pd.DataFrame()
+    monkeypatch.setattr(price_store.yf, "download", download)
+
+    # Coverage ends on Friday; Saturday and Sunday have no bars
+    for _ in range(3):
+        assert price_store.fill_price_gaps(["AAPL"], date(2024, 1, 1), date(2024, 1, 7)) == set()
+
+    assert downloads == [("2024-01-06", "2024-01-08")]
+    assert covered_through("AAPL") == date(2024, 1, 7)
+
+
+def test_empty_weekday_gap_is_retried(app, monkeypatch):
+    db.session.add(PriceCoverage(ticker="AAPL", start_date=date(2024, 1, 1), end_date=date(2024, 1, 5)))
+    db.session.commit()
+    monkeypatch.setattr(price_store.yf, "download", lambda tickers, **kwargs: pd.DataFrame())
+
+    assert price_store.fill_price_gaps(["AAPL"], date(2024, 1, 1), date(2024, 1, 9)) == {"AAPL"}
+    assert covered_through("AAPL") == date(2024, 1, 5)
+
+
+def test_failed_weekend_download_is_not_covered(app, monkeypatch):
+    db.session.add(PriceCoverage(ticker="AAPL", start_date=date(2024, 1, 1), end_date=date(2024, 1, 5)))
+    db.session.commit()
+
+    def download(tickers, **kwargs):
+        raise ConnectionError("429 Too Many Requests")
+    monkeypatch.setattr(price_store.yf, "download", download)
+
+    assert price_store.fill_price_gaps(["AAPL"], date(2024, 1, 1), date(2024, 1, 7)) == {"AAPL"}
+    assert covered_through("AAPL") == date(2024, 1, 5)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+from sqlalchemy import select, text
+
+from migrations import check_query_plans, hot_queries
+from models import db, Transaction
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL", "").startswith("postgresql"),
+    reason="Query plans need a Postgres TEST_DATABASE_URL"
+)
+
+USERS = 2000
+TRANSACTIONS_PER_PORTFOLIO = 100
+TICKERS = 50
+
+
+@pytest.fixture
+def seeded(app):
+    """Row counts in the shape of production: many users, each with a long transaction history."""
+    statements = [
+        f"INSERT INTO users (id, firebase_uid) SELECT 'u' || g, 'uid-' || g FROM generate_series(1, {USERS}) g",
+        f"""INSERT INTO portfolios (id, user_id, transaction_seq)
+            SELECT 'p' || g, 'u' || g, {TRANSACTIONS_PER_PORTFOLIO} FROM generate_series(1, {USERS}) g""",
+        f"""INSERT INTO transactions (id, portfolio_id, ticker, shares, price, transaction_type, created_at, seq,
+                                      position_shares, position_cost)
+            SELECT 't' || p || '-' || n, 'p' || p, 'T' || (n % {TICKERS}), 1, 100, 'buy',
+                   timestamp '2020-01-01' + n * interval '1 day', n, n / {TICKERS} + 1, 100 * (n / {TICKERS} + 1)
+            FROM generate_series(1, {USERS}) p, generate_series(1, {TRANSACTIONS_PER_PORTFOLIO}) n""",
+        f"""INSERT INTO portfolio_holdings (id, portfolio_id, ticker, shares, average_cost, book_value)
+            SELECT 'h' || p || '-' || n, 'p' || p, 'T' || n, 2, 100, 200
+            FROM generate_series(1, {USERS}) p, generate_series(1, 10) n""",
+        f"""INSERT INTO watchlist (id, user_id, ticker, created_at)
+            SELECT 'w' || u || '-' || n, 'u' || u, 'T' || n, now()
+            FROM generate_series(1, {USERS}) u, generate_series(1, 10) n""",
+        f"""INSERT INTO user_threads (user_id, thread_id, created_at, last_used)
+            SELECT 'u' || u, 'thread_' || u || '_' || n, now(), now()
+            FROM generate_series(1, {USERS}) u, generate_series(1, 5) n""",
+        "ANALYZE",
+    ]
+    with db.engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    return {"portfolio_id": "p17", "user_id": "u17", "ticker": "T7", "thread_id": "thread_17_3"}
+
+
+def test_hot_queries_use_indexes_with_default_planner_settings(seeded):
+    results = check_query_plans(queries=hot_queries(**seeded))
+
+    assert {name: scans for name, scans in results.items() if scans} == {}
+
+
+def test_check_reports_queries_no_index_serves(seeded):
+    # Every portfolio's rows for one ticker: nothing leads with ticker
+    unindexed = {"transactions by ticker": select(Transaction.id).where(Transaction.ticker == seeded["ticker"])}
+
+    assert check_query_plans(queries=unindexed) == {"transactions by ticker": ["transactions"]}
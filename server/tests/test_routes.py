@@ -0,0 +1,125 @@
+import time
+from datetime import datetime
+from functools import partial
+
+import pytest
+
+import routes
+from auth_cache import authenticate_token, token_cache
+from config import Config
+from models import db, PortfolioHolding
+from query_stats import install_query_counter
+from test_holdings import add
+
+TOKEN = "uid-1"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def verify(id_token):
+    """Stands in for Firebase: the token is the uid."""
+    return {"uid": id_token, "exp": time.time() + 3600}
+
+
+@pytest.fixture
+def client(app, portfolio_id, monkeypatch):
+    app.config.from_object(Config)
+    app.config["QUERY_COUNT_ENABLED"] = True
+    install_query_counter(app)
+    routes.register_routes(app)
+    monkeypatch.setattr(routes, "authenticate_token", partial(authenticate_token, verify=verify))
+    token_cache.clear()
+    yield app.test_client()
+    token_cache.clear()
+
+
+def query_count(response):
+    return int(response.headers["X-Query-Count"])
+
+
+def test_auth_loads_user_and_portfolio_once_per_token(client):
+    first = client.get("/api/portfolio/id", headers=AUTH)
+    second = client.get("/api/portfolio/id", headers=AUTH)
+
+    assert first.status_code == second.status_code == 200
+    # One joined user-plus-portfolio query, then nothing once the token is cached
+    assert (query_count(first), query_count(second)) == (1, 0)
+
+
+def test_unknown_token_is_rejected(client):
+    response = client.get("/api/portfolio/id", headers={"Authorization": "Bearer uid-unknown"})
+
+    assert response.status_code == 401
+    assert query_count(response) == 1
+
+
+# Statements per request once the token is cached. None of them looks up the
+# user or portfolio again; the portfolio row is only written (its sequence
+# counter) and locked (before daily values are invalidated).
+ROUTES = {
+    "portfolio id": (lambda c, p, t: c.get("/api/portfolio/id", headers=AUTH), 200, 0),
+    "transactions page": (lambda c, p, t: c.get("/api/transactions", headers=AUTH), 200, 1),
+    "buy": (lambda c, p, t: c.post("/api/portfolio/buy", json={"ticker": "MSFT", "shares": 1, "price": 300},
+                                   headers=AUTH), 201, 8),
+    "sell": (lambda c, p, t: c.post("/api/portfolio/sell", json={"ticker": "AAPL", "shares": 5, "price": 110},
+                                    headers=AUTH), 201, 9),
+    "add asset": (lambda c, p, t: c.post(f"/api/portfolio/{p}/add-asset",
+                                         json={"ticker": "AAPL", "shares": 5, "price": 120}, headers=AUTH), 201, 8),
+    "other user's portfolio": (lambda c, p, t: c.post("/api/portfolio/someone-else/add-asset",
+                                                      json={"ticker": "AAPL", "shares": 5, "price": 120},
+                                                      headers=AUTH), 404, 0),
+    "delete transaction": (lambda c, p, t: c.delete(f"/api/transactions/{t}", headers=AUTH), 200, 11),
+    "upload job": (lambda c, p, t: c.get("/api/upload-jobs/unknown", headers=AUTH), 404, 1),
+}
+
+
+@pytest.mark.parametrize("route", list(ROUTES))
+def test_route_query_count(client, portfolio_id, route):
+    first = add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 3))
+    client.get("/api/portfolio/id", headers=AUTH)
+
+    call, status, expected = ROUTES[route]
+    response = call(client, portfolio_id, first)
+
+    assert response.status_code == status
+    assert query_count(response) == expected
+
+
+def test_portfolio_valuation_and_weights(client, portfolio_id, monkeypatch):
+    db.session.add_all([
+        PortfolioHolding(portfolio_id=portfolio_id, ticker="AAPL", shares=10, average_cost=100, book_value=1000),
+        PortfolioHolding(portfolio_id=portfolio_id, ticker="MSFT", shares=2, average_cost=250, book_value=500),
+        PortfolioHolding(portfolio_id=portfolio_id, ticker="GONE", shares=1, average_cost=50, book_value=50),
+    ])
+    db.session.commit()
+    requested = []
+
+    def fetch_market_prices(app, tickers, max_age=None):
+        requested.append(max_age)
+        return {"AAPL": 150.0, "MSFT": 300.0, "GONE": None}, {"GONE": "No data found"}
+    monkeypatch.setattr(routes, "fetch_market_prices", fetch_market_prices)
+
+    response = client.get(f"/api/portfolio/{portfolio_id}?max_age=30", headers=AUTH)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    holdings = {item["ticker"]: item for item in body["portfolio"]}
+    assert requested == [30.0]
+    assert {key: holdings["AAPL"][key] for key in
+            ("market_price", "market_value", "unrealized_gain", "unrealized_gain_pct", "weight")} == {
+        "market_price": 150.0, "market_value": 1500.0, "unrealized_gain": 500.0,
+        "unrealized_gain_pct": 50.0, "weight": 0.7143}
+    assert (holdings["MSFT"]["market_value"], holdings["MSFT"]["weight"]) == (600.0, 0.2857)
+    # An unpriced holding has no value and no weight, and is left out of the total
+    assert (holdings["GONE"]["market_value"], holdings["GONE"]["weight"]) == (None, None)
+    assert holdings["GONE"]["quote_error"] == "No data found"
+    assert (body["total_market_value"], body["total_book_value"]) == (2100.0, 1550.0)
+
+
+@pytest.mark.parametrize("max_age", ["-1", "nan", "inf", "-inf", "soon"])
+def test_portfolio_rejects_invalid_max_age(client, portfolio_id, monkeypatch, max_age):
+    monkeypatch.setattr(routes, "fetch_market_prices", lambda *args, **kwargs: pytest.fail("quotes fetched"))
+
+    response = client.get(f"/api/portfolio/{portfolio_id}?max_age={max_age}", headers=AUTH)
+
+    assert response.status_code == 400
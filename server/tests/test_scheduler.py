@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from refresher import BackgroundRefresher
+from scheduler import BACKGROUND, INTERACTIVE, FakeClock, TokenBucketScheduler, current_priority, priority
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+def queued(scheduler, depth):
+    # stats() takes the scheduler's lock, which a queued caller only releases
+    # once it is blocked in FakeClock.wait, so advancing after this can't race
+    return lambda: scheduler.stats()["queue_depth"] == depth
+
+
+def acquire_in_thread(scheduler, level, granted):
+    def run():
+        waited = scheduler.acquire(level)
+        granted.append((level, waited))
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_burst_is_served_without_waiting(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=3, clock=clock)
+
+    assert [scheduler.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert scheduler.stats()["tokens_available"] == 0
+
+
+def test_tokens_refill_at_the_configured_rate(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=1, clock=clock)  # one token per second
+    scheduler.acquire()
+    granted = []
+    thread = acquire_in_thread(scheduler, INTERACTIVE, granted)
+    wait_until(queued(scheduler, 1))
+
+    clock.advance(0.5)
+    wait_until(queued(scheduler, 1))
+    assert granted == []
+
+    clock.advance(0.5)
+    thread.join(2)
+    assert granted == [(INTERACTIVE, 1.0)]
+
+
+def test_refill_is_capped_at_burst(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=2, clock=clock)
+    clock.advance(3600)
+
+    assert scheduler.stats()["tokens_available"] == 2
+
+
+def test_interactive_requests_go_ahead_of_background(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=1, clock=clock)
+    scheduler.acquire()
+    granted = []
+    background = acquire_in_thread(scheduler, BACKGROUND, granted)
+    wait_until(queued(scheduler, 1))
+    interactive = acquire_in_thread(scheduler, INTERACTIVE, granted)
+    wait_until(queued(scheduler, 2))
+
+    clock.advance(1)
+    interactive.join(2)
+    wait_until(queued(scheduler, 1))
+    assert granted == [(INTERACTIVE, 1.0)]
+
+    clock.advance(1)
+    background.join(2)
+    assert granted == [(INTERACTIVE, 1.0), (BACKGROUND, 2.0)]
+
+
+def test_same_priority_is_first_come_first_served(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=1, clock=clock)
+    scheduler.acquire()
+    granted = []
+    threads = []
+    for depth in (1, 2, 3):
+        threads.append(acquire_in_thread(scheduler, BACKGROUND, granted))
+        wait_until(queued(scheduler, depth))
+        clock.advance(0.1)
+        wait_until(queued(scheduler, depth))
+
+    # One token a second, handed out in arrival order
+    clock.advance(0.7)
+    wait_until(queued(scheduler, 2))
+    clock.advance(1)
+    wait_until(queued(scheduler, 1))
+    clock.advance(1)
+    wait_until(lambda: len(granted) == 3)
+    # Each caller waited from when it joined the queue
+    assert [round(waited, 6) for _, waited in granted] == [1.0, 1.9, 2.8]
+
+
+def test_stats_report_wait_times_per_priority(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=1, clock=clock)
+    scheduler.acquire()
+    granted = []
+    thread = acquire_in_thread(scheduler, BACKGROUND, granted)
+    wait_until(queued(scheduler, 1))
+    assert scheduler.stats()["queue_depth_by_priority"] == {"interactive": 0, "background": 1}
+
+    clock.advance(1)
+    thread.join(2)
+    waits = scheduler.stats()["waits"]
+    assert waits["interactive"] == {"granted": 1, "avg_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+    assert waits["background"] == {"granted": 1, "avg_wait_seconds": 1.0, "max_wait_seconds": 1.0}
+
+
+def test_thread_priority_is_the_default(clock):
+    scheduler = TokenBucketScheduler(rate=60, burst=2, clock=clock)
+    with priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+        scheduler.acquire()
+    assert current_priority() == INTERACTIVE
+    scheduler.acquire()
+
+    waits = scheduler.stats()["waits"]
+    assert waits["background"]["granted"] == 1
+    assert waits["interactive"]["granted"] == 1
+
+
+def test_refresher_thread_runs_at_background_priority():
+    seen = []
+    refresher = BackgroundRefresher("test", lambda: seen.append(current_priority()) or len(seen), interval=0.01)
+    try:
+        # The first read loads on the caller's thread, later loads on the refresher's
+        refresher.get()
+        wait_until(lambda: len(seen) >= 2)
+    finally:
+        refresher.stop()
+
+    assert seen[0] == INTERACTIVE
+    assert set(seen[1:]) == {BACKGROUND}
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+import price_store
+import snapshots
+from models import PortfolioDailyValue, Transaction
+from test_holdings import add
+
+THROUGH = date(2024, 1, 5)
+
+
+def closes_frame(closes):
+    index = pd.DatetimeIndex(list(closes))
+    values = list(closes.values())
+    return pd.DataFrame({("Close", "AAPL"): values, ("Adj Close", "AAPL"): values}, index=index)
+
+
+def stored(portfolio_id):
+    rows = PortfolioDailyValue.query.filter_by(portfolio_id=portfolio_id).order_by(PortfolioDailyValue.date).all()
+    return {row.date: (row.value, row.provisional) for row in rows}
+
+
+def test_days_valued_without_prices_are_recomputed(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+
+    def failed_download(tickers, **kwargs):
+        raise ConnectionError("429 Too Many Requests")
+    monkeypatch.setattr(price_store.yf, "download", failed_download)
+    snapshots.refresh_daily_values(portfolio_id, through=THROUGH)
+
+    # Valued at the transaction price, but not final
+    assert stored(portfolio_id) == {date(2024, 1, day): (1000.0, True) for day in range(2, 6)}
+
+    closes = {"2024-01-02": 110.0, "2024-01-03": 120.0, "2024-01-04": 130.0, "2024-01-05": 140.0}
+    monkeypatch.setattr(price_store.yf, "download", lambda tickers, **kwargs: closes_frame(closes))
+    assert snapshots.refresh_daily_values(portfolio_id, through=THROUGH) == 4
+
+    assert stored(portfolio_id) == {
+        date(2024, 1, 2): (1100.0, False), date(2024, 1, 3): (1200.0, False),
+        date(2024, 1, 4): (1300.0, False), date(2024, 1, 5): (1400.0, False)}
+    # Nothing left to recompute
+    assert snapshots.refresh_daily_values(portfolio_id, through=THROUGH) == 0
+
+
+def test_weekend_after_a_friday_refresh_is_final(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    closes = {"2024-01-02": 110.0, "2024-01-03": 120.0, "2024-01-04": 130.0, "2024-01-05": 140.0}
+    downloads = []
+
+    def download(tickers, start, end, **kwargs):
+        downloads.append((start, end))
+        days = {day: close for day, close in closes.items() if start <= day < end}
+        return closes_frame(days) if days else pd.DataFrame()
+    monkeypatch.setattr(price_store.yf, "download", download)
+    snapshots.refresh_daily_values(portfolio_id, through=THROUGH)
+
+    sunday = date(2024, 1, 7)
+    assert [snapshots.refresh_daily_values(portfolio_id, through=sunday) for _ in range(3)] == [2, 0, 0]
+    assert downloads == [("2023-12-28", "2024-01-06"), ("2024-01-06", "2024-01-08")]
+    assert stored(portfolio_id)[date(2024, 1, 6)] == stored(portfolio_id)[sunday] == (1400.0, False)
+
+
+def test_request_path_leaves_provisional_days_to_the_nightly_refresh(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    downloads = []
+
+    def failed_download(tickers, **kwargs):
+        downloads.append(tickers)
+        raise ConnectionError("404 Not Found")
+    monkeypatch.setattr(price_store.yf, "download", failed_download)
+    snapshots.refresh_daily_values(portfolio_id, through=THROUGH)
+
+    assert snapshots.refresh_daily_values(portfolio_id, through=THROUGH, retry_provisional=False) == 0
+    assert len(downloads) == 1
+    assert snapshots.refresh_daily_values(portfolio_id, through=THROUGH) == 4
+    assert len(downloads) == 2
+    assert all(provisional for _, provisional in stored(portfolio_id).values())
+
+
+def test_refresh_stores_values_for_a_write_made_during_its_download(portfolio_id, monkeypatch):
+    add(portfolio_id, "AAPL", "buy", 10, 100, datetime(2024, 1, 2))
+    closes = {"2024-01-02": 100.0, "2024-01-03": 100.0, "2024-01-04": 100.0, "2024-01-05": 100.0}
+    monkeypatch.setattr(price_store.yf, "download", lambda tickers, **kwargs: closes_frame(closes))
+
+    fill_price_gaps = snapshots.fill_price_gaps
+
+    def fill_then_write(*args):
+        failed = fill_price_gaps(*args)
+        # Another request backdates a buy while prices are downloading
+        add(portfolio_id, "AAPL", "buy", 5, 100, datetime(2024, 1, 3))
+        return failed
+    monkeypatch.setattr(snapshots, "fill_price_gaps", fill_then_write)
+    snapshots.refresh_daily_values(portfolio_id, through=THROUGH)
+
+    assert Transaction.query.filter_by(portfolio_id=portfolio_id).count() == 2
+    assert stored(portfolio_id) == {
+        date(2024, 1, 2): (1000.0, False), date(2024, 1, 3): (1500.0, False),
+        date(2024, 1, 4): (1500.0, False), date(2024, 1, 5): (1500.0, False)}
@@ -0,0 +1,76 @@
+import csv
+import os
+import time
+
+import pytest
+
+from symbol_index import MAX_MATCHES_PER_NODE, SymbolIndex
+
+
+def write_listing(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "name", "exchange", "assetType", "ipoDate", "delistingDate", "status"])
+        for symbol, name in rows:
+            writer.writerow([symbol, name, "NYSE", "Stock", "2000-01-01", "null", "Active"])
+
+
+@pytest.fixture
+def listing(tmp_path):
+    # Far more "Bank ... Inc" names than any per-token cap, ranked ahead of the
+    # ones the tests look for (shorter symbols rank first)
+    rows = [(f"B{i:03d}", f"Bank of Example {i} Inc") for i in range(3 * MAX_MATCHES_PER_NODE)]
+    rows += [(f"A{i:03d}", f"Apple Orchard {i} Inc") for i in range(3 * MAX_MATCHES_PER_NODE)]
+    rows += [("BAC", "Bank of America Corp"), ("AAPL", "Apple Inc"), ("MSFT", "Microsoft Corporation"),
+             ("BACPQ", "Bank of America Corp Pref Q")]
+    path = tmp_path / "listing_status.csv"
+    write_listing(path, rows)
+    return path
+
+
+def symbols_for(index, query, limit=5):
+    return [match["symbol"] for match in index.search(query, limit=limit)]
+
+
+def test_multi_token_query_with_common_tokens_finds_the_company(listing):
+    index = SymbolIndex(str(listing))
+    index.load()
+
+    assert symbols_for(index, "bank of america") == ["BAC", "BACPQ"]
+    assert symbols_for(index, "apple inc")[:1] == ["AAPL"]
+
+
+def test_exact_symbol_ranks_first(listing):
+    index = SymbolIndex(str(listing))
+    index.load()
+
+    assert symbols_for(index, "msft") == ["MSFT"]
+    assert symbols_for(index, "micro") == ["MSFT"]
+
+
+def test_common_token_fills_the_limit_in_rank_order(listing):
+    index = SymbolIndex(str(listing))
+    index.load()
+
+    assert symbols_for(index, "bank", limit=3) == ["BAC", "B000", "B001"]
+
+
+def test_missing_listing_leaves_an_empty_index(tmp_path, capsys):
+    index = SymbolIndex(str(tmp_path / "missing.csv"))
+
+    assert index.load() == 0
+    assert index.search("AAPL") == []
+    assert "download-symbol-listing" in capsys.readouterr().out
+
+
+def test_listing_is_reloaded_when_the_file_changes(listing):
+    index = SymbolIndex(str(listing), reload_interval=0)
+    index.load()
+    write_listing(listing, [("NVDA", "NVIDIA Corp")])
+    # Make sure the modification time moves even on coarse filesystems
+    mtime = os.path.getmtime(listing) + 5
+    os.utime(listing, (mtime, mtime))
+    time.sleep(0.001)
+
+    assert symbols_for(index, "nvidia") == ["NVDA"]
+    assert len(index) == 1
@@ -11,4 +11,8 @@ until pg_isready -h "$host" -U "$POSTGRES_USER" -d "$POSTGRES_DB"; do
 done
 
 >&2 echo "PostgreSQL is up - executing command"
+
+# Local symbol search needs the listing file; fetch it on first start only
+flask --app app download-symbol-listing --if-missing || >&2 echo "Symbol listing download failed; search will use upstream APIs"
+
 exec "$@"
\ No newline at end of file